@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Analysis Jobs
+Runs image analysis on a bounded worker pool so HTTP workers can return a
+job id immediately instead of waiting on the Gemini round trip. With a
+shared job registry (SHARED_STATE_BACKEND=sqlite) any worker can report a
+job's status, not just the one running it.
+"""
+
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class AnalysisJobConfig:
+    """Configuration for the analysis job pool"""
+
+    MAX_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', '4'))
+    # Jobs allowed to wait for a worker before submissions are rejected
+    MAX_PENDING = int(os.getenv('ANALYSIS_JOB_MAX_PENDING', '32'))
+    # How long finished jobs stay retrievable
+    RESULT_TTL_SECONDS = float(os.getenv('ANALYSIS_JOB_RESULT_TTL_SECONDS', '900'))
+
+class JobQueueFullError(Exception):
+    """Raised when the job pool has no free worker or queue slot"""
+
+# ==================== MODELS ====================
+
+class AnalysisJob:
+    """Model for a single queued analysis"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = self.QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.finished_monotonic = None
+        self.version = 0  # Bumped on every status change
+        self.changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    def _set_status(self, status, **fields):
+        with self.changed:
+            self.status = status
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait_for_change(self, since_version, timeout):
+        """Block until the job's version moves past since_version or timeout elapses"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != since_version, timeout=timeout)
+            return self.version
+
+    def snapshot(self):
+        """Consistent (version, to_dict()) pair"""
+        with self.changed:
+            return self.version, self.to_dict()
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+class RemoteAnalysisJob:
+    """
+    Read-only view of a job running in another worker.
+
+    Has the parts of the AnalysisJob interface the job endpoints use, backed
+    by snapshots from the shared job registry.
+    """
+
+    def __init__(self, registry, job_id, version, record):
+        self.registry = registry
+        self.id = job_id
+        self.version = version
+        self._record = record
+
+    @property
+    def status(self):
+        return self._record['status']
+
+    @property
+    def done(self):
+        return self.status in (AnalysisJob.COMPLETED, AnalysisJob.FAILED)
+
+    def wait_for_change(self, since_version, timeout):
+        """Poll the registry until the version moves past since_version or timeout elapses"""
+        snapshot = self.registry.wait_for_change(self.id, since_version, timeout)
+        if snapshot is None:
+            # Purged, or its worker went away without finishing it
+            self._record = {**self._record, 'status': AnalysisJob.FAILED, 'error': 'Job is no longer available'}
+            self.version += 1
+        else:
+            self.version, self._record = snapshot
+        return self.version
+
+    def to_dict(self):
+        return dict(self._record)
+
+# ==================== SERVICE ====================
+
+class AnalysisJobManager:
+    """
+    Bounded worker pool plus an in-memory job registry.
+
+    With a shared registry every status change is also published there, and
+    get() falls back to it for jobs submitted to other workers.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, result_ttl=None, registry=None):
+        """Initialize the worker pool"""
+        self.max_workers = max_workers or AnalysisJobConfig.MAX_WORKERS
+        self.max_pending = max_pending if max_pending is not None else AnalysisJobConfig.MAX_PENDING
+        self.result_ttl = result_ttl if result_ttl is not None else AnalysisJobConfig.RESULT_TTL_SECONDS
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='analysis-job')
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0
+        }
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on the pool.
+
+        Returns:
+            The new AnalysisJob
+
+        Raises:
+            JobQueueFullError: If every worker and queue slot is taken
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise JobQueueFullError(
+                f"Analysis queue is full ({self.max_workers} running, {self.max_pending} waiting)"
+            )
+
+        job = AnalysisJob(kind)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+            self.stats['submitted'] += 1
+
+        if self.registry is not None:
+            try:
+                self.registry.purge(time.time() - self.result_ttl)
+            except Exception as e:
+                print(f"⚠️ Could not purge shared analysis jobs: {e}")
+        self._publish(job)
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _publish(self, job):
+        """Copy the job's current state to the shared registry, if any"""
+        if self.registry is None:
+            return
+        try:
+            self.registry.publish(job.id, *job.snapshot())
+        except Exception as e:
+            print(f"⚠️ Could not publish analysis job {job.id}: {e}")
+
+    def _run(self, job, fn, args, kwargs):
+        job._set_status(AnalysisJob.RUNNING, started_at=datetime.now().isoformat())
+        self._publish(job)
+        try:
+            result = fn(*args, **kwargs)
+            job._set_status(
+                AnalysisJob.COMPLETED,
+                result=result,
+                finished_at=datetime.now().isoformat(),
+                finished_monotonic=time.monotonic()
+            )
+            outcome = 'completed'
+        except Exception as e:
+            print(f"❌ Analysis job {job.id} failed: {e}")
+            job._set_status(
+                AnalysisJob.FAILED,
+                error=str(e),
+                finished_at=datetime.now().isoformat(),
+                finished_monotonic=time.monotonic()
+            )
+            outcome = 'failed'
+        finally:
+            self._slots.release()
+
+        self._publish(job)
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_monotonic is not None and now - job.finished_monotonic > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Return the job with this id, or None if unknown or expired.
+
+        Jobs submitted to another worker come back as a RemoteAnalysisJob
+        when a shared registry is configured.
+        """
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+        if job is not None or self.registry is None:
+            return job
+        snapshot = self.registry.get(job_id)
+        if snapshot is None:
+            return None
+        return RemoteAnalysisJob(self.registry, job_id, *snapshot)
+
+    def get_stats(self):
+        """Return pool counters"""
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if not job.done)
+            return {
+                **self.stats,
+                'active': active,
+                'tracked': len(self._jobs),
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending
+            }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'AnalysisJobConfig',
+    'AnalysisJob',
+    'RemoteAnalysisJob',
+    'AnalysisJobManager',
+    'JobQueueFullError'
+]
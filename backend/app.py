@@ -2,12 +2,13 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import json
 from datetime import datetime
+from shared_state import create_log
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
 
-# Store Gemini detection results
-gemini_results = []
+# Store Gemini detection results (shared by all workers with SHARED_STATE_BACKEND=sqlite)
+gemini_results = create_log('app_gemini_results')
 
 @app.route('/')
 def hello_world():
@@ -15,7 +16,8 @@ def hello_world():
         'message': 'Food Detection API',
         'endpoints': [
             'GET /api/gemini-results - Get all Gemini detection results',
-            'POST /api/gemini-results - Add new Gemini detection result'
+            'POST /api/gemini-results - Add new Gemini detection result',
+            'POST /api/gemini-results/bulk - Add several Gemini detection results'
         ]
     })
 
@@ -24,10 +26,28 @@ def get_gemini_results():
     """Get all Gemini detection results."""
     return jsonify({
         'success': True,
-        'results': gemini_results,
+        'results': gemini_results.items(),
         'count': len(gemini_results)
     })
 
+def make_result(data):
+    """Create a result entry from a posted detection (its id is set by store_result)."""
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'name': data.get('name', 'Unknown Food'),
+        'quality': data.get('quality', 'Unknown'),
+        'quantity': data.get('quantity', 'Unknown'),
+        'condition': data.get('condition', 'Unknown'),
+        'safe_to_eat': data.get('safe_to_eat', 'Unknown'),
+        'community_share': data.get('community_share', 'Unknown'),
+        'confidence': data.get('confidence', 0.0)
+    }
+
+def store_result(result, prefix='gemini'):
+    """Append a result, numbering its id inside the append so workers never reuse one."""
+    gemini_results.append(result, id_format=f'{prefix}_{{version}}_{int(datetime.now().timestamp())}')
+    return result
+
 @app.route('/api/gemini-results', methods=['POST'])
 def add_gemini_result():
     """Add a new Gemini detection result."""
@@ -35,19 +55,7 @@ def add_gemini_result():
         data = request.get_json()
         
         # Create result entry
-        result = {
-            'id': f'gemini_{len(gemini_results) + 1}_{int(datetime.now().timestamp())}',
-            'timestamp': datetime.now().isoformat(),
-            'name': data.get('name', 'Unknown Food'),
-            'quality': data.get('quality', 'Unknown'),
-            'quantity': data.get('quantity', 'Unknown'),
-            'condition': data.get('condition', 'Unknown'),
-            'safe_to_eat': data.get('safe_to_eat', 'Unknown'),
-            'community_share': data.get('community_share', 'Unknown'),
-            'confidence': data.get('confidence', 0.0)
-        }
-        
-        gemini_results.append(result)
+        result = store_result(make_result(data))
         
         return jsonify({
             'success': True,
@@ -61,11 +69,32 @@ def add_gemini_result():
             'error': str(e)
         }), 400
 
+@app.route('/api/gemini-results/bulk', methods=['POST'])
+def add_gemini_results_bulk():
+    """Add several Gemini detection results posted together as {"results": [...]}."""
+    try:
+        data = request.get_json()
+        
+        added = []
+        for item in data['results']:
+            added.append(store_result(make_result(item)))
+        
+        return jsonify({
+            'success': True,
+            'count': len(added),
+            'total_count': len(gemini_results)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
 @app.route('/api/test-detection', methods=['POST'])
 def add_test_detection():
     """Add a test Gemini detection for demo purposes."""
     test_result = {
-        'id': f'test_{len(gemini_results) + 1}_{int(datetime.now().timestamp())}',
         'timestamp': datetime.now().isoformat(),
         'name': 'Apple',
         'quality': 'Fresh',
@@ -76,7 +105,7 @@ def add_test_detection():
         'confidence': 0.85
     }
     
-    gemini_results.append(test_result)
+    store_result(test_result, prefix='test')
     
     return jsonify({
         'success': True,
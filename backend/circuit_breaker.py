@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Upstream Circuit Breakers
+One breaker per upstream service (Gemini, ElevenLabs). After repeated
+failures a breaker opens and calls fail immediately with CircuitOpenError
+(a 503 with Retry-After at the API) instead of tying up worker threads on
+timeouts. Once the reset period has passed, a limited number of probe calls
+are let through (half-open); a successful probe closes the breaker.
+"""
+
+import os
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+from flask import jsonify
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class CircuitBreakerConfig:
+    """Configuration for upstream circuit breakers"""
+
+    # Consecutive failures that open a breaker
+    FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    # How long an open breaker fails fast before probing
+    RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+    # Probe calls allowed at once while half-open
+    HALF_OPEN_MAX_CALLS = int(os.getenv('CIRCUIT_HALF_OPEN_MAX_CALLS', '1'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open); retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+# ==================== BREAKER ====================
+
+class CircuitBreaker:
+    """
+    Closed -> open after FAILURE_THRESHOLD consecutive failures;
+    open -> half-open after RESET_SECONDS; half-open -> closed on a
+    successful probe, or back to open on a failed one.
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_seconds=None, half_open_max_calls=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or CircuitBreakerConfig.FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds if reset_seconds is not None else CircuitBreakerConfig.RESET_SECONDS
+        self.half_open_max_calls = half_open_max_calls or CircuitBreakerConfig.HALF_OPEN_MAX_CALLS
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'failures': 0,
+            'rejected': 0,
+            'opened': 0
+        }
+
+    def _retry_after(self):
+        return max(1.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def before_call(self):
+        """
+        Admit a call or fail fast.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with all
+                probe slots taken
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    self.stats['rejected'] += 1
+                    raise CircuitOpenError(self.name, self._retry_after())
+                self.state = HALF_OPEN
+                self._probes = 0
+                print(f"🔌 {self.name} circuit half-open - probing")
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_max_calls:
+                    self.stats['rejected'] += 1
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes += 1
+            self.stats['calls'] += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                print(f"🔌 {self.name} circuit closed")
+            self.state = CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.stats['opened'] += 1
+                print(f"🔌 {self.name} circuit OPEN after {self._failures} failures - "
+                      f"failing fast for {self.reset_seconds:.0f}s")
+
+    def release_probe(self):
+        """Give back a half-open probe slot for a call that neither succeeded nor failed upstream"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    @contextmanager
+    def guard(self, is_failure=lambda error: True):
+        """
+        Run a block as one call through the breaker.
+
+        Args:
+            is_failure: Decides whether an exception from the block counts
+                against the upstream (e.g. not for our own bad requests)
+        """
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.release_probe()
+            raise
+        self.record_success()
+
+    def get_stats(self):
+        with self._lock:
+            stats = {
+                **self.stats,
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_seconds': self.reset_seconds
+            }
+            if self.state == OPEN:
+                stats['retry_after_seconds'] = round(self._retry_after(), 1)
+            return stats
+
+# ==================== REGISTRY ====================
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """The process-wide breaker for an upstream, created on first use"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def get_stats():
+    """State and counters of every breaker"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_stats() for name, breaker in breakers.items()}
+
+def circuit_open_response(error):
+    """503 response with Retry-After for a CircuitOpenError"""
+    response = jsonify({
+        'success': False,
+        'error': f'{error.name} is temporarily unavailable',
+        'retry_after': math.ceil(error.retry_after)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'CircuitBreakerConfig',
+    'CircuitOpenError',
+    'CircuitBreaker',
+    'get_breaker',
+    'get_stats',
+    'circuit_open_response'
+]
@@ -5,10 +5,13 @@ Handles AI-generated help messages for ingredient requests
 """
 
 import os
-import google.genai as genai
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from dotenv import load_dotenv
+from http_caching import conditional_get
+from shared_state import create_log
+from gemini_gateway import get_gateway
+from circuit_breaker import CircuitOpenError, circuit_open_response
 
 # Load environment variables
 load_dotenv()
@@ -107,7 +110,7 @@ class GeminiService:
     def __init__(self):
         """Initialize Gemini service"""
         CommunityHelpConfig.validate()
-        self.client = genai.Client(api_key=CommunityHelpConfig.GEMINI_API_KEY)
+        self.gateway = get_gateway()
     
     def generate_help_message(self, help_request):
         """Generate help message using Gemini AI"""
@@ -128,9 +131,10 @@ Create a natural, conversational message asking neighbors if they can help with
             full_prompt = f"{CommunityHelpConfig.SYSTEM_PROMPT}\n\n{user_prompt}"
             
             # Generate content using new API
-            response = self.client.models.generate_content(
-                model=CommunityHelpConfig.GEMINI_MODEL,
-                contents=full_prompt
+            response = self.gateway.generate_content(
+                'community_help',
+                full_prompt,
+                model=CommunityHelpConfig.GEMINI_MODEL
             )
             
             if not response or not response.text:
@@ -147,6 +151,8 @@ Create a natural, conversational message asking neighbors if they can help with
             
             return message
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
 
@@ -156,7 +162,17 @@ class CommunityHelpService:
     def __init__(self):
         """Initialize community help service"""
         self.gemini_service = GeminiService()
-        self.help_messages = []  # In-memory storage (could be replaced with database)
+        # Shared by all workers with SHARED_STATE_BACKEND=sqlite, else in this process
+        self.messages = create_log('help_messages')
+    
+    @property
+    def help_messages(self):
+        return self.messages.items()
+    
+    @property
+    def version(self):
+        """Bumped on every post; equals the number of messages"""
+        return self.messages.version
     
     def generate_message(self, help_request):
         """Generate help message for a request"""
@@ -164,23 +180,29 @@ class CommunityHelpService:
             message_text = self.gemini_service.generate_help_message(help_request)
             help_message = HelpMessage(message_text, help_request)
             return help_message
+        except CircuitOpenError:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate message: {str(e)}")
     
     def post_message(self, help_request):
         """Post a help message to the community"""
         try:
-            # Store the message (in production, this would save to database)
-            self.help_messages.append(help_request.to_dict())
+            # Store the message
+            request_id = self.messages.append(help_request.to_dict())
             
             return {
                 'success': True,
                 'message': 'Help request posted successfully',
-                'request_id': len(self.help_messages),
+                'request_id': request_id,
                 'timestamp': help_request.timestamp
             }
         except Exception as e:
             raise Exception(f"Failed to post message: {str(e)}")
+    
+    def messages_since(self, version):
+        """Return messages posted after the given version, or None if version is unknown"""
+        return self.messages.since(version)
 
 # Global service instance
 community_service = None
@@ -246,6 +268,9 @@ def generate_help_message():
             'details': str(e)
         }), 400
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -312,10 +337,19 @@ def post_help_message():
         }), 500
 
 @community_help_bp.route('/help-messages', methods=['GET'])
+@conditional_get(
+    lambda: community_service.version if community_service else None,
+    lambda version: community_service.messages_since(version),
+    changes_key='messages',
+    get_epoch=lambda: community_service.messages.epoch if community_service else None
+)
 def get_help_messages():
     """
     Get all posted help messages (for testing/admin purposes)
     
+    Supports If-None-Match (304 when nothing was posted) and
+    ?since_version=<X-Version> for only the newer messages.
+    
     Response JSON:
     {
         "success": true,
@@ -330,10 +364,11 @@ def get_help_messages():
                 'error': 'Community Help service not initialized'
             }), 503
         
+        messages = community_service.help_messages
         return jsonify({
             'success': True,
-            'messages': community_service.help_messages,
-            'count': len(community_service.help_messages)
+            'messages': messages,
+            'count': len(messages)
         }), 200
         
     except Exception as e:
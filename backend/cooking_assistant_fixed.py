@@ -4,30 +4,27 @@ CLI Cooking Assistant using Google Gemini API
 A terminal-based cooking assistant that suggests dishes from ingredients or ingredients from dishes.
 """
 
-import os
 import sys
-from dotenv import load_dotenv
-import google.genai as genai
+from gemini_gateway import get_gateway
+from circuit_breaker import CircuitOpenError
 
 class CookingAssistant:
+    # Part of the recipe cache key; bump when a prompt template or the parser changes
+    PROMPT_VERSION = 1
+    
     def __init__(self):
         """Initialize the cooking assistant with Gemini API."""
-        self.client = None
+        self.gateway = None
         self.setup_api()
     
     def setup_api(self):
-        """Set up Gemini API connection."""
-        load_dotenv()
-        
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key or api_key == 'your_gemini_api_key_here':
-            print("Error: GEMINI_API_KEY not found or not configured.")
-            print("Please set your Gemini API key in the .env file.")
-            sys.exit(1)
-        
+        """Set up Gemini API access through the shared gateway."""
         try:
-            # Initialize the client with API key
-            self.client = genai.Client(api_key=api_key)
+            self.gateway = get_gateway()
+            if self.gateway is None:
+                print("Error: GEMINI_API_KEY not found or not configured.")
+                print("Please set your Gemini API key in the .env file.")
+                sys.exit(1)
             print("Gemini API configured successfully!")
         except Exception as e:
             print(f"Error configuring Gemini API: {e}")
@@ -256,24 +253,21 @@ Focus on a practical home-kitchen version using the ingredients I have available
     def get_gemini_response(self, prompt):
         """Get response from Gemini AI."""
         try:
-            # Use the latest Gemini Flash model
-            response = self.client.models.generate_content(
-                model='gemini-2.5-flash',  # Use latest available model
-                contents=prompt
-            )
+            # Retries with backoff and falls back to other models (see retry_policy.py)
+            response = self.gateway.generate_content('cooking', prompt, model='gemini-2.5-flash')
             return response.text
+        except CircuitOpenError:
+            # Gemini is down; the API turns this into a 503 with Retry-After
+            raise
         except Exception as e:
             print(f"Error getting response from Gemini: {e}")
-            # Try alternative model
-            try:
-                response = self.client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=prompt
-                )
-                return response.text
-            except Exception as e2:
-                print(f"Backup method also failed: {e2}")
-                return None
+            return None
+    
+    def stream_gemini_response(self, prompt):
+        """Yield the Gemini response text piece by piece as it is generated."""
+        for chunk in self.gateway.generate_content_stream('cooking', prompt, model='gemini-2.5-flash'):
+            if chunk.text:
+                yield chunk.text
     
     def format_output(self, response):
         """Format and display the response nicely."""
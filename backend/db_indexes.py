@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+MongoDB Index Bootstrap
+Declares the indexes the API's hot queries rely on, creates them at
+startup and uses explain() to verify that none of those queries has
+fallen back to a collection scan. On the SQLite backend the same check
+runs against EXPLAIN QUERY PLAN.
+
+Run directly to create the indexes and check the query plans:
+    python db_indexes.py
+"""
+
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from dotenv import load_dotenv
+
+import mongo_registry
+import storage
+from realtime_object_detection import DETECTIONS_DB, DETECTIONS_COLLECTION
+from gemini_ingredient_matcher import CommunityPostsDatabase
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class IndexConfig:
+    """Configuration for index management"""
+
+    ENSURE_ON_STARTUP = os.getenv('MONGODB_ENSURE_INDEXES', 'true').lower() in ('1', 'true', 'yes')
+    # off, warn (log collection scans) or strict (raise on collection scans)
+    PLAN_CHECK = os.getenv('MONGODB_QUERY_PLAN_CHECK', 'warn').lower()
+
+POSTS_DB = CommunityPostsDatabase.DB_NAME
+POSTS_COLLECTION = CommunityPostsDatabase.COLLECTION_NAME
+
+# (database, collection) -> indexes
+INDEXES = {
+    (DETECTIONS_DB, DETECTIONS_COLLECTION): [
+        IndexModel([('timestamp', DESCENDING)], name='timestamp_desc')
+    ],
+    (POSTS_DB, POSTS_COLLECTION): [
+        IndexModel([('type', ASCENDING), ('status', ASCENDING)], name='type_status')
+    ]
+}
+
+# Queries that must be served by an index
+HOT_QUERIES = [
+    {
+        'name': 'recent_detections',
+        'db': DETECTIONS_DB,
+        'collection': DETECTIONS_COLLECTION,
+        'filter': {},
+        'sort': [('timestamp', DESCENDING)],
+        'limit': 5
+    },
+    {
+        'name': 'posts_by_type',
+        'db': POSTS_DB,
+        'collection': POSTS_COLLECTION,
+        'filter': {'type': 'request', 'status': 'active'},
+        'sort': None,
+        'limit': 0
+    }
+]
+
+class QueryPlanError(Exception):
+    """Raised when a hot query is planned as a collection scan"""
+
+# ==================== HELPERS ====================
+
+def plan_stages(plan):
+    """Return every stage name in an explain() plan tree."""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if 'stage' in node:
+            stages.append(node['stage'])
+        # Classic plans nest inputStage(s); slot-based plans wrap them in queryPlan
+        for key in ('inputStage', 'queryPlan'):
+            if key in node:
+                pending.append(node[key])
+        pending.extend(node.get('inputStages', []))
+    return stages
+
+# ==================== INDEX MANAGEMENT ====================
+
+def ensure_indexes():
+    """
+    Create the declared indexes (a no-op for ones that already exist).
+
+    Returns:
+        Dict mapping 'db.collection' to the created index names, or to an
+        error string if creation failed
+    """
+    results = {}
+    for (db_name, collection_name), indexes in INDEXES.items():
+        key = f"{db_name}.{collection_name}"
+        collection = mongo_registry.get_collection(db_name, collection_name)
+        if collection is None:
+            continue
+        try:
+            results[key] = collection.create_indexes(indexes)
+            print(f"✅ Indexes ready on {key}: {', '.join(results[key])}")
+        except Exception as e:
+            results[key] = f"error: {e}"
+            print(f"❌ Could not create indexes on {key}: {e}")
+    return results
+
+def check_query_plans(strict=False):
+    """
+    Explain each hot query and flag any that use a collection scan.
+
+    Args:
+        strict: Raise QueryPlanError instead of only logging
+
+    Returns:
+        Dict mapping query name to {'stages': [...], 'collscan': bool}
+    """
+    report = {}
+    scans = []
+    for query in HOT_QUERIES:
+        collection = mongo_registry.get_collection(query['db'], query['collection'])
+        if collection is None:
+            continue
+        cursor = collection.find(query['filter'])
+        if query['sort']:
+            cursor = cursor.sort(query['sort'])
+        if query['limit']:
+            cursor = cursor.limit(query['limit'])
+
+        explanation = cursor.explain()
+        stages = plan_stages(explanation.get('queryPlanner', {}).get('winningPlan', {}))
+        collscan = 'COLLSCAN' in stages
+        report[query['name']] = {'stages': stages, 'collscan': collscan}
+        if collscan:
+            scans.append(query['name'])
+            print(f"❌ COLLECTION SCAN: hot query '{query['name']}' on "
+                  f"{query['db']}.{query['collection']} is not using an index ({' <- '.join(stages)})")
+
+    if scans and strict:
+        raise QueryPlanError(f"Hot queries planned as collection scans: {', '.join(scans)}")
+    return report
+
+def check_sqlite_query_plans(strict=False):
+    """
+    EXPLAIN QUERY PLAN the SQLite versions of the hot queries.
+
+    Returns:
+        Dict mapping query name to {'plan': [...], 'collscan': bool}
+    """
+    report = storage.get_sqlite_database().check_query_plans()
+    scans = [name for name, entry in report.items() if entry['collscan']]
+    for name in scans:
+        print(f"❌ TABLE SCAN: hot query '{name}' on SQLite is not using an index "
+              f"({'; '.join(report[name]['plan'])})")
+    if scans and strict:
+        raise QueryPlanError(f"Hot queries planned as table scans: {', '.join(scans)}")
+    return report
+
+def bootstrap():
+    """
+    Startup hook: ensure indexes and check hot query plans per IndexConfig.
+
+    Raises:
+        QueryPlanError: If PLAN_CHECK is 'strict' and a hot query scans
+    """
+    if not IndexConfig.ENSURE_ON_STARTUP:
+        return
+    if storage.selected_backend() == 'sqlite':
+        # SQLite indexes are part of the schema; only the plans need checking
+        if IndexConfig.PLAN_CHECK != 'off':
+            check_sqlite_query_plans(strict=IndexConfig.PLAN_CHECK == 'strict')
+        return
+    if not mongo_registry.is_configured():
+        return
+    if not mongo_registry.ping():
+        print("⚠️ MongoDB unreachable - skipping index bootstrap")
+        return
+    ensure_indexes()
+    if IndexConfig.PLAN_CHECK == 'off':
+        return
+    try:
+        check_query_plans(strict=IndexConfig.PLAN_CHECK == 'strict')
+    except QueryPlanError:
+        raise
+    except Exception as e:
+        print(f"⚠️ Could not check query plans: {e}")
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'IndexConfig',
+    'INDEXES',
+    'HOT_QUERIES',
+    'QueryPlanError',
+    'plan_stages',
+    'ensure_indexes',
+    'check_query_plans',
+    'check_sqlite_query_plans',
+    'bootstrap'
+]
+
+if __name__ == '__main__':
+    if not mongo_registry.is_configured():
+        print("❌ MONGODB_URI not found in environment variables")
+        sys.exit(1)
+    ensure_indexes()
+    try:
+        check_query_plans(strict=True)
+    except QueryPlanError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ All hot queries use indexes")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures for the detection tests.
+
+Import this before any service module: it keeps the services offline and
+file-free before they read their config.
+"""
+
+import os
+
+import cv2
+
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+os.environ['MONGODB_URI'] = ''
+os.environ['STORAGE_BACKEND'] = 'none'
+
+from realtime_object_detection import GeminiVisionDetector
+
+def detection_text(name='Apple'):
+    """One detection in the layout the detection prompt asks Gemini for"""
+    return f"""ITEM: {name}
+POSITION: center middle
+QUALITY: Fresh
+QUANTITY: Medium portion
+CONDITION: Ripe
+SAFE: Yes - no bruising
+COMMUNITY: Yes - good to share
+---
+"""
+
+def encode_jpeg(frame):
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    assert ok
+    return buffer.tobytes()
+
+class FakeDetectionRequest:
+    """Stands in for GeminiVisionDetector.request_detection and counts calls"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def __call__(self, image_data, mime_type='image/jpeg'):
+        self.calls += 1
+        return self.text
+
+def offline_detector(text=None):
+    """
+    A GeminiVisionDetector that never calls Gemini.
+
+    Single-image requests answer with text (one Apple by default); the fake
+    is available as detector.request_detection to check its call count.
+    """
+    detector = GeminiVisionDetector()
+    detector.cache = None
+    detector.request_detection = FakeDetectionRequest(text or detection_text())
+    return detector
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Continuous Detection Session
+Background thread that samples frames from a camera or video file and runs
+them through GeminiVisionDetector at an adaptive rate.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+import cv2
+from dotenv import load_dotenv
+
+from frame_gates import FrameRejectedError, create_scene_gate
+from circuit_breaker import CircuitOpenError
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class DetectionSessionConfig:
+    """Configuration for server-side continuous detection"""
+
+    # Camera index (e.g. "0") or path to a video file
+    DEFAULT_SOURCE = os.getenv('DETECTION_SOURCE', '0')
+    # Never sample faster than this
+    MIN_INTERVAL_SECONDS = float(os.getenv('DETECTION_MIN_INTERVAL_SECONDS', '2'))
+    # Gemini call budget for a session
+    CALLS_PER_MINUTE = float(os.getenv('DETECTION_CALLS_PER_MINUTE', '12'))
+    # Interval is at least this multiple of the smoothed Gemini latency
+    LATENCY_FACTOR = float(os.getenv('DETECTION_LATENCY_FACTOR', '1.5'))
+    # Weight of the newest sample in the latency moving average
+    LATENCY_SMOOTHING = 0.3
+    # Frames re-read locally after a quality-gate rejection before waiting a full interval
+    QUALITY_RETRIES = int(os.getenv('DETECTION_QUALITY_RETRIES', '3'))
+    QUALITY_RETRY_DELAY_SECONDS = 0.2
+
+def parse_source(source):
+    """Turn '0'-style strings into camera indexes; leave file paths alone."""
+    if isinstance(source, int):
+        return source
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+# ==================== SESSION ====================
+
+class DetectionSession(threading.Thread):
+    """
+    Samples frames from a source and analyzes them until stopped.
+
+    The sampling interval is the largest of the configured minimum, the
+    calls-per-minute budget and LATENCY_FACTOR times the smoothed Gemini
+    latency, so a slow upstream automatically slows the session down.
+    Video files are played against the wall clock (frames are skipped to
+    the current position) so they behave like a live camera.
+    """
+
+    def __init__(self, detector, on_results, source=None, min_interval=None,
+                 calls_per_minute=None, loop_video=False):
+        super().__init__(name='detection-session', daemon=True)
+        self.detector = detector
+        self.on_results = on_results
+        self.source = parse_source(source if source is not None else DetectionSessionConfig.DEFAULT_SOURCE)
+        self.is_file = isinstance(self.source, str)
+        self.min_interval = min_interval if min_interval is not None else DetectionSessionConfig.MIN_INTERVAL_SECONDS
+        self.calls_per_minute = calls_per_minute or DetectionSessionConfig.CALLS_PER_MINUTE
+        self.loop_video = loop_video
+        self.stopped = threading.Event()
+        self.ready = threading.Event()
+        self.error = None
+        self.latency = None
+        self.scene_gate = create_scene_gate()  # Reference frame for this session only
+        # Guards rejected_reasons, which get_status copies from request threads
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'frames_sampled': 0,
+            'detections': 0,
+            'rejected_frames': 0,
+            'rejected_reasons': {},
+            'circuit_open_waits': 0,
+            'started_at': None,
+            'finished_at': None,
+            'last_sample_at': None
+        }
+
+    @property
+    def interval(self):
+        """Current seconds between samples"""
+        interval = max(self.min_interval, 60.0 / self.calls_per_minute)
+        if self.latency is not None:
+            interval = max(interval, self.latency * DetectionSessionConfig.LATENCY_FACTOR)
+        return interval
+
+    def _record_latency(self, seconds):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            weight = DetectionSessionConfig.LATENCY_SMOOTHING
+            self.latency = weight * seconds + (1 - weight) * self.latency
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise RuntimeError(f"Could not open detection source: {self.source}")
+        if not self.is_file:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _read_video_frame(self, cap, fps, playback_start):
+        """Skip to the frame matching wall-clock playback time and decode it."""
+        target = int((time.monotonic() - playback_start) * fps)
+        position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        while position < target:
+            if not cap.grab():
+                return None
+            position += 1
+        ret, frame = cap.read()
+        return frame if ret else None
+
+    def _read_camera_frame(self, cap):
+        """Drop any buffered frame and return a fresh one."""
+        cap.grab()
+        ret, frame = cap.read()
+        return frame if ret else None
+
+    def _read_frame(self, cap, fps, playback_start):
+        """
+        Read the next frame for this source.
+        
+        Returns:
+            Tuple of (frame or None, possibly reset playback_start)
+        """
+        if not self.is_file:
+            return self._read_camera_frame(cap), playback_start
+        frame = self._read_video_frame(cap, fps, playback_start)
+        if frame is None and self.loop_video:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            playback_start = time.monotonic()
+            frame = self._read_video_frame(cap, fps, playback_start)
+        return frame, playback_start
+
+    def _analyze(self, cap, fps, playback_start, frame):
+        """
+        Analyze a frame, re-reading a fresh one locally when the quality gate
+        rejects it.
+
+        Returns:
+            Tuple of (detections, playback_start); detections is None if every
+            attempt was rejected or the source ran out of frames
+        """
+        for attempt in range(DetectionSessionConfig.QUALITY_RETRIES + 1):
+            try:
+                return self.detector.detect_and_analyze_food(frame, scene_gate=self.scene_gate), playback_start
+            except FrameRejectedError as e:
+                with self._stats_lock:
+                    self.stats['rejected_frames'] += 1
+                    reasons = self.stats['rejected_reasons']
+                    reasons[e.reason] = reasons.get(e.reason, 0) + 1
+                if attempt == DetectionSessionConfig.QUALITY_RETRIES:
+                    break
+                if self.stopped.wait(DetectionSessionConfig.QUALITY_RETRY_DELAY_SECONDS):
+                    break
+                frame, playback_start = self._read_frame(cap, fps, playback_start)
+                if frame is None:
+                    break
+            except CircuitOpenError as e:
+                # Gemini is down: skip sampling until the breaker allows a probe
+                with self._stats_lock:
+                    self.stats['circuit_open_waits'] += 1
+                self.stopped.wait(e.retry_after)
+                break
+        return None, playback_start
+
+    def run(self):
+        self.stats['started_at'] = datetime.now().isoformat()
+        try:
+            cap = self._open()
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ {self.error}")
+            self.stats['finished_at'] = datetime.now().isoformat()
+            self.ready.set()
+            return
+        self.ready.set()
+
+        fps = (cap.get(cv2.CAP_PROP_FPS) or 30.0) if self.is_file else None
+        playback_start = time.monotonic()
+        print(f"🎥 Detection session started on source {self.source!r}")
+
+        try:
+            while not self.stopped.is_set():
+                sample_start = time.monotonic()
+
+                frame, playback_start = self._read_frame(cap, fps, playback_start)
+
+                if frame is None:
+                    if self.is_file:
+                        print("🎥 Detection source reached end of video")
+                    else:
+                        self.error = "Could not read frame from camera"
+                        print(f"❌ {self.error}")
+                    break
+
+                self.stats['frames_sampled'] += 1
+                self.stats['last_sample_at'] = datetime.now().isoformat()
+                frame_number = self.stats['frames_sampled']
+
+                call_start = time.monotonic()
+                detections, playback_start = self._analyze(cap, fps, playback_start, frame)
+                if detections is not None:
+                    self._record_latency(time.monotonic() - call_start)
+
+                if detections:
+                    self.stats['detections'] += len(detections)
+                    try:
+                        self.on_results(detections, {
+                            'capture_count': frame_number,
+                            'frame_count': frame_number
+                        })
+                    except Exception as e:
+                        print(f"⚠️ Detection session result handler error: {e}")
+
+                # Sleep out the rest of the interval (wakes immediately on stop)
+                remaining = self.interval - (time.monotonic() - sample_start)
+                if remaining > 0:
+                    self.stopped.wait(remaining)
+        except Exception as e:
+            self.error = str(e)
+            print(f"❌ Detection session error: {e}")
+        finally:
+            cap.release()
+            self.stats['finished_at'] = datetime.now().isoformat()
+            print("🎥 Detection session stopped")
+
+    def stop(self, timeout=5.0):
+        """Signal the session to stop and wait for the thread to exit"""
+        self.stopped.set()
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def get_status(self):
+        """Return session configuration, adaptive interval and counters"""
+        with self._stats_lock:
+            stats = {**self.stats, 'rejected_reasons': dict(self.stats['rejected_reasons'])}
+        return {
+            'active': self.is_alive() and not self.stopped.is_set(),
+            'source_type': 'video' if self.is_file else 'camera',
+            'interval_seconds': round(self.interval, 2),
+            'gemini_latency_seconds': round(self.latency, 2) if self.latency is not None else None,
+            'min_interval_seconds': self.min_interval,
+            'calls_per_minute': self.calls_per_minute,
+            'error': self.error,
+            'scene_gate': self.scene_gate.get_stats() if self.scene_gate is not None else None,
+            **stats
+        }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'DetectionSessionConfig',
+    'DetectionSession',
+    'parse_source'
+]
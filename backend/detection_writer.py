@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Write-Behind Detection Writer
+Buffers detection documents in memory and writes them to the storage
+backend (MongoDB or SQLite, see storage.py) with insert_many from a
+background thread, spilling to a bounded local file while the database
+is unreachable.
+"""
+
+import os
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process spill lock
+    fcntl = None
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class WriteBehindConfig:
+    """Configuration for batched detection persistence"""
+
+    # Flush as soon as this many documents are buffered
+    BATCH_SIZE = int(os.getenv('DETECTION_WRITE_BATCH_SIZE', '50'))
+    # ...or when the oldest buffered document is this old
+    FLUSH_INTERVAL_SECONDS = float(os.getenv('DETECTION_WRITE_FLUSH_SECONDS', '2'))
+    # Documents held in memory before new ones are dropped
+    MAX_BUFFERED = int(os.getenv('DETECTION_WRITE_MAX_BUFFERED', '5000'))
+    # Local file used while MongoDB is unreachable (shared by every worker,
+    # guarded by an flock on SPILL_PATH + '.lock')
+    SPILL_PATH = os.getenv('DETECTION_SPILL_PATH', 'detection_spill.jsonl')
+    SPILL_MAX_BYTES = int(os.getenv('DETECTION_SPILL_MAX_BYTES', str(10 * 1024 * 1024)))
+    # Wait this long after a failed write before trying MongoDB again
+    RETRY_SECONDS = float(os.getenv('DETECTION_WRITE_RETRY_SECONDS', '10'))
+
+DUPLICATE_KEY_ERROR = 11000
+
+# ==================== WRITER ====================
+
+class DetectionWriter:
+    """
+    Background writer for detection documents.
+
+    enqueue() only appends to an in-memory buffer. The writer thread drains
+    the buffer with insert_many when BATCH_SIZE documents are waiting or
+    FLUSH_INTERVAL_SECONDS have passed. A batch that cannot be written is
+    appended to the spill file (up to SPILL_MAX_BYTES, then dropped), and
+    the spill file is replayed once MongoDB accepts writes again. Workers
+    share the spill file, so appends and replays hold an exclusive lock on
+    a sidecar lock file; a replay keeps it until the file is removed or
+    rewritten, so no other worker appends lines that would be lost.
+
+    The target collection is looked up through get_collection() for every
+    batch, and a writer inherited across a fork starts a fresh thread (with
+    an empty buffer) in the child on its first enqueue().
+    """
+
+    def __init__(self, get_collection, batch_size=None, flush_interval=None, max_buffered=None,
+                 spill_path=None, spill_max_bytes=None):
+        """
+        Initialize the writer; call start() to begin flushing.
+
+        Args:
+            get_collection: Callable returning the target collection (or None)
+        """
+        self.get_collection = get_collection
+        self.batch_size = batch_size or WriteBehindConfig.BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else WriteBehindConfig.FLUSH_INTERVAL_SECONDS
+        self.max_buffered = max_buffered or WriteBehindConfig.MAX_BUFFERED
+        self.spill_path = spill_path or WriteBehindConfig.SPILL_PATH
+        self.spill_max_bytes = spill_max_bytes if spill_max_bytes is not None else WriteBehindConfig.SPILL_MAX_BYTES
+        self._buffer = deque()
+        self._oldest_at = None
+        self._flush_requested = False
+        self._in_flight = 0
+        self._retry_at = 0.0
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'dropped': 0
+        }
+
+    # ---------- request path ----------
+
+    def enqueue(self, document):
+        """
+        Buffer a document for the next batch.
+
+        Returns:
+            True if buffered, False if the buffer is full and it was dropped
+        """
+        with self._condition:
+            if self._pid is not None and self._pid != os.getpid():
+                # First write in a forked child
+                self.start()
+            if len(self._buffer) >= self.max_buffered:
+                self.stats['dropped'] += 1
+                return False
+            if not self._buffer:
+                self._oldest_at = time.monotonic()
+            self._buffer.append(document)
+            self.stats['enqueued'] += 1
+            # Wake the writer to start the flush timer, or to flush a full batch
+            if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+            return True
+
+    # ---------- writer thread ----------
+
+    def _batch_due(self):
+        if not self._buffer:
+            return False
+        if self._flush_requested or self._stopped:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        return (len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._oldest_at >= self.flush_interval)
+
+    def _next_wakeup(self):
+        if not self._buffer:
+            return None
+        deadline = max(self._oldest_at + self.flush_interval, self._retry_at)
+        return max(0.0, deadline - time.monotonic())
+
+    def run(self):
+        self._replay_spill()
+        while True:
+            with self._condition:
+                while not self._batch_due():
+                    if self._stopped:
+                        return
+                    self._condition.wait(self._next_wakeup())
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._oldest_at = time.monotonic() if self._buffer else None
+                self._in_flight = len(batch)
+
+            if self._write(batch):
+                self._replay_spill()
+            else:
+                self._spill(batch)
+                if self._stopped:
+                    # Shutting down: don't wait on MongoDB for every remaining batch
+                    with self._condition:
+                        remaining = list(self._buffer)
+                        self._buffer.clear()
+                    if remaining:
+                        self._spill(remaining)
+
+            with self._condition:
+                self._in_flight = 0
+                if not self._buffer:
+                    self._flush_requested = False
+                self._condition.notify_all()
+
+    def _write(self, documents):
+        """insert_many a batch; returns True once every document is stored"""
+        try:
+            collection = self.get_collection()
+            if collection is None:
+                raise RuntimeError("Detection storage is not configured")
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Documents replayed from the spill file may already be stored
+            errors = e.details.get('writeErrors', [])
+            if not errors or any(error.get('code') != DUPLICATE_KEY_ERROR for error in errors):
+                return self._write_failed(e)
+        except Exception as e:
+            return self._write_failed(e)
+
+        with self._condition:
+            self.stats['written'] += len(documents)
+            self.stats['batches'] += 1
+            self._retry_at = 0.0
+        print(f"✓ Saved {len(documents)} detections to the database")
+        return True
+
+    def _write_failed(self, error):
+        print(f"Error saving detections to the database: {error}")
+        with self._condition:
+            self.stats['failed_batches'] += 1
+            self._retry_at = time.monotonic() + WriteBehindConfig.RETRY_SECONDS
+        return False
+
+    @contextmanager
+    def _spill_lock(self):
+        """Hold an exclusive lock on the spill file across worker processes"""
+        with open(self.spill_path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _spill(self, documents):
+        """Append a failed batch to the spill file, dropping it if the file is full"""
+        lines = ''.join(json_util.dumps(document) + '\n' for document in documents)
+        try:
+            with self._spill_lock():
+                size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+                if size + len(lines.encode('utf-8')) > self.spill_max_bytes:
+                    print(f"⚠️ Detection spill file is full - dropping {len(documents)} detections")
+                    with self._condition:
+                        self.stats['dropped'] += len(documents)
+                    return
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            with self._condition:
+                self.stats['spilled'] += len(documents)
+            print(f"💾 Spilled {len(documents)} detections to {self.spill_path}")
+        except OSError as e:
+            print(f"Error writing detection spill file: {e}")
+            with self._condition:
+                self.stats['dropped'] += len(documents)
+
+    def _replay_spill(self):
+        """Write spilled documents back to MongoDB, then remove the spill file"""
+        if not os.path.exists(self.spill_path):
+            return
+        try:
+            with self._spill_lock():
+                documents = self._replay_spill_locked()
+        except OSError as e:
+            print(f"Error locking detection spill file: {e}")
+            return
+        if not documents:
+            return
+        with self._condition:
+            self.stats['replayed'] += len(documents)
+        print(f"✓ Replayed {len(documents)} spilled detections")
+
+    def _replay_spill_locked(self):
+        """
+        Replay the spill file while holding the spill lock.
+
+        Returns:
+            List of replayed documents (empty if nothing was fully replayed)
+        """
+        # Another worker may have replayed it while we waited for the lock
+        if not os.path.exists(self.spill_path):
+            return []
+        try:
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                documents = [json_util.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            print(f"Error reading detection spill file: {e}")
+            return []
+
+        for start in range(0, len(documents), self.batch_size):
+            if not self._write(documents[start:start + self.batch_size]):
+                # Keep only what has not been written yet
+                self._rewrite_spill(documents[start:])
+                return []
+
+        try:
+            os.remove(self.spill_path)
+        except OSError as e:
+            print(f"Error removing detection spill file: {e}")
+        return documents
+
+    def _rewrite_spill(self, documents):
+        try:
+            with open(self.spill_path, 'w', encoding='utf-8') as f:
+                f.writelines(json_util.dumps(document) + '\n' for document in documents)
+        except OSError as e:
+            print(f"Error rewriting detection spill file: {e}")
+
+    # ---------- control ----------
+
+    def flush(self, timeout=10.0):
+        """
+        Ask the writer to write everything buffered now and wait for it.
+
+        Returns:
+            True if the buffer drained within the timeout
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._buffer and not self._in_flight,
+                timeout=timeout
+            )
+
+    def close(self, timeout=10.0):
+        """Drain the buffer and stop the writer thread"""
+        if self._pid != os.getpid():
+            return
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def start(self):
+        """Start the writer thread for this process"""
+        if self._pid is None:
+            atexit.register(self.close)
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self.run, name='detection-writer', daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _reset_after_fork(self):
+        """Reset inherited state in a forked child; enqueue() starts its thread"""
+        # The parent still owns (and will write) whatever it had buffered
+        self._condition = threading.Condition()
+        self._buffer = deque()
+        self._oldest_at = None
+        self._flush_requested = False
+        self._in_flight = 0
+        self._retry_at = 0.0
+        self._stopped = False
+        self._thread = None
+
+    def get_stats(self):
+        """Return writer counters and buffer state"""
+        with self._condition:
+            stats = dict(self.stats)
+            buffered = len(self._buffer) + self._in_flight
+        spill_bytes = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+        return {
+            **stats,
+            'buffered': buffered,
+            'spill_bytes': spill_bytes,
+            'batch_size': self.batch_size,
+            'flush_interval_seconds': self.flush_interval
+        }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'WriteBehindConfig',
+    'DetectionWriter'
+]
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Frame Gates
+Cheap local checks that decide whether a frame is worth a Gemini call:
+a scene-change gate and a blur/exposure quality gate.
+"""
+
+import os
+import copy
+import time
+import threading
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class SceneGateConfig:
+    """Configuration for the scene-change gate"""
+
+    ENABLED = os.getenv('SCENE_GATE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Bhattacharyya distance between grayscale histograms (0 = identical)
+    HIST_THRESHOLD = float(os.getenv('SCENE_GATE_HIST_THRESHOLD', '0.08'))
+    # Structural similarity of the downscaled frames (1 = identical)
+    SSIM_THRESHOLD = float(os.getenv('SCENE_GATE_SSIM_THRESHOLD', '0.90'))
+    # Never reuse an analysis older than this
+    MAX_AGE_SECONDS = float(os.getenv('SCENE_GATE_MAX_AGE_SECONDS', '120'))
+    # Frames are compared at this size
+    COMPARE_SIZE = 64
+
+class QualityGateConfig:
+    """Configuration for the blur/exposure quality gate"""
+
+    ENABLED = os.getenv('QUALITY_GATE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Variance of the Laplacian below which a frame counts as blurry
+    BLUR_THRESHOLD = float(os.getenv('QUALITY_GATE_BLUR_THRESHOLD', '40'))
+    # Mean luminance (0-255) limits; wide enough for dark counters and high-key shots
+    DARK_THRESHOLD = float(os.getenv('QUALITY_GATE_DARK_THRESHOLD', '20'))
+    BRIGHT_THRESHOLD = float(os.getenv('QUALITY_GATE_BRIGHT_THRESHOLD', '240'))
+    # Largest fraction of pixels allowed to be saturated (<= CLIP_LOW or >= CLIP_HIGH)
+    CLIP_FRACTION = float(os.getenv('QUALITY_GATE_CLIP_FRACTION', '0.4'))
+    # Only truly crushed or blown pixels count; a white plate at ~240 is not clipped
+    CLIP_LOW = 5
+    CLIP_HIGH = 250
+    # Frames are measured at this width
+    MEASURE_WIDTH = 160
+
+# ==================== HELPERS ====================
+
+def small_grayscale(frame, size=SceneGateConfig.COMPARE_SIZE):
+    """Downscale a BGR or grayscale frame to a size x size grayscale array."""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if frame.shape[:2] != (size, size):
+        frame = cv2.resize(frame, (size, size), interpolation=cv2.INTER_AREA)
+    return frame
+
+def grayscale_histogram(gray):
+    """Normalized 32-bin grayscale histogram."""
+    hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+    return cv2.normalize(hist, hist).flatten()
+
+def ssim(a, b):
+    """Mean structural similarity of two equally sized grayscale images."""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+
+    mu_a = cv2.GaussianBlur(a, (7, 7), 1.5)
+    mu_b = cv2.GaussianBlur(b, (7, 7), 1.5)
+    mu_a_sq, mu_b_sq, mu_ab = mu_a * mu_a, mu_b * mu_b, mu_a * mu_b
+    sigma_a_sq = cv2.GaussianBlur(a * a, (7, 7), 1.5) - mu_a_sq
+    sigma_b_sq = cv2.GaussianBlur(b * b, (7, 7), 1.5) - mu_b_sq
+    sigma_ab = cv2.GaussianBlur(a * b, (7, 7), 1.5) - mu_ab
+
+    ssim_map = ((2 * mu_ab + c1) * (2 * sigma_ab + c2)) / (
+        (mu_a_sq + mu_b_sq + c1) * (sigma_a_sq + sigma_b_sq + c2)
+    )
+    return float(ssim_map.mean())
+
+def measure_grayscale(frame, width=QualityGateConfig.MEASURE_WIDTH):
+    """Downscale a BGR or grayscale frame to a fixed width, keeping aspect ratio."""
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    height, frame_width = frame.shape[:2]
+    if frame_width > width:
+        frame = cv2.resize(frame, (width, max(1, round(height * width / frame_width))),
+                           interpolation=cv2.INTER_AREA)
+    return frame
+
+class FrameRejectedError(Exception):
+    """Raised when a frame fails the quality gate"""
+
+    def __init__(self, reason, metrics):
+        self.reason = reason
+        self.metrics = metrics
+        super().__init__(f"Frame rejected by quality gate: {reason}")
+
+    def to_dict(self):
+        """Convert to an API error body"""
+        return {
+            'success': False,
+            'error': 'Image rejected by quality check',
+            'reason': self.reason,
+            'metrics': self.metrics
+        }
+
+# ==================== GATES ====================
+
+class SceneChangeGate:
+    """
+    Remembers the last frame sent to Gemini and its parsed detections.
+
+    A new frame counts as unchanged when its histogram distance is at or below
+    HIST_THRESHOLD and its SSIM is at or above SSIM_THRESHOLD; the previous
+    detections are then reused instead of calling Gemini.
+    """
+
+    def __init__(self, hist_threshold=None, ssim_threshold=None, max_age_seconds=None):
+        """Initialize an empty gate"""
+        self.hist_threshold = hist_threshold if hist_threshold is not None else SceneGateConfig.HIST_THRESHOLD
+        self.ssim_threshold = ssim_threshold if ssim_threshold is not None else SceneGateConfig.SSIM_THRESHOLD
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else SceneGateConfig.MAX_AGE_SECONDS
+        self._last = None  # dict with gray, hist, frame_shape, detections, analyzed_at
+        self._lock = threading.Lock()
+        self.stats = {
+            'unchanged': 0,
+            'changed': 0
+        }
+
+    def check(self, frame, frame_shape):
+        """
+        Compare a frame with the last analyzed one.
+
+        Returns:
+            Tuple of (reused detections or None, comparison state to pass to
+            remember() after a fresh analysis)
+        """
+        gray = small_grayscale(frame)
+        hist = grayscale_histogram(gray)
+        state = {'gray': gray, 'hist': hist}
+
+        with self._lock:
+            last = self._last
+            if (last is not None
+                    and last['frame_shape'][:2] == tuple(frame_shape[:2])
+                    and time.monotonic() - last['analyzed_at'] <= self.max_age_seconds):
+                distance = cv2.compareHist(last['hist'], hist, cv2.HISTCMP_BHATTACHARYYA)
+                if distance <= self.hist_threshold and ssim(last['gray'], gray) >= self.ssim_threshold:
+                    self.stats['unchanged'] += 1
+                    return copy.deepcopy(last['detections']), state
+            self.stats['changed'] += 1
+            return None, state
+
+    def remember(self, state, frame_shape, detections):
+        """Record a freshly analyzed frame and its parsed detections"""
+        with self._lock:
+            self._last = {
+                **state,
+                'frame_shape': tuple(frame_shape[:2]),
+                'detections': copy.deepcopy(detections),
+                'analyzed_at': time.monotonic()
+            }
+
+    def reset(self):
+        """Forget the last analyzed frame"""
+        with self._lock:
+            self._last = None
+
+    def get_stats(self):
+        """Return gate counters and thresholds"""
+        with self._lock:
+            return {
+                **self.stats,
+                'hist_threshold': self.hist_threshold,
+                'ssim_threshold': self.ssim_threshold,
+                'max_age_seconds': self.max_age_seconds
+            }
+
+def create_scene_gate():
+    """A new SceneChangeGate, or None if the gate is disabled"""
+    return SceneChangeGate() if SceneGateConfig.ENABLED else None
+
+class FrameQualityGate:
+    """
+    Rejects blurry, dark, overexposed or clipped frames before they reach Gemini.
+
+    All measurements run on a 160-pixel-wide grayscale copy, which keeps a
+    check well under a millisecond for camera-sized frames.
+    """
+
+    REASONS = ('blurry', 'too_dark', 'too_bright', 'clipped_shadows', 'clipped_highlights')
+
+    def __init__(self, blur_threshold=None, dark_threshold=None, bright_threshold=None, clip_fraction=None):
+        """Initialize the gate from explicit values or QualityGateConfig"""
+        self.blur_threshold = blur_threshold if blur_threshold is not None else QualityGateConfig.BLUR_THRESHOLD
+        self.dark_threshold = dark_threshold if dark_threshold is not None else QualityGateConfig.DARK_THRESHOLD
+        self.bright_threshold = bright_threshold if bright_threshold is not None else QualityGateConfig.BRIGHT_THRESHOLD
+        self.clip_fraction = clip_fraction if clip_fraction is not None else QualityGateConfig.CLIP_FRACTION
+        self._lock = threading.Lock()
+        self.stats = {'passed': 0, **{reason: 0 for reason in self.REASONS}}
+
+    def evaluate(self, frame):
+        """
+        Measure a frame.
+
+        Returns:
+            Tuple of (reason code or None if the frame passes, metrics dict)
+        """
+        gray = measure_grayscale(frame)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+        luminance = float(gray.mean())
+        shadows = float(np.count_nonzero(gray <= QualityGateConfig.CLIP_LOW)) / gray.size
+        highlights = float(np.count_nonzero(gray >= QualityGateConfig.CLIP_HIGH)) / gray.size
+
+        metrics = {
+            'sharpness': round(sharpness, 1),
+            'luminance': round(luminance, 1),
+            'shadow_fraction': round(shadows, 3),
+            'highlight_fraction': round(highlights, 3)
+        }
+
+        if luminance < self.dark_threshold:
+            reason = 'too_dark'
+        elif luminance > self.bright_threshold:
+            reason = 'too_bright'
+        elif shadows > self.clip_fraction:
+            reason = 'clipped_shadows'
+        elif highlights > self.clip_fraction:
+            reason = 'clipped_highlights'
+        elif sharpness < self.blur_threshold:
+            reason = 'blurry'
+        else:
+            reason = None
+
+        with self._lock:
+            self.stats[reason or 'passed'] += 1
+        return reason, metrics
+
+    def assess(self, frame):
+        """
+        Measure a frame without rejecting it (advisory mode for uploads).
+
+        Returns:
+            Dict with 'passed', 'reason' (None when passed) and 'metrics'
+        """
+        reason, metrics = self.evaluate(frame)
+        return {'passed': reason is None, 'reason': reason, 'metrics': metrics}
+
+    def check(self, frame):
+        """Raise FrameRejectedError if the frame fails the gate"""
+        reason, metrics = self.evaluate(frame)
+        if reason is not None:
+            raise FrameRejectedError(reason, metrics)
+        return metrics
+
+    def get_stats(self):
+        """Return per-reason counters and thresholds"""
+        with self._lock:
+            counters = dict(self.stats)
+        return {
+            **counters,
+            'rejected': sum(counters[reason] for reason in self.REASONS),
+            'blur_threshold': self.blur_threshold,
+            'dark_threshold': self.dark_threshold,
+            'bright_threshold': self.bright_threshold,
+            'clip_fraction': self.clip_fraction
+        }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'SceneGateConfig',
+    'SceneChangeGate',
+    'create_scene_gate',
+    'QualityGateConfig',
+    'FrameQualityGate',
+    'FrameRejectedError',
+    'measure_grayscale',
+    'small_grayscale',
+    'grayscale_histogram',
+    'ssim'
+]
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Gemini Gateway
+One shared genai.Client per process (so every caller reuses the same
+keep-alive HTTP connections) behind a requests-per-minute and
+tokens-per-minute budget and per-caller concurrency caps. The budget is
+shared by every worker with SHARED_STATE_BACKEND=sqlite and otherwise
+split evenly between the WEB_CONCURRENCY workers. Callers go
+through generate_content() (or generate_content_stream()) instead of
+building their own clients; failed calls are retried by the shared
+RetryPolicy (see retry_policy.py).
+"""
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+import google.genai as genai
+from google.genai import types
+
+from retry_policy import DEFAULT_POLICY, FATAL, classify_error
+from circuit_breaker import get_breaker
+import shared_state
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+def _parse_caps(spec):
+    """Parse 'vision=4,cooking=4' into {'vision': 4, 'cooking': 4}"""
+    caps = {}
+    for entry in (spec or '').split(','):
+        name, _, value = entry.partition('=')
+        if name.strip() and value.strip().isdigit():
+            caps[name.strip()] = int(value)
+    return caps
+
+class GeminiGatewayConfig:
+    """Configuration for the shared Gemini client and its limits"""
+
+    API_KEY = os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_GEMINI_API_KEY')
+    DEFAULT_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+    # Project quota to stay under; 0 disables a limit
+    REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_RPM', '60'))
+    TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TPM', '250000'))
+    # Worker processes (gunicorn reads the same variable); without shared
+    # state each one gets 1/WORKERS of the budget
+    WORKERS = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    # Longest a call waits for budget or a concurrency slot before failing
+    MAX_WAIT_SECONDS = float(os.getenv('GEMINI_MAX_WAIT_SECONDS', '30'))
+    # Concurrent calls per caller, e.g. "vision=4,cooking=4,community_help=2,matcher=2"
+    CALLER_CONCURRENCY = _parse_caps(os.getenv('GEMINI_CALLER_CONCURRENCY', ''))
+    DEFAULT_CALLER_CONCURRENCY = int(os.getenv('GEMINI_DEFAULT_CALLER_CONCURRENCY', '4'))
+    # Token estimates reserved before a call; corrected from usage metadata afterwards
+    CHARS_PER_TOKEN = 4
+    IMAGE_TOKENS = 258
+    OUTPUT_TOKEN_ESTIMATE = int(os.getenv('GEMINI_OUTPUT_TOKEN_ESTIMATE', '500'))
+
+    @classmethod
+    def is_configured(cls):
+        return bool(cls.API_KEY) and cls.API_KEY != 'your_gemini_api_key_here'
+
+class GeminiThrottledError(Exception):
+    """Raised when a call cannot get budget or a concurrency slot within MAX_WAIT_SECONDS"""
+
+    def __init__(self, caller, reason):
+        super().__init__(f"Gemini call from '{caller}' throttled: {reason}")
+        self.caller = caller
+        self.reason = reason
+
+# ==================== TOKEN BUCKET ====================
+
+class TokenBucket:
+    """
+    Refills continuously at per_minute / 60 per second up to per_minute.
+
+    Reservations block until enough budget is available. The level may go
+    negative when a call turns out to cost more than was reserved; later
+    callers then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self):
+        return self.per_minute > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount, timeout):
+        """
+        Take amount from the bucket, waiting up to timeout seconds.
+
+        Returns:
+            Seconds waited, or None if the budget did not refill in time
+        """
+        if not self.enabled:
+            return 0.0
+        # A single request larger than a minute's budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._condition:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return time.monotonic() - start
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(min(remaining, (amount - self.level) / self.rate))
+
+    def adjust(self, amount):
+        """Add (refund) or remove (debit) budget after the fact"""
+        if not self.enabled or not amount:
+            return
+        with self._condition:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+            if amount > 0:
+                self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            self._refill()
+            return {'per_minute': self.per_minute, 'available': round(self.level, 1)}
+
+def create_bucket(name, per_minute):
+    """
+    A bucket drawing from the project-wide budget: one SQLite-backed bucket
+    for all workers (sqlite shared state), or this worker's share of it.
+    """
+    if shared_state.is_shared():
+        return shared_state.SharedTokenBucket(name, shared_state.get_state_database(), per_minute)
+    return TokenBucket(per_minute / GeminiGatewayConfig.WORKERS)
+
+# ==================== GATEWAY ====================
+
+def estimate_tokens(contents):
+    """Rough input token count for generate_content contents"""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return len(contents) // GeminiGatewayConfig.CHARS_PER_TOKEN + 1
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(item) for item in contents)
+    if isinstance(contents, types.Content):
+        return estimate_tokens(contents.parts or [])
+    if isinstance(contents, types.Part):
+        if contents.text is not None:
+            return estimate_tokens(contents.text)
+        if contents.inline_data is not None:
+            return GeminiGatewayConfig.IMAGE_TOKENS
+    return 0
+
+def with_timeout(config, seconds):
+    """Copy of a GenerateContentConfig whose HTTP request times out after seconds"""
+    timeout_ms = max(1000, int(seconds * 1000))
+    if config is None:
+        return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=timeout_ms))
+    if config.http_options is not None and config.http_options.timeout is not None:
+        return config
+    http_options = (config.http_options or types.HttpOptions()).model_copy(update={'timeout': timeout_ms})
+    return config.model_copy(update={'http_options': http_options})
+
+class GeminiGateway:
+    """
+    Shared entry point for Gemini calls.
+
+    Each call takes one request from the RPM bucket and an estimate of its
+    tokens from the TPM bucket, and holds one of its caller's concurrency
+    slots while in flight. Attempts pass through the 'gemini' circuit
+    breaker. The genai.Client is created on first use and re-created in a
+    forked child.
+    """
+
+    def __init__(self, api_key=None, requests_per_minute=None, tokens_per_minute=None,
+                 caller_concurrency=None):
+        """Initialize limits; the client is created lazily"""
+        self.api_key = api_key or GeminiGatewayConfig.API_KEY
+        self.requests = create_bucket('gemini_requests', requests_per_minute if requests_per_minute is not None
+                                      else GeminiGatewayConfig.REQUESTS_PER_MINUTE)
+        self.tokens = create_bucket('gemini_tokens', tokens_per_minute if tokens_per_minute is not None
+                                    else GeminiGatewayConfig.TOKENS_PER_MINUTE)
+        self.caller_concurrency = {**GeminiGatewayConfig.CALLER_CONCURRENCY, **(caller_concurrency or {})}
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = {}
+        self.stats = {}
+        self.breaker = get_breaker('gemini')
+
+    @property
+    def client(self):
+        """This process's genai.Client"""
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                self._client = genai.Client(api_key=self.api_key)
+                self._pid = os.getpid()
+            return self._client
+
+    def _caller(self, caller):
+        """Concurrency semaphore and counters for a caller"""
+        with self._lock:
+            if caller not in self._slots:
+                limit = self.caller_concurrency.get(caller, GeminiGatewayConfig.DEFAULT_CALLER_CONCURRENCY)
+                self._slots[caller] = threading.BoundedSemaphore(limit)
+                self.stats[caller] = {
+                    'limit': limit,
+                    'in_flight': 0,
+                    'calls': 0,
+                    'errors': 0,
+                    'throttled': 0,
+                    'wait_seconds': 0.0,
+                    'tokens': 0
+                }
+            return self._slots[caller], self.stats[caller]
+
+    def _count(self, stats, **amounts):
+        with self._lock:
+            for key, amount in amounts.items():
+                stats[key] += amount
+
+    def _reserve(self, caller, stats, estimate, deadline):
+        """Take one request and the token estimate from the buckets"""
+        waited = self.requests.acquire(1, max(0.0, deadline - time.monotonic()))
+        if waited is None:
+            self._count(stats, throttled=1)
+            raise GeminiThrottledError(caller, 'requests-per-minute budget exhausted')
+        token_wait = self.tokens.acquire(estimate, max(0.0, deadline - time.monotonic()))
+        if token_wait is None:
+            self.requests.adjust(1)
+            self._count(stats, throttled=1)
+            raise GeminiThrottledError(caller, 'tokens-per-minute budget exhausted')
+        self._count(stats, wait_seconds=waited + token_wait)
+
+    def generate_content(self, caller, contents, model=None, config=None, retry_policy=None):
+        """
+        Call models.generate_content under the shared limits, with retries.
+
+        Args:
+            caller: Name used for the concurrency cap and stats
+                (e.g. 'vision', 'cooking', 'community_help', 'matcher')
+            contents: As for genai models.generate_content
+            model: Model name (default GEMINI_MODEL); the retry policy's
+                fallback models are tried after it
+            config: Optional GenerateContentConfig
+            retry_policy: RetryPolicy to use (default: the shared DEFAULT_POLICY)
+
+        Raises:
+            GeminiThrottledError: If no slot or budget frees up within MAX_WAIT_SECONDS
+        """
+        policy = retry_policy or DEFAULT_POLICY
+        return policy.run(
+            lambda attempt_model, remaining: self._generate_once(caller, contents, attempt_model, config, remaining),
+            model or GeminiGatewayConfig.DEFAULT_MODEL,
+            label=f"Gemini ({caller})"
+        )
+
+    def _generate_once(self, caller, contents, model, config, remaining):
+        """One generate_content attempt; waits and the request itself are bounded by remaining seconds"""
+        # Fails fast with CircuitOpenError while Gemini is known to be down
+        with self.breaker.guard(is_failure=lambda error: classify_error(error) != FATAL):
+            return self._call(caller, contents, model, config, remaining)
+
+    def _call(self, caller, contents, model, config, remaining):
+        slot, stats = self._caller(caller)
+        call_deadline = time.monotonic() + remaining
+        max_wait = max(0.0, min(GeminiGatewayConfig.MAX_WAIT_SECONDS, remaining))
+        deadline = time.monotonic() + max_wait
+        if not slot.acquire(timeout=max_wait):
+            self._count(stats, throttled=1)
+            raise GeminiThrottledError(caller, f"{stats['limit']} calls already in flight")
+        try:
+            estimate = estimate_tokens(contents) + GeminiGatewayConfig.OUTPUT_TOKEN_ESTIMATE
+            self._reserve(caller, stats, estimate, deadline)
+            self._count(stats, in_flight=1, calls=1)
+            try:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=with_timeout(config, call_deadline - time.monotonic())
+                )
+            except Exception:
+                self._count(stats, errors=1)
+                raise
+            finally:
+                self._count(stats, in_flight=-1)
+
+            self._settle(stats, estimate, response)
+            return response
+        finally:
+            slot.release()
+
+    def _settle(self, stats, estimate, response):
+        """Correct the token reservation with what the call actually used"""
+        usage = getattr(response, 'usage_metadata', None)
+        actual = getattr(usage, 'total_token_count', None) if usage is not None else None
+        if actual:
+            self.tokens.adjust(estimate - actual)
+            self._count(stats, tokens=actual)
+
+    def generate_content_stream(self, caller, contents, model=None, config=None, retry_policy=None):
+        """
+        Call models.generate_content_stream under the shared limits.
+
+        Yields response chunks as they arrive. Opening the stream, up to the
+        first chunk, is retried like generate_content; an error after that
+        is raised to the consumer, since part of the answer has already been
+        used. The caller's concurrency slot is held until the stream is
+        exhausted or closed.
+
+        Raises:
+            GeminiThrottledError: If no slot or budget frees up within MAX_WAIT_SECONDS
+        """
+        policy = retry_policy or DEFAULT_POLICY
+        stream = policy.run(
+            lambda attempt_model, remaining: self._open_stream(caller, contents, attempt_model, config, remaining),
+            model or GeminiGatewayConfig.DEFAULT_MODEL,
+            label=f"Gemini stream ({caller})"
+        )
+        yield from stream
+
+    def _open_stream(self, caller, contents, model, config, remaining):
+        """
+        One attempt at opening a stream; returns a generator over its chunks.
+
+        The stream counts as one call through the breaker, settled by
+        _relay() when it ends: success only once it finishes cleanly.
+        """
+        # Fails fast with CircuitOpenError while Gemini is known to be down
+        self.breaker.before_call()
+        try:
+            return self._start_stream(caller, contents, model, config, remaining)
+        except Exception as e:
+            self._breaker_failed(e)
+            raise
+
+    def _breaker_failed(self, error):
+        if classify_error(error) != FATAL:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+
+    def _start_stream(self, caller, contents, model, config, remaining):
+        slot, stats = self._caller(caller)
+        call_deadline = time.monotonic() + remaining
+        max_wait = max(0.0, min(GeminiGatewayConfig.MAX_WAIT_SECONDS, remaining))
+        deadline = time.monotonic() + max_wait
+        if not slot.acquire(timeout=max_wait):
+            self._count(stats, throttled=1)
+            raise GeminiThrottledError(caller, f"{stats['limit']} calls already in flight")
+        try:
+            estimate = estimate_tokens(contents) + GeminiGatewayConfig.OUTPUT_TOKEN_ESTIMATE
+            self._reserve(caller, stats, estimate, deadline)
+            self._count(stats, in_flight=1, calls=1)
+            try:
+                chunks = self.client.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=with_timeout(config, call_deadline - time.monotonic())
+                )
+                # Errors such as 429 surface on the first read, where they can still be retried
+                first = next(chunks, None)
+            except Exception:
+                self._count(stats, errors=1, in_flight=-1)
+                raise
+        except BaseException:
+            slot.release()
+            raise
+        return self._relay(chunks, first, slot, stats, estimate)
+
+    def _relay(self, chunks, first, slot, stats, estimate):
+        """Yield a stream's chunks, then free its slot and settle its token reservation"""
+        last = first
+        try:
+            if first is not None:
+                yield first
+                for chunk in chunks:
+                    last = chunk
+                    yield chunk
+            self.breaker.record_success()
+        except GeneratorExit:
+            # Closed by the consumer: neither a success nor an upstream failure
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self._count(stats, errors=1)
+            # Mid-stream upstream failures count against the breaker too
+            self._breaker_failed(e)
+            raise
+        finally:
+            self._count(stats, in_flight=-1)
+            slot.release()
+            # The final chunk carries the usage totals
+            self._settle(stats, estimate, last)
+
+    def get_stats(self):
+        """Return bucket levels and per-caller counters"""
+        with self._lock:
+            callers = {caller: {**values, 'wait_seconds': round(values['wait_seconds'], 2)}
+                       for caller, values in self.stats.items()}
+        return {
+            'requests_per_minute': self.requests.get_stats(),
+            'tokens_per_minute': self.tokens.get_stats(),
+            'callers': callers,
+            'retry_policy': DEFAULT_POLICY.get_stats()
+        }
+
+# ==================== SHARED INSTANCE ====================
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """The process-wide GeminiGateway, or None if no API key is configured"""
+    global _gateway
+    if not GeminiGatewayConfig.is_configured():
+        return None
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = GeminiGateway()
+        return _gateway
+
+def get_stats():
+    """Gateway stats, or None if it has not been created"""
+    return _gateway.get_stats() if _gateway is not None else None
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'GeminiGatewayConfig',
+    'GeminiThrottledError',
+    'TokenBucket',
+    'create_bucket',
+    'GeminiGateway',
+    'estimate_tokens',
+    'with_timeout',
+    'get_gateway',
+    'get_stats'
+]
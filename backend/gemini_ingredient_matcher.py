@@ -4,65 +4,53 @@ Gemini-Powered Ingredient Matcher
 Uses AI to intelligently match users looking for ingredients with users offering ingredients
 """
 
-import os
 import json
 from typing import List, Dict, Tuple
 from datetime import datetime
-from pymongo import MongoClient
 from dotenv import load_dotenv
-import google.genai as genai
+from gemini_gateway import get_gateway
+from circuit_breaker import CircuitOpenError
+import mongo_registry
+from storage import get_post_store
 
 # Load environment variables
 load_dotenv()
 
 
 class CommunityPostsDatabase:
-    """Handles MongoDB connection and data retrieval for community posts"""
+    """Handles storage access and data retrieval for community posts"""
+    
+    DB_NAME = 'freshloop_community'
+    COLLECTION_NAME = 'community_posts'
     
     def __init__(self):
-        """Initialize MongoDB connection"""
-        self.mongo_client = None
-        self.db = None
-        self.collection = None
+        """Initialize post storage"""
+        self.enabled = False
+        self.store = None
         self.setup_mongodb()
     
     def setup_mongodb(self):
-        """Set up MongoDB connection to community posts"""
-        try:
-            connection_string = os.getenv('MONGODB_URI')
-            if not connection_string:
-                print("❌ MONGODB_URI not found in environment variables")
-                return
-            
-            # Connect to MongoDB
-            self.mongo_client = MongoClient(connection_string)
-            self.db = self.mongo_client['freshloop_community']
-            self.collection = self.db['community_posts']
-            
-            # Test connection
-            self.mongo_client.admin.command('ping')
-            print("✅ Connected to MongoDB: freshloop_community.community_posts")
-            
-            # Print stats
-            doc_count = self.collection.count_documents({})
-            print(f"📊 Total posts in database: {doc_count}")
-            
-        except Exception as e:
-            print(f"❌ Error connecting to MongoDB: {e}")
-            self.mongo_client = None
+        """
+        Set up post storage: community_posts in MongoDB when MONGODB_URI is
+        set, otherwise the embedded SQLite database (see storage.py)
+        """
+        self.store = get_post_store(self.DB_NAME, self.COLLECTION_NAME)
+        if self.store is None:
+            print("❌ Storage backend disabled")
+            return
+        
+        self.enabled = True
+        print(f"✅ Post storage configured ({self.store.backend}): "
+              f"{self.store.database_name}.{self.store.collection_name}")
     
     def get_all_posts(self) -> List[Dict]:
         """Get all community posts from database"""
-        if self.collection is None:
+        if self.store is None:
             print("❌ Database not connected")
             return []
         
         try:
-            posts = list(self.collection.find({}))
-            # Convert ObjectId to string for JSON serialization
-            for post in posts:
-                post['_id'] = str(post['_id'])
-            return posts
+            return self.store.find_posts()
         except Exception as e:
             print(f"❌ Error retrieving posts: {e}")
             return []
@@ -73,16 +61,12 @@ class CommunityPostsDatabase:
         Args:
             post_type: Either 'request' (looking for) or 'offer' (giving)
         """
-        if self.collection is None:
+        if self.store is None:
             print("❌ Database not connected")
             return []
         
         try:
-            posts = list(self.collection.find({'type': post_type, 'status': 'active'}))
-            # Convert ObjectId to string
-            for post in posts:
-                post['_id'] = str(post['_id'])
-            return posts
+            return self.store.find_posts(post_type=post_type, status='active')
         except Exception as e:
             print(f"❌ Error retrieving {post_type} posts: {e}")
             return []
@@ -96,9 +80,9 @@ class CommunityPostsDatabase:
         return self.get_posts_by_type('offer')
     
     def close(self):
-        """Close MongoDB connection"""
-        if self.mongo_client:
-            self.mongo_client.close()
+        """Close MongoDB connection (the shared client is closed for the whole process)"""
+        if self.enabled and self.store.backend == 'mongodb':
+            mongo_registry.close_client()
             print("✅ MongoDB connection closed")
 
 
@@ -107,12 +91,10 @@ class GeminiIngredientMatcher:
     
     def __init__(self):
         """Initialize Gemini API"""
-        self.api_key = os.getenv('GOOGLE_GEMINI_API_KEY') or os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
+        # Shared Gemini client and rate limits (GEMINI_API_KEY or GOOGLE_GEMINI_API_KEY)
+        self.gateway = get_gateway()
+        if self.gateway is None:
             raise ValueError("❌ GOOGLE_GEMINI_API_KEY not found in environment variables")
-        
-        # Configure Gemini using Client
-        self.client = genai.Client(api_key=self.api_key)
         self.model_name = 'gemini-2.5-flash'
         print("✅ Gemini API initialized")
     
@@ -208,10 +190,7 @@ Rules:
         
         try:
             # Call Gemini API
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
+            response = self.gateway.generate_content('matcher', prompt, model=self.model_name)
             response_text = response.text.strip()
             
             # Extract JSON from response
@@ -255,6 +234,8 @@ Rules:
             print(f"❌ Error parsing Gemini response as JSON: {e}")
             print(f"Response: {response_text[:200]}")
             return []
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"❌ Error matching with Gemini: {e}")
             return []
@@ -343,10 +324,7 @@ Rules:
         
         try:
             # Single Gemini API call for everything
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
+            response = self.gateway.generate_content('matcher', prompt, model=self.model_name)
             response_text = response.text.strip()
             
             # Extract JSON
@@ -416,6 +394,8 @@ Rules:
             print(f"Response: {response_text[:300]}")
             # Fallback to empty matches
             return {req.get('_id'): [] for req in request_posts}
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"❌ Batch matching error: {e}")
             import traceback
@@ -479,7 +459,7 @@ def run_matcher():
     # Initialize database
     db = CommunityPostsDatabase()
     
-    if db.collection is None:
+    if db.store is None:
         print("❌ Cannot proceed without database connection")
         return
     
@@ -6,6 +6,7 @@ Uses frontend localStorage posts only (no MongoDB)
 
 from flask import Blueprint, request, jsonify
 from gemini_ingredient_matcher import GeminiIngredientMatcher
+from circuit_breaker import CircuitOpenError, circuit_open_response
 
 # Create Blueprint
 gemini_matcher_bp = Blueprint('gemini_matcher', __name__)
@@ -133,6 +134,9 @@ def match_ingredients():
             }
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+        
     except Exception as e:
         print(f"❌ Error in match_ingredients: {e}")
         import traceback
@@ -228,6 +232,9 @@ def match_single_request():
             }
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+HTTP Conditional GET Helpers
+Decorator that gives read endpoints version-based ETags (unchanged polls
+get 304 Not Modified without building a body) and an optional delta mode
+that returns only the records changed since the client's version.
+"""
+
+import os
+import uuid
+from functools import wraps
+
+from flask import request, jsonify, make_response
+
+# ==================== VERSION TOKENS ====================
+
+# Distinguishes this process's counters from another worker's or a
+# previous run's, so a version number is never matched across them
+_epoch = uuid.uuid4().hex[:8]
+
+def _new_epoch_after_fork():
+    global _epoch
+    _epoch = uuid.uuid4().hex[:8]
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_new_epoch_after_fork)
+
+def version_token(version, epoch=None):
+    """
+    Opaque token for a store version, used as the ETag value.
+
+    A store shared between workers passes its own epoch so every worker
+    issues the same token for the same version.
+    """
+    return f"{epoch or _epoch}.{version}"
+
+def parse_version_token(token, epoch=None):
+    """
+    Return the store version in a token issued under this epoch (by default
+    this process's), or None if the token is malformed or came from
+    elsewhere.
+    """
+    token_epoch, _, version = (token or '').rpartition('.')
+    if token_epoch != (epoch or _epoch) or not version.isdigit():
+        return None
+    return int(version)
+
+# ==================== DECORATOR ====================
+
+def conditional_get(get_version, get_changes=None, changes_key='results', get_epoch=None):
+    """
+    Add ETag / If-None-Match handling and delta sync to a GET view.
+
+    Args:
+        get_version: Callable returning the store's change counter (an int
+            that increases on every mutation, or any string that changes
+            with the content), or None to bypass caching (e.g. while the
+            store is unavailable)
+        get_changes: Optional callable mapping a client's (int) version to the
+            records changed since then, or None if that can no longer be
+            answered (records evicted or cleared)
+        changes_key: Key holding the records in a delta response
+        get_epoch: Optional callable returning the store's version namespace
+            (None for this process's), for stores shared between workers
+
+    A request whose If-None-Match matches the current version gets 304 and
+    the view is not called. With ?since_version=<token from a previous
+    response> and get_changes given, the response is
+    {"delta": true, <changes_key>: [...], "version": <token>}; if the delta
+    cannot be computed the full view runs instead. Every 200 response
+    carries the ETag and an X-Version header holding the same token.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = get_version()
+            if version is None:
+                return view(*args, **kwargs)
+
+            epoch = get_epoch() if get_epoch is not None else None
+            token = version_token(version, epoch)
+            if request.if_none_match.contains_weak(token):
+                response = make_response('', 304)
+            else:
+                response = None
+                since_token = request.args.get('since_version')
+                if since_token is not None and get_changes is not None:
+                    since_version = parse_version_token(since_token, epoch)
+                    changes = get_changes(since_version) if since_version is not None else None
+                    if changes is not None:
+                        response = jsonify({
+                            'success': True,
+                            'delta': True,
+                            changes_key: changes,
+                            'count': len(changes),
+                            'version': token
+                        })
+                if response is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+
+            response.set_etag(token, weak=True)
+            response.headers['X-Version'] = token
+            # Let browsers keep the body but revalidate on every request
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'conditional_get',
+    'version_token',
+    'parse_version_token'
+]
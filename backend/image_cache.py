@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Detection Result Cache
+Caches Gemini Vision responses keyed on exact and perceptual image hashes
+so repeated or near-identical frames skip the Gemini round trip.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class DetectionCacheConfig:
+    """Configuration for the detection result cache"""
+
+    ENABLED = os.getenv('DETECTION_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    MAX_ENTRIES = int(os.getenv('DETECTION_CACHE_MAX_ENTRIES', '256'))
+    TTL_SECONDS = float(os.getenv('DETECTION_CACHE_TTL_SECONDS', '600'))
+    # Maximum Hamming distance (out of 64 bits) for two dHashes to count as the same scene
+    HAMMING_THRESHOLD = int(os.getenv('DETECTION_CACHE_HAMMING_THRESHOLD', '5'))
+
+# ==================== HASHING ====================
+
+def sha256_digest(data):
+    """Return the SHA-256 hex digest of raw bytes or a contiguous NumPy array."""
+    if hasattr(data, 'flags') and not data.flags['C_CONTIGUOUS']:
+        data = data.copy(order='C')
+    return hashlib.sha256(memoryview(data)).hexdigest()
+
+def dhash(frame, hash_size=8):
+    """
+    Compute a 64-bit difference hash of a BGR or grayscale frame.
+
+    The frame is shrunk to (hash_size + 1) x hash_size grayscale pixels and each
+    bit records whether a pixel is brighter than its right-hand neighbour.
+    """
+    if frame.ndim == 3:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = frame
+
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = small[:, 1:] > small[:, :-1]
+
+    value = 0
+    for bit in diff.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+def hamming_distance(a, b):
+    """Number of differing bits between two integer hashes."""
+    return bin(a ^ b).count('1')
+
+# ==================== CACHE ====================
+
+class DetectionCache:
+    """
+    Thread-safe LRU + TTL cache of Gemini detection responses.
+
+    Entries are looked up first by the exact SHA-256 of the image bytes and then
+    by perceptual dHash within a Hamming-distance threshold. The raw Gemini
+    response text is stored so callers can re-parse it against the shape of the
+    frame being analyzed.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, hamming_threshold=None):
+        """Initialize an empty cache"""
+        self.max_entries = max_entries if max_entries is not None else DetectionCacheConfig.MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else DetectionCacheConfig.TTL_SECONDS
+        self.hamming_threshold = (
+            hamming_threshold if hamming_threshold is not None
+            else DetectionCacheConfig.HAMMING_THRESHOLD
+        )
+        self._entries = OrderedDict()  # sha256 -> entry dict, oldest first
+        self._lock = threading.Lock()
+        self.stats = {
+            'exact_hits': 0,
+            'perceptual_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+    def _is_expired(self, entry, now):
+        return self.ttl_seconds > 0 and now - entry['created_at'] > self.ttl_seconds
+
+    def _purge_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+        for key in expired:
+            del self._entries[key]
+        self.stats['expirations'] += len(expired)
+
+    def get(self, sha, phash):
+        """
+        Look up a cached response.
+
+        Returns:
+            The cached Gemini response text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+
+            entry = self._entries.get(sha)
+            if entry is not None:
+                self._entries.move_to_end(sha)
+                self.stats['exact_hits'] += 1
+                return entry['response_text']
+
+            if phash is not None and self.hamming_threshold >= 0:
+                best_key, best_distance = None, None
+                for key, candidate in self._entries.items():
+                    distance = hamming_distance(phash, candidate['phash'])
+                    if distance <= self.hamming_threshold and (best_distance is None or distance < best_distance):
+                        best_key, best_distance = key, distance
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.stats['perceptual_hits'] += 1
+                    return self._entries[best_key]['response_text']
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, sha, phash, response_text):
+        """Store a Gemini response, evicting the least recently used entries if full"""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[sha] = {
+                'phash': phash,
+                'response_text': response_text,
+                'created_at': time.time()
+            }
+            self._entries.move_to_end(sha)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            hits = self.stats['exact_hits'] + self.stats['perceptual_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'hits': hits,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hamming_threshold': self.hamming_threshold
+            }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'DetectionCacheConfig',
+    'DetectionCache',
+    'sha256_digest',
+    'dhash',
+    'hamming_distance'
+]
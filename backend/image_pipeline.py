@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Vision Image Pipeline
+Turns uploaded image bytes or camera frames into the payload sent to Gemini
+Vision: caps the long edge, searches encoder quality to fit a byte budget,
+and avoids full-size copies wherever possible.
+"""
+
+import os
+import time
+import threading
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class ImagePipelineConfig:
+    """Configuration for the vision preprocessing stage"""
+
+    MAX_LONG_EDGE = int(os.getenv('VISION_MAX_LONG_EDGE', '1600'))
+    TARGET_BYTES = int(os.getenv('VISION_TARGET_BYTES', '400000'))
+    ENCODE_FORMAT = os.getenv('VISION_ENCODE_FORMAT', 'JPEG').upper()  # JPEG or WEBP
+    MIN_QUALITY = int(os.getenv('VISION_MIN_QUALITY', '40'))
+    MAX_QUALITY = int(os.getenv('VISION_MAX_QUALITY', '90'))
+    MAX_SEARCH_STEPS = int(os.getenv('VISION_QUALITY_SEARCH_STEPS', '6'))
+    # Long edge of the grayscale preview used for hashing and quality checks
+    PREVIEW_SIZE = 160
+
+EXIF_ORIENTATION = 0x0112
+# EXIF orientations that swap width and height once applied
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp'
+}
+
+# Upload formats Gemini accepts as-is (PIL format -> MIME type)
+GEMINI_INPUT_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'HEIF': 'image/heif'
+}
+
+CV2_ENCODERS = {
+    'JPEG': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'WEBP': ('.webp', cv2.IMWRITE_WEBP_QUALITY)
+}
+
+# ==================== MODELS ====================
+
+class PreparedImage:
+    """An image payload ready for Gemini plus the metadata the detector needs"""
+
+    def __init__(self, data, mime_type, width, height, preview, source_bytes,
+                 passthrough=False, bytes_allocated=0, original_bytes=None,
+                 sent_size=None, quality=None, encode_ms=0.0):
+        self.data = data                # Encoded bytes sent to Gemini
+        self.mime_type = mime_type
+        self.width = width              # Original dimensions, used for bounding boxes
+        self.height = height
+        self.preview = preview          # Small grayscale array for hashing and quality checks
+        self.source_bytes = source_bytes
+        self.passthrough = passthrough
+        self.bytes_allocated = bytes_allocated
+        self.original_bytes = original_bytes if original_bytes is not None else len(source_bytes)
+        self.sent_size = sent_size or (width, height)
+        self.quality = quality
+        self.encode_ms = encode_ms
+
+    @property
+    def shape(self):
+        """Frame shape (height, width) used for bounding box estimation"""
+        return (self.height, self.width)
+
+    def to_dict(self):
+        """Convert pipeline statistics to a dictionary"""
+        return {
+            'passthrough': self.passthrough,
+            'mime_type': self.mime_type,
+            'width': self.width,
+            'height': self.height,
+            'sent_width': self.sent_size[0],
+            'sent_height': self.sent_size[1],
+            'quality': self.quality,
+            'original_bytes': self.original_bytes,
+            'sent_bytes': len(self.data),
+            'encode_ms': round(self.encode_ms, 2),
+            'bytes_allocated': self.bytes_allocated
+        }
+
+# ==================== PREPROCESSOR ====================
+
+class ImagePreprocessor:
+    """
+    Resize-and-encode stage shared by the Flask endpoints and the CLI camera loop.
+
+    Images are downscaled so the long edge fits MAX_LONG_EDGE, then encoded
+    with a binary search over quality to land at or under TARGET_BYTES.
+    """
+
+    def __init__(self, max_long_edge=None, target_bytes=None, encode_format=None,
+                 min_quality=None, max_quality=None, max_search_steps=None):
+        """Initialize the stage from explicit values or ImagePipelineConfig"""
+        self.max_long_edge = max_long_edge or ImagePipelineConfig.MAX_LONG_EDGE
+        self.target_bytes = target_bytes or ImagePipelineConfig.TARGET_BYTES
+        self.encode_format = (encode_format or ImagePipelineConfig.ENCODE_FORMAT).upper()
+        if self.encode_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported encode format: {self.encode_format}")
+        self.min_quality = min_quality or ImagePipelineConfig.MIN_QUALITY
+        self.max_quality = max_quality or ImagePipelineConfig.MAX_QUALITY
+        self.max_search_steps = max_search_steps or ImagePipelineConfig.MAX_SEARCH_STEPS
+        self._lock = threading.Lock()
+        self.totals = {
+            'images': 0,
+            'passthrough': 0,
+            'original_bytes': 0,
+            'sent_bytes': 0,
+            'encode_ms': 0.0
+        }
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.encode_format]
+
+    def target_size(self, width, height):
+        """Return (width, height) scaled so the long edge fits the cap"""
+        long_edge = max(width, height)
+        if long_edge <= self.max_long_edge:
+            return width, height
+        scale = self.max_long_edge / long_edge
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def search_quality(self, encode_at):
+        """
+        Find the highest quality whose encoding fits the byte budget.
+
+        Args:
+            encode_at: Callable mapping a quality value to encoded bytes
+
+        Returns:
+            Tuple of (encoded bytes, quality). Falls back to the smallest
+            encoding tried if nothing fits.
+        """
+        data = encode_at(self.max_quality)
+        if len(data) <= self.target_bytes:
+            return data, self.max_quality
+
+        smallest = (data, self.max_quality)
+        best = None
+        low, high = self.min_quality, self.max_quality - 1
+        steps = 0
+        while low <= high and steps < self.max_search_steps:
+            quality = (low + high) // 2
+            data = encode_at(quality)
+            steps += 1
+            if len(data) <= self.target_bytes:
+                best = (data, quality)
+                low = quality + 1
+            else:
+                if len(data) < len(smallest[0]):
+                    smallest = (data, quality)
+                high = quality - 1
+
+        return best or smallest
+
+    def encode_pil(self, image):
+        """
+        Resize and encode an RGB PIL image.
+
+        Returns:
+            Tuple of (encoded bytes, (width, height), quality, bytes allocated)
+        """
+        allocated = 0
+        size = self.target_size(*image.size)
+        if size != image.size:
+            image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+            allocated += size[0] * size[1] * 3
+
+        def encode_at(quality):
+            buffer = BytesIO()
+            image.save(buffer, format=self.encode_format, quality=quality)
+            return buffer.getvalue()
+
+        data, quality = self.search_quality(encode_at)
+        return data, size, quality, allocated + len(data)
+
+    def encode_frame(self, frame):
+        """
+        Resize and encode a BGR camera frame with OpenCV (no colour conversion).
+
+        Returns:
+            A PreparedImage describing the encoded payload
+        """
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        size = self.target_size(width, height)
+        resized = frame
+        if size != (width, height):
+            resized = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        extension, quality_flag = CV2_ENCODERS[self.encode_format]
+
+        def encode_at(quality):
+            ok, encoded = cv2.imencode(extension, resized, [quality_flag, quality])
+            if not ok:
+                raise ValueError(f"Failed to encode frame as {self.encode_format}")
+            return encoded.tobytes()
+
+        data, quality = self.search_quality(encode_at)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        prepared = PreparedImage(
+            data=data,
+            mime_type=self.mime_type,
+            width=width,
+            height=height,
+            preview=None,
+            source_bytes=None,
+            bytes_allocated=(resized.nbytes if resized is not frame else 0) + len(data),
+            original_bytes=frame.nbytes,
+            sent_size=size,
+            quality=quality,
+            encode_ms=encode_ms
+        )
+        self.record(prepared)
+        return prepared
+
+    def record(self, prepared):
+        """Add a prepared image to the running totals"""
+        with self._lock:
+            self.totals['images'] += 1
+            self.totals['passthrough'] += int(prepared.passthrough)
+            self.totals['original_bytes'] += prepared.original_bytes
+            self.totals['sent_bytes'] += len(prepared.data)
+            self.totals['encode_ms'] += prepared.encode_ms
+
+    def get_stats(self):
+        """Return configuration and running totals"""
+        with self._lock:
+            totals = dict(self.totals)
+        totals['encode_ms'] = round(totals['encode_ms'], 2)
+        return {
+            'max_long_edge': self.max_long_edge,
+            'target_bytes': self.target_bytes,
+            'format': self.encode_format,
+            **totals
+        }
+
+# ==================== PIPELINE ====================
+
+def _grayscale_preview(image):
+    """Return a small grayscale NumPy preview of a PIL image."""
+    preview = image.convert('L')
+    preview.thumbnail((ImagePipelineConfig.PREVIEW_SIZE, ImagePipelineConfig.PREVIEW_SIZE))
+    return np.asarray(preview)
+
+def decode_reduced(image, target_size):
+    """
+    Decode a PIL image to upright RGB, as small as possible but no smaller
+    than target_size.
+
+    For JPEGs, draft mode lets libjpeg decode directly at 1/2, 1/4 or 1/8
+    scale. EXIF orientation is applied after the reduced decode, so the
+    rotation only touches the smaller image.
+    """
+    if image.format == 'JPEG':
+        image.draft('RGB', target_size)
+    return ImageOps.exif_transpose(image.convert('RGB'))
+
+def prepare_upload(image_bytes, preprocessor=None):
+    """
+    Prepare uploaded image bytes for Gemini.
+
+    Upright JPEG uploads that already fit the preprocessor's long-edge cap
+    and byte budget are forwarded as-is; only a reduced-scale grayscale
+    preview is decoded for hashing. Anything else is decoded once in RGB at
+    the smallest scale that still covers the cap, rotated upright, resized
+    and re-encoded by the preprocessor - unless the re-encode comes out
+    larger than an upright original that already fits, in which case the
+    original bytes are sent with their own MIME type.
+    """
+    preprocessor = preprocessor or ImagePreprocessor()
+    start = time.perf_counter()
+    image = Image.open(BytesIO(image_bytes))  # Reads the header only
+    width, height = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+
+    if (image.format == 'JPEG'
+            and orientation == 1
+            and len(image_bytes) <= preprocessor.target_bytes
+            and max(width, height) <= preprocessor.max_long_edge):
+        # Let libjpeg decode directly at reduced scale for the preview
+        image.draft('L', (ImagePipelineConfig.PREVIEW_SIZE, ImagePipelineConfig.PREVIEW_SIZE))
+        preview = _grayscale_preview(image)
+        prepared = PreparedImage(
+            data=image_bytes,
+            mime_type='image/jpeg',
+            width=width,
+            height=height,
+            preview=preview,
+            source_bytes=image_bytes,
+            passthrough=True,
+            bytes_allocated=preview.nbytes,
+            encode_ms=(time.perf_counter() - start) * 1000
+        )
+        preprocessor.record(prepared)
+        return prepared
+
+    rgb = decode_reduced(image, preprocessor.target_size(width, height))
+    decoded_width, decoded_height = rgb.size
+    if orientation in ROTATED_ORIENTATIONS:
+        width, height = height, width
+    data, sent_size, quality, encode_allocated = preprocessor.encode_pil(rgb)
+    preview = _grayscale_preview(rgb)
+
+    original_mime = GEMINI_INPUT_MIME_TYPES.get(image.format)
+    if (original_mime is not None
+            and orientation == 1
+            and len(image_bytes) <= min(len(data), preprocessor.target_bytes)
+            and max(width, height) <= preprocessor.max_long_edge):
+        # e.g. a flat-colour PNG that compresses better than any JPEG
+        prepared = PreparedImage(
+            data=image_bytes,
+            mime_type=original_mime,
+            width=width,
+            height=height,
+            preview=preview,
+            source_bytes=image_bytes,
+            passthrough=True,
+            bytes_allocated=decoded_width * decoded_height * 4 + encode_allocated + preview.nbytes,
+            encode_ms=(time.perf_counter() - start) * 1000
+        )
+        preprocessor.record(prepared)
+        return prepared
+
+    prepared = PreparedImage(
+        data=data,
+        mime_type=preprocessor.mime_type,
+        width=width,
+        height=height,
+        preview=preview,
+        source_bytes=image_bytes,
+        passthrough=False,
+        bytes_allocated=decoded_width * decoded_height * 4 + encode_allocated + preview.nbytes,
+        sent_size=sent_size,
+        quality=quality,
+        encode_ms=(time.perf_counter() - start) * 1000
+    )
+    preprocessor.record(prepared)
+    return prepared
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'ImagePipelineConfig',
+    'ImagePreprocessor',
+    'PreparedImage',
+    'decode_reduced',
+    'prepare_upload'
+]
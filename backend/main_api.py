@@ -6,23 +6,36 @@ Integrates cooking assistant and real-time object detection features
 
 import os
 import sys
-import cv2
 import base64
-import numpy as np
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from datetime import datetime, timezone
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import json
-from PIL import Image
-from io import BytesIO
 import requests
 from dotenv import load_dotenv
 
 # Import our custom modules
 from cooking_assistant_fixed import CookingAssistant
 from realtime_object_detection import GeminiVisionDetector
+from image_pipeline import prepare_upload
+from analysis_jobs import AnalysisJob, AnalysisJobManager, JobQueueFullError
+from detection_session import DetectionSession
+import circuit_breaker
+from circuit_breaker import CircuitOpenError, circuit_open_response
+from single_flight import SingleFlight
+from recipe_cache import RecipeCache, suggestions_key, recipe_key
+import mongo_registry
+import gemini_gateway
+import storage
+import db_indexes
+from results_store import ResultsStoreConfig
+import shared_state
+from http_caching import conditional_get
+from web_delivery import set_local_sink
 from community_help import community_help_bp, initialize_community_service
 from gemini_matcher_routes import gemini_matcher_bp, initialize_matcher
 
@@ -40,9 +53,42 @@ load_dotenv()
 # Global instances
 cooking_assistant = None
 vision_detector = None
-latest_results = []
-detection_active = False
-detection_thread = None
+# Bounded; each result gets a 'seq' cursor. Shared by all workers with SHARED_STATE_BACKEND=sqlite
+latest_results = shared_state.create_results_buffer('gemini_results')
+detection_session = None  # Session running in this worker, if any
+detection_sessions = shared_state.create_session_registry('detection')  # Which worker owns the session
+
+# How often the owning worker publishes session status (its heartbeat)
+DETECTION_STATUS_PUBLISH_SECONDS = 1.0
+# How long /api/stop-detection waits for a session owned by another worker to stop
+DETECTION_REMOTE_STOP_SECONDS = 5.0
+# Job status is visible to every worker with SHARED_STATE_BACKEND=sqlite
+job_manager = AnalysisJobManager(registry=shared_state.create_job_registry('analysis_jobs'))
+
+# Seconds between keep-alive comments on idle event streams
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+
+# Concurrent /api/gemini-results/stream connections (each holds a worker thread)
+RESULTS_STREAM_MAX_CLIENTS = int(os.getenv('RESULTS_STREAM_MAX_CLIENTS', '100'))
+results_stream_slots = threading.BoundedSemaphore(RESULTS_STREAM_MAX_CLIENTS)
+
+# Recipe responses are cached on disk by canonical request; concurrent
+# misses for the same request share one Gemini call
+recipe_cache = RecipeCache()
+recipe_flights = SingleFlight('recipes')
+
+# ElevenLabs requests fail fast while its breaker is open instead of waiting on timeouts
+ELEVENLABS_TIMEOUT_SECONDS = float(os.getenv('ELEVENLABS_TIMEOUT_SECONDS', '20'))
+elevenlabs_breaker = circuit_breaker.get_breaker('elevenlabs')
+
+# /api/database-stats ETags also roll over this often, to pick up writes from other processes
+DATABASE_STATS_ETAG_SECONDS = int(os.getenv('DATABASE_STATS_ETAG_SECONDS', '30'))
+
+# Batch analysis limits
+BATCH_MAX_IMAGES = int(os.getenv('BATCH_MAX_IMAGES', '20'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '4'))
+BATCH_PACK_MAX_IMAGES = int(os.getenv('BATCH_PACK_MAX_IMAGES', '4'))
+BATCH_PACK_MAX_IMAGE_BYTES = int(os.getenv('BATCH_PACK_MAX_IMAGE_BYTES', '150000'))
 
 # Initialize services
 def initialize_services():
@@ -53,6 +99,7 @@ def initialize_services():
         vision_detector = GeminiVisionDetector()
         initialize_community_service()
         initialize_matcher()
+        db_indexes.bootstrap()
         print("✅ All services initialized successfully!")
         return True
     except Exception as e:
@@ -66,28 +113,92 @@ def health_check():
     services_status = {
         'cooking_assistant': cooking_assistant is not None,
         'vision_detector': vision_detector is not None,
-        'detection_active': detection_active
+        'detection_active': is_detection_active()
     }
     
+    cache_stats = None
+    pipeline_stats = None
+    quality_gate_stats = None
+    writer_stats = None
+    if vision_detector is not None:
+        pipeline_stats = vision_detector.preprocessor.get_stats()
+        if vision_detector.cache is not None:
+            cache_stats = vision_detector.cache.get_stats()
+        if vision_detector.quality_gate is not None:
+            quality_gate_stats = vision_detector.quality_gate.get_stats()
+        if vision_detector.writer is not None:
+            writer_stats = vision_detector.writer.get_stats()
+    
     return jsonify({
         'success': True,
         'message': 'API is running',
         'timestamp': datetime.now().isoformat(),
-        'services': services_status
+        'services': services_status,
+        'detection_cache': cache_stats,
+        'image_pipeline': pipeline_stats,
+        'quality_gate': quality_gate_stats,
+        'detection_writer': writer_stats,
+        'storage_backend': storage.selected_backend(),
+        'shared_state': shared_state.SharedStateConfig.BACKEND,
+        'mongodb': mongo_registry.get_stats(),
+        'gemini_gateway': gemini_gateway.get_stats(),
+        'circuit_breakers': circuit_breaker.get_stats(),
+        'recipe_single_flight': recipe_flights.get_stats(),
+        'recipe_cache': recipe_cache.get_stats(),
+        'analysis_jobs': job_manager.get_stats(),
+        'results_buffer': latest_results.get_stats()
     })
 
 # ==================== COMPUTER VISION ENDPOINTS ====================
 
 @app.route('/api/gemini-results', methods=['GET'])
+@conditional_get(
+    lambda: latest_results.version,
+    lambda version: latest_results.changes_since(version),
+    get_epoch=lambda: latest_results.epoch
+)
 def get_gemini_results():
-    """Get latest Gemini vision detection results"""
-    global latest_results
+    """
+    Get latest Gemini vision detection results
+    
+    Query parameters:
+        since: Return only results with a seq greater than this cursor
+        limit: Maximum results to return (defaults to RESULTS_PAGE_SIZE when since is given)
     
+    Pass the returned next_since as since on the next poll. Also supports
+    If-None-Match and ?since_version=<X-Version> (see conditional_get).
+    """
     try:
+        try:
+            since = int(request.args.get('since', 0))
+            limit = request.args.get('limit')
+            if limit is not None:
+                limit = int(limit)
+            elif 'since' in request.args:
+                limit = ResultsStoreConfig.DEFAULT_PAGE_SIZE
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'since and limit must be integers'
+            }), 400
+        if since < 0 or (limit is not None and limit < 1):
+            return jsonify({
+                'success': False,
+                'error': 'since must be >= 0 and limit >= 1'
+            }), 400
+        if limit is not None:
+            limit = min(limit, ResultsStoreConfig.MAX_PAGE_SIZE)
+        
+        results, next_since, missed, reset = latest_results.since(since, limit)
         return jsonify({
             'success': True,
-            'results': latest_results,
-            'count': len(latest_results),
+            'results': results,
+            'count': len(results),
+            'next_since': next_since,
+            'latest_seq': latest_results.last_seq,
+            'has_more': next_since < latest_results.last_seq,
+            'missed': missed,
+            'reset': reset,
             'last_updated': datetime.now().isoformat()
         })
     except Exception as e:
@@ -96,6 +207,136 @@ def get_gemini_results():
             'error': str(e)
         }), 500
 
+@app.route('/api/gemini-results/stream', methods=['GET'])
+def stream_gemini_results():
+    """
+    Server-Sent Events stream of new detection results
+    
+    Each result is sent as a 'detection' event whose id is its seq. Resume
+    with the Last-Event-ID header (sent automatically by EventSource on
+    reconnect) or ?since=<seq>; without either, only results stored after
+    connecting are sent. A 'missed' event reports results evicted before
+    they could be delivered, and a 'reset' event reports a cursor from
+    before a server restart (the stream then replays from the oldest
+    stored result).
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        cursor = int(cursor) if cursor is not None else latest_results.last_seq
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Last-Event-ID and since must be integers'
+        }), 400
+    
+    if not results_stream_slots.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'error': 'Too many open result streams'
+        }), 503
+    
+    def generate(cursor):
+        yield f"retry: 3000\n: connected at seq {cursor}\n\n"
+        while True:
+            results, next_cursor, missed, reset = latest_results.since(
+                cursor, ResultsStoreConfig.MAX_PAGE_SIZE
+            )
+            if reset:
+                yield f"event: reset\ndata: {json.dumps({'last_seq': latest_results.last_seq})}\n\n"
+            if missed:
+                yield f"event: missed\ndata: {json.dumps({'missed': missed})}\n\n"
+            for result in results:
+                yield f"id: {result['seq']}\nevent: detection\ndata: {json.dumps(result)}\n\n"
+            cursor = next_cursor
+            if results or missed:
+                continue
+            if not latest_results.wait_for_new(cursor, EVENT_STREAM_HEARTBEAT_SECONDS):
+                # Keep proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+    
+    response = Response(generate(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the client disconnects, even if the stream never started
+    response.call_on_close(results_stream_slots.release)
+    return response
+
+def build_posted_result(data):
+    """Turn a result posted by the CLI detector into a stored result dict"""
+    return {
+        'id': f"cli_{int(time.time())}_{uuid.uuid4().hex[:8]}",
+        'name': data.get('name', 'Unknown Food'),
+        'quality': data.get('quality', 'Unknown'),
+        'quantity': data.get('quantity', 'Unknown'),
+        'condition': data.get('condition', 'Unknown'),
+        'safe': data.get('safe', data.get('safe_to_eat', 'Unknown')),
+        'community': data.get('community', data.get('community_share', 'Unknown')),
+        'confidence': data.get('confidence', 0.0),
+        'timestamp': datetime.now().isoformat(),
+        'bbox': data.get('bbox')
+    }
+
+def ingest_posted_results(records):
+    """Store posted results (pushing them to streams); returns the stored copies"""
+    return latest_results.extend([build_posted_result(record) for record in records])
+
+# Detectors running in this process hand results over without an HTTP hop
+set_local_sink(ingest_posted_results)
+
+@app.route('/api/gemini-results', methods=['POST'])
+def add_gemini_result():
+    """Add a detection result posted by the CLI detector and push it to streams"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'JSON body required'
+            }), 400
+        
+        result = ingest_posted_results([data])[0]
+        
+        return jsonify({
+            'success': True,
+            'result': result
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/gemini-results/bulk', methods=['POST'])
+def add_gemini_results_bulk():
+    """
+    Add several detection results in one request
+    
+    Request JSON:
+        results: List of result objects (same shape as POST /api/gemini-results)
+    """
+    try:
+        data = request.get_json(silent=True)
+        records = data.get('results') if isinstance(data, dict) else None
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            return jsonify({
+                'success': False,
+                'error': 'JSON body with a results list required'
+            }), 400
+        
+        stored = ingest_posted_results(records)
+        
+        return jsonify({
+            'success': True,
+            'count': len(stored),
+            'last_seq': stored[-1]['seq'] if stored else latest_results.last_seq
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/test-detection', methods=['POST'])
 def add_test_detection():
     """Add a test detection result for demo purposes"""
@@ -113,8 +354,7 @@ def add_test_detection():
             'bbox': [100, 100, 200, 200]
         }
         
-        global latest_results
-        latest_results.append(test_result)
+        test_result = latest_results.append(test_result)
         
         return jsonify({
             'success': True,
@@ -127,6 +367,27 @@ def add_test_detection():
             'error': str(e)
         }), 500
 
+def call_elevenlabs(method, url, **kwargs):
+    """
+    Send a request to ElevenLabs through its circuit breaker.
+    
+    Connection errors, timeouts, 429 and 5xx responses count as failures.
+    
+    Raises:
+        CircuitOpenError: While ElevenLabs is failing (no request is sent)
+    """
+    elevenlabs_breaker.before_call()
+    try:
+        response = requests.request(method, url, timeout=ELEVENLABS_TIMEOUT_SECONDS, **kwargs)
+    except requests.exceptions.RequestException:
+        elevenlabs_breaker.record_failure()
+        raise
+    if response.status_code == 429 or response.status_code >= 500:
+        elevenlabs_breaker.record_failure()
+    else:
+        elevenlabs_breaker.record_success()
+    return response
+
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech():
     """Convert text to speech using ElevenLabs API"""
@@ -171,7 +432,7 @@ def text_to_speech():
             }
         }
         
-        response = requests.post(url, json=data, headers=headers)
+        response = call_elevenlabs('POST', url, json=data, headers=headers)
         
         if response.status_code == 200:
             # Return audio data as base64
@@ -191,6 +452,8 @@ def text_to_speech():
                 'details': error_details
             }), 500
             
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -213,7 +476,7 @@ def get_voices():
             "xi-api-key": api_key
         }
         
-        response = requests.get("https://api.elevenlabs.io/v1/voices", headers=headers)
+        response = call_elevenlabs('GET', "https://api.elevenlabs.io/v1/voices", headers=headers)
         
         if response.status_code == 200:
             voices_data = response.json()
@@ -227,12 +490,200 @@ def get_voices():
                 'error': f'ElevenLabs API error: {response.status_code}'
             }), 500
             
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+def analyze_uploaded_image(image_bytes):
+    """
+    Run the upload detection pipeline on raw image bytes.
+    
+    Shared by the synchronous /api/analyze-image endpoint and the job pool.
+    
+    Returns:
+        The /api/analyze-image response dictionary
+    """
+    # Prepare image (JPEG uploads within budget pass through untouched)
+    prepared = prepare_upload(image_bytes, vision_detector.preprocessor)
+    
+    # Advisory only: a dark countertop or white plate is still analyzed
+    quality = vision_detector.assess_frame_quality(prepared.preview)
+    
+    # Perform detection
+    detections = vision_detector.detect_and_analyze_upload(prepared)
+    
+    return record_upload_detections(detections, prepared, quality)
+
+def store_detection_results(detections, id_prefix, capture_info):
+    """
+    Convert raw detections into API results, add them to the latest results
+    and save them to the database.
+    
+    Returns:
+        The list of result dictionaries
+    """
+    # Process results
+    processed_results = []
+    for detection in detections:
+        result = {
+            'id': f"{id_prefix}_{int(time.time())}_{len(processed_results)}",
+            'name': detection['name'],
+            'quality': detection['quality'],
+            'quantity': detection['quantity'],
+            'condition': detection['condition'],
+            'safe': detection['safe'],  # Fixed: use 'safe' not 'safe_to_eat'
+            'community': detection['community'],  # Fixed: use 'community' not 'community_share'
+            'confidence': detection['confidence'],
+            'timestamp': datetime.now().isoformat(),
+            'bbox': detection['bbox']
+        }
+        processed_results.append(result)
+        
+    # Store results (adds each result's 'seq')
+    processed_results = latest_results.extend(processed_results)
+    
+    # Queue for the database (write-behind, no round trip here)
+    for result in processed_results:
+        try:
+            vision_detector.save_to_mongodb(result, capture_info)
+        except Exception as db_error:
+            print(f"Database save error: {db_error}")
+    
+    return processed_results
+
+def record_upload_detections(detections, prepared, quality=None):
+    """
+    Store detections for an uploaded image and build the API response.
+    
+    quality is the advisory quality-gate assessment, returned as quality_check.
+    
+    Returns:
+        The /api/analyze-image response dictionary
+    """
+    processed_results = store_detection_results(
+        detections, 'upload', {'capture_count': 1, 'frame_count': 1}
+    )
+    
+    return {
+        'success': True,
+        'message': f'Found {len(processed_results)} food items',
+        'results': processed_results,
+        'count': len(processed_results),
+        'image_stats': prepared.to_dict(),
+        'quality_check': quality
+    }
+
+def analyze_batch_item(index, filename, image_bytes):
+    """Analyze one image of a batch, capturing its timing and any error"""
+    start = time.perf_counter()
+    try:
+        item = analyze_uploaded_image(image_bytes)
+    except Exception as e:
+        item = {'success': False, 'error': str(e)}
+    item.update({
+        'index': index,
+        'filename': filename,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    })
+    return item
+
+def analyze_batch_packed(uploads, concurrency):
+    """
+    Analyze a batch, packing small images into shared Gemini requests.
+    
+    Images whose prepared payload fits BATCH_PACK_MAX_IMAGE_BYTES are grouped
+    up to BATCH_PACK_MAX_IMAGES per request; larger images go on their own.
+    Groups run concurrently up to the concurrency cap.
+    """
+    items = [None] * len(uploads)
+    prepared_images = [None] * len(uploads)
+    qualities = [None] * len(uploads)
+    prepare_ms = [0.0] * len(uploads)
+    
+    for index, (filename, image_bytes) in enumerate(uploads):
+        start = time.perf_counter()
+        try:
+            prepared = prepare_upload(image_bytes, vision_detector.preprocessor)
+            qualities[index] = vision_detector.assess_frame_quality(prepared.preview)
+            prepared_images[index] = prepared
+        except Exception as e:
+            items[index] = {'success': False, 'error': str(e), 'index': index, 'filename': filename}
+        prepare_ms[index] = (time.perf_counter() - start) * 1000
+    
+    groups = []
+    current = []
+    for index, prepared in enumerate(prepared_images):
+        if prepared is None:
+            continue
+        if len(prepared.data) > BATCH_PACK_MAX_IMAGE_BYTES:
+            groups.append([index])
+            continue
+        current.append(index)
+        if len(current) == BATCH_PACK_MAX_IMAGES:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    
+    def run_group(group):
+        start = time.perf_counter()
+        try:
+            if len(group) == 1:
+                detection_lists = [vision_detector.detect_and_analyze_upload(prepared_images[group[0]])]
+            else:
+                detection_lists = vision_detector.detect_and_analyze_uploads_packed(
+                    [prepared_images[index] for index in group]
+                )
+            error = None
+        except Exception as e:
+            detection_lists = [None] * len(group)
+            error = str(e)
+        detect_ms = (time.perf_counter() - start) * 1000
+        
+        for index, detections in zip(group, detection_lists):
+            if error is None:
+                item = record_upload_detections(detections, prepared_images[index], qualities[index])
+            else:
+                item = {'success': False, 'error': error}
+            item.update({
+                'index': index,
+                'filename': uploads[index][0],
+                'packed_with': len(group),
+                'elapsed_ms': round(prepare_ms[index] + detect_ms, 1)
+            })
+            items[index] = item
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups)))) as executor:
+        list(executor.map(run_group, groups))
+    
+    return items
+
+def get_uploaded_image():
+    """
+    Validate the multipart 'image' field of the current request.
+    
+    Returns:
+        Tuple of (file, None) on success or (None, error response) on failure
+    """
+    if 'image' not in request.files:
+        return None, (jsonify({
+            'success': False,
+            'error': 'No image provided'
+        }), 400)
+        
+    file = request.files['image']
+    if file.filename == '':
+        return None, (jsonify({
+            'success': False,
+            'error': 'Empty filename'
+        }), 400)
+    
+    return file, None
+
 @app.route('/api/analyze-image', methods=['POST'])
 def analyze_image():
     """Analyze an uploaded image for food detection"""
@@ -244,89 +695,287 @@ def analyze_image():
             }), 503
             
         # Get image from request
-        if 'image' not in request.files:
+        file, error_response = get_uploaded_image()
+        if error_response:
+            return error_response
+        
+        # Read image and run the detection pipeline
+        image_bytes = file.read()
+        return jsonify(analyze_uploaded_image(image_bytes))
+        
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/analyze-images', methods=['POST'])
+def analyze_images():
+    """
+    Analyze several uploaded images in one request
+    
+    Multipart form fields:
+        images: One or more image files
+        concurrency: Optional parallel Gemini calls (capped by BATCH_MAX_CONCURRENCY)
+        pack: Optional 'true' to combine small images into shared Gemini requests
+    """
+    try:
+        if not vision_detector:
             return jsonify({
                 'success': False,
-                'error': 'No image provided'
+                'error': 'Vision detector not available'
+            }), 503
+        
+        files = [f for f in request.files.getlist('images') if f.filename]
+        if not files:
+            return jsonify({
+                'success': False,
+                'error': 'No images provided'
             }), 400
-            
-        file = request.files['image']
-        if file.filename == '':
+        
+        if len(files) > BATCH_MAX_IMAGES:
             return jsonify({
                 'success': False,
-                'error': 'Empty filename'
+                'error': f'Too many images (maximum {BATCH_MAX_IMAGES})'
             }), 400
         
-        # Read and process image
-        image_bytes = file.read()
-        image = Image.open(BytesIO(image_bytes))
+        try:
+            concurrency = int(request.form.get('concurrency', BATCH_MAX_CONCURRENCY))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'concurrency must be an integer'
+            }), 400
+        concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+        pack = request.form.get('pack', 'false').lower() in ('1', 'true', 'yes')
         
-        # Convert to OpenCV format
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        uploads = [(f.filename, f.read()) for f in files]
+        start = time.perf_counter()
         
-        # Perform detection
-        detections = vision_detector.detect_and_analyze_food(frame)
+        if pack:
+            items = analyze_batch_packed(uploads, concurrency)
+        else:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(uploads))) as executor:
+                items = list(executor.map(
+                    lambda args: analyze_batch_item(*args),
+                    [(index, filename, image_bytes) for index, (filename, image_bytes) in enumerate(uploads)]
+                ))
         
-        # Process results
-        processed_results = []
-        for detection in detections:
-            result = {
-                'id': f"upload_{int(time.time())}_{len(processed_results)}",
-                'name': detection['name'],
-                'quality': detection['quality'],
-                'quantity': detection['quantity'],
-                'condition': detection['condition'],
-                'safe': detection['safe'],  # Fixed: use 'safe' not 'safe_to_eat'
-                'community': detection['community'],  # Fixed: use 'community' not 'community_share'
-                'confidence': detection['confidence'],
-                'timestamp': datetime.now().isoformat(),
-                'bbox': detection['bbox']
-            }
-            processed_results.append(result)
-            
-        # Store results
-        global latest_results
-        latest_results.extend(processed_results)
+        return jsonify({
+            'success': True,
+            'results': items,
+            'count': len(items),
+            'total_detections': sum(item.get('count', 0) for item in items),
+            'rejected': sum(1 for item in items if item.get('reason')),
+            'concurrency': concurrency,
+            'packed': pack,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/analyze-image/jobs', methods=['POST'])
+def submit_analysis_job():
+    """
+    Queue an uploaded image for analysis and return a job id immediately
+    
+    The result, once available, has the same shape as /api/analyze-image.
+    """
+    try:
+        if not vision_detector:
+            return jsonify({
+                'success': False,
+                'error': 'Vision detector not available'
+            }), 503
+        
+        file, error_response = get_uploaded_image()
+        if error_response:
+            return error_response
         
-        # Save to database
-        for result in processed_results:
-            try:
-                capture_info = {'capture_count': 1, 'frame_count': 1}
-                vision_detector.save_to_mongodb(result, capture_info)
-            except Exception as db_error:
-                print(f"Database save error: {db_error}")
+        # Read the upload now; the request stream is gone once we return
+        image_bytes = file.read()
+        job = job_manager.submit('analyze-image', analyze_uploaded_image, image_bytes)
         
         return jsonify({
             'success': True,
-            'message': f'Found {len(processed_results)} food items',
-            'results': processed_results,
-            'count': len(processed_results)
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/analysis-jobs/{job.id}',
+            'events_url': f'/api/analysis-jobs/{job.id}/events'
+        }), 202
         
+    except JobQueueFullError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/analysis-jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Get the status and, once finished, the result of an analysis job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
+@app.route('/api/analysis-jobs/<job_id>/events', methods=['GET'])
+def stream_analysis_job(job_id):
+    """
+    Server-Sent Events stream for an analysis job
+    
+    Emits a 'status' event on every state change and a final 'complete' or
+    'failed' event carrying the full job, then closes.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+    
+    def generate():
+        version = -1
+        while True:
+            if version != job.version:
+                version = job.version
+                if job.done:
+                    event = 'complete' if job.status == AnalysisJob.COMPLETED else 'failed'
+                    yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                    return
+                yield f"event: status\ndata: {json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+            elif job.wait_for_change(version, timeout=EVENT_STREAM_HEARTBEAT_SECONDS) == version:
+                # Keep proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def is_detection_active():
+    """Whether a background detection session is running in any worker"""
+    if detection_session is not None and detection_session.is_alive():
+        return True
+    return detection_sessions.current() is not None
+
+def watch_detection_session(session):
+    """
+    Publish the local session's status for other workers and stop it when
+    another worker asks; releases ownership once the session ends.
+    """
+    owner = shared_state.WORKER_ID
+    while session.is_alive():
+        detection_sessions.publish(owner, session.get_status())
+        if detection_sessions.stop_requested(owner):
+            session.stop()
+            break
+        session.stopped.wait(DETECTION_STATUS_PUBLISH_SECONDS)
+    session.join(timeout=5.0)
+    detection_sessions.release(owner, session.get_status())
+
+def get_session_status():
+    """Status of this worker's session, else the one published by the owning worker"""
+    if detection_session is not None and detection_session.is_alive():
+        return detection_session.get_status()
+    owned = detection_sessions.current()
+    if owned is not None:
+        return owned['status']
+    if detection_session is not None:
+        return detection_session.get_status()
+    return detection_sessions.last_status()
+
 @app.route('/api/start-detection', methods=['POST'])
 def start_camera_detection():
-    """Start live camera detection (placeholder for future implementation)"""
+    """
+    Start a background detection session
+    
+    The source is always DETECTION_SOURCE; it cannot be chosen by the client.
+    
+    Optional request JSON:
+    {
+        "calls_per_minute": 12,       // Gemini call budget
+        "min_interval_seconds": 2,    // fastest sampling rate
+        "loop": false                 // restart video files at the end
+    }
+    """
     try:
-        global detection_active
+        global detection_session
+        
+        if not vision_detector:
+            return jsonify({
+                'success': False,
+                'error': 'Vision detector not available'
+            }), 503
         
-        if detection_active:
+        if is_detection_active():
             return jsonify({
                 'success': False,
                 'error': 'Detection already active'
             }), 400
-            
-        detection_active = True
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            calls_per_minute = data.get('calls_per_minute')
+            min_interval = data.get('min_interval_seconds')
+            session = DetectionSession(
+                vision_detector,
+                lambda detections, capture_info: store_detection_results(detections, 'session', capture_info),
+                calls_per_minute=float(calls_per_minute) if calls_per_minute is not None else None,
+                min_interval=float(min_interval) if min_interval is not None else None,
+                loop_video=bool(data.get('loop', False))
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid session options: {e}'
+            }), 400
+        
+        # Only one worker may own the session
+        owner = shared_state.WORKER_ID
+        if not detection_sessions.claim(owner):
+            return jsonify({
+                'success': False,
+                'error': 'Detection already active'
+            }), 400
+        
+        session.start()
+        session.ready.wait(timeout=10)
+        if session.error:
+            detection_sessions.release(owner, session.get_status())
+            return jsonify({
+                'success': False,
+                'error': session.error
+            }), 400
+        
+        detection_session = session
+        detection_sessions.publish(owner, session.get_status())
+        threading.Thread(
+            target=watch_detection_session, args=(session,), name='detection-session-watch', daemon=True
+        ).start()
         
         return jsonify({
             'success': True,
             'message': 'Camera detection started',
-            'status': 'active'
+            'status': 'active',
+            'session': session.get_status()
         })
         
     except Exception as e:
@@ -337,15 +986,22 @@ def start_camera_detection():
 
 @app.route('/api/stop-detection', methods=['POST'])
 def stop_camera_detection():
-    """Stop live camera detection"""
+    """Stop the background detection session, whichever worker runs it"""
     try:
-        global detection_active
-        detection_active = False
+        if detection_session is not None and detection_session.is_alive():
+            detection_session.stop()
+            detection_sessions.release(shared_state.WORKER_ID, detection_session.get_status())
+        elif detection_sessions.request_stop():
+            # Owned by another worker: it stops at its next status publish
+            deadline = time.monotonic() + DETECTION_REMOTE_STOP_SECONDS
+            while detection_sessions.current() is not None and time.monotonic() < deadline:
+                time.sleep(0.1)
         
         return jsonify({
             'success': True,
             'message': 'Camera detection stopped',
-            'status': 'inactive'
+            'status': 'inactive',
+            'session': get_session_status()
         })
         
     except Exception as e:
@@ -354,6 +1010,15 @@ def stop_camera_detection():
             'error': str(e)
         }), 500
 
+@app.route('/api/detection-status', methods=['GET'])
+def get_detection_status():
+    """Get the state, adaptive sampling interval and counters of the detection session"""
+    return jsonify({
+        'success': True,
+        'active': is_detection_active(),
+        'session': get_session_status()
+    })
+
 # ==================== COOKING ASSISTANT ENDPOINTS ====================
 
 @app.route('/api/suggest-recipes', methods=['POST'])
@@ -377,28 +1042,45 @@ def suggest_recipes():
         if isinstance(ingredients, list):
             ingredients = ', '.join(ingredients)
             
-        # Create prompt and get AI response
-        prompt = cooking_assistant.create_ingredients_prompt(ingredients)
-        response = cooking_assistant.get_gemini_response(prompt)
+        key = suggestions_key(ingredients, cooking_assistant.PROMPT_VERSION)
         
-        if not response:
+        def generate():
+            # Create prompt and get AI response
+            prompt = cooking_assistant.create_ingredients_prompt(ingredients)
+            response = cooking_assistant.get_gemini_response(prompt)
+            if not response:
+                return None
+            # Parse suggested dishes with full recipes (optimized single call)
+            dishes, recipes = cooking_assistant.parse_dish_suggestions_with_recipes(response)
+            result = {'raw_response': response, 'suggested_dishes': dishes, 'recipes': recipes}
+            # An unparseable response would otherwise be served for the whole TTL
+            if dishes:
+                recipe_cache.put(key, result)
+            return result
+        
+        result = recipe_cache.get(key)
+        cached = result is not None
+        if not cached:
+            result = recipe_flights.do(key, generate)
+        
+        if not result:
             return jsonify({
                 'success': False,
                 'error': 'Failed to get recipe suggestions'
             }), 500
-            
-        # Parse suggested dishes with full recipes (optimized single call)
-        dishes, recipes = cooking_assistant.parse_dish_suggestions_with_recipes(response)
         
         return jsonify({
             'success': True,
             'ingredients': ingredients,
-            'raw_response': response,
-            'suggested_dishes': dishes,
-            'recipes': recipes,
-            'count': len(dishes)
+            'raw_response': result['raw_response'],
+            'suggested_dishes': result['suggested_dishes'],
+            'recipes': result['recipes'],
+            'count': len(result['suggested_dishes']),
+            'cached': cached
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -432,8 +1114,19 @@ def get_recipe():
             prompt = cooking_assistant.create_selected_dish_prompt(dish_name, ingredients)
         else:
             prompt = cooking_assistant.create_dish_prompt(dish_name)
-            
-        response = cooking_assistant.get_gemini_response(prompt)
+        
+        key = recipe_key(dish_name, ingredients, cooking_assistant.PROMPT_VERSION)
+        
+        def generate():
+            response = cooking_assistant.get_gemini_response(prompt)
+            if response:
+                recipe_cache.put(key, response)
+            return response
+        
+        response = recipe_cache.get(key)
+        cached = response is not None
+        if not cached:
+            response = recipe_flights.do(key, generate)
         
         if not response:
             return jsonify({
@@ -445,15 +1138,26 @@ def get_recipe():
             'success': True,
             'dish_name': dish_name,
             'available_ingredients': ingredients,
-            'recipe': response
+            'recipe': response,
+            'cached': cached
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+def create_cooking_chat_prompt(user_message):
+    """Create a general cooking assistant prompt"""
+    return f"""You are a helpful cooking assistant. Please help with this cooking question or request: 
+
+{user_message}
+
+Provide practical, clear advice for home cooking. If it's about recipes, include ingredients and steps. If it's about food safety, be specific about guidelines."""
+
 @app.route('/api/cooking-chat', methods=['POST'])
 def cooking_chat():
     """General cooking assistance chat endpoint"""
@@ -472,28 +1176,244 @@ def cooking_chat():
             }), 400
             
         user_message = data['message']
+        prompt = create_cooking_chat_prompt(user_message)
+        response = cooking_assistant.get_gemini_response(prompt)
+        
+        if not response:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to get cooking assistance'
+            }), 500
+            
+        return jsonify({
+            'success': True,
+            'user_message': user_message,
+            'assistant_response': response
+        })
         
-        # Create a general cooking assistant prompt
-        prompt = f"""You are a helpful cooking assistant. Please help with this cooking question or request: 
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-{user_message}
+# ==================== STREAMING COOKING ENDPOINTS ====================
 
-Provide practical, clear advice for home cooking. If it's about recipes, include ingredients and steps. If it's about food safety, be specific about guidelines."""
+def stream_text_response(first, chunks, finish):
+    """
+    Server-Sent Events response relaying generated text
+    
+    Sends a 'chunk' event ({"text": ...}) for each piece of text, then a
+    'done' event carrying finish(full_text) - the same body the
+    non-streaming endpoint returns - or an 'error' event if generation
+    fails part way.
+    
+    Args:
+        first: First piece of text, already read so upstream errors could
+            still become a normal error response
+        chunks: Iterator over the remaining pieces
+        finish: Callable building the 'done' payload from the full text
+    """
+    def generate():
+        parts = [first]
+        yield f"event: chunk\ndata: {json.dumps({'text': first})}\n\n"
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield f"event: chunk\ndata: {json.dumps({'text': text})}\n\n"
+            payload = finish(''.join(parts))
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'success': False, 'error': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps(payload)}\n\n"
+    
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Frees the Gemini slot if the client disconnects mid-stream
+    if hasattr(chunks, 'close'):
+        response.call_on_close(chunks.close)
+    return response
+
+def open_text_stream(prompt):
+    """
+    Start streaming a Gemini response.
+    
+    Returns:
+        (first_text, remaining_iterator), or (None, None) if Gemini returned nothing
+    """
+    chunks = cooking_assistant.stream_gemini_response(prompt)
+    first = next(chunks, None)
+    if first is None:
+        return None, None
+    return first, chunks
+
+@app.route('/api/suggest-recipes/stream', methods=['POST'])
+def suggest_recipes_stream():
+    """
+    Streaming variant of /api/suggest-recipes (Server-Sent Events)
+    
+    A cached result is sent as a single chunk.
+    """
+    try:
+        if not cooking_assistant:
+            return jsonify({
+                'success': False,
+                'error': 'Cooking assistant not available'
+            }), 503
+            
+        data = request.get_json()
+        if not data or 'ingredients' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Ingredients list required'
+            }), 400
+            
+        ingredients = data['ingredients']
+        if isinstance(ingredients, list):
+            ingredients = ', '.join(ingredients)
         
-        response = cooking_assistant.get_gemini_response(prompt)
+        key = suggestions_key(ingredients, cooking_assistant.PROMPT_VERSION)
+        cached = recipe_cache.get(key)
         
-        if not response:
+        def finish(response):
+            if cached is not None:
+                result = cached
+            else:
+                dishes, recipes = cooking_assistant.parse_dish_suggestions_with_recipes(response)
+                result = {'raw_response': response, 'suggested_dishes': dishes, 'recipes': recipes}
+                if dishes:
+                    recipe_cache.put(key, result)
+            return {
+                'success': True,
+                'ingredients': ingredients,
+                'raw_response': result['raw_response'],
+                'suggested_dishes': result['suggested_dishes'],
+                'recipes': result['recipes'],
+                'count': len(result['suggested_dishes']),
+                'cached': cached is not None
+            }
+        
+        if cached is not None:
+            return stream_text_response(cached['raw_response'], iter(()), finish)
+        
+        first, chunks = open_text_stream(cooking_assistant.create_ingredients_prompt(ingredients))
+        if first is None:
             return jsonify({
                 'success': False,
-                'error': 'Failed to get cooking assistance'
+                'error': 'Failed to get recipe suggestions'
             }), 500
+        return stream_text_response(first, chunks, finish)
+        
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/get-recipe/stream', methods=['POST'])
+def get_recipe_stream():
+    """
+    Streaming variant of /api/get-recipe (Server-Sent Events)
+    
+    A cached recipe is sent as a single chunk.
+    """
+    try:
+        if not cooking_assistant:
+            return jsonify({
+                'success': False,
+                'error': 'Cooking assistant not available'
+            }), 503
             
+        data = request.get_json()
+        if not data or 'dish_name' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Dish name required'
+            }), 400
+            
+        dish_name = data['dish_name']
+        ingredients = data.get('available_ingredients', '')
+        
+        # Choose appropriate prompt based on available ingredients
+        if ingredients:
+            if isinstance(ingredients, list):
+                ingredients = ', '.join(ingredients)
+            prompt = cooking_assistant.create_selected_dish_prompt(dish_name, ingredients)
+        else:
+            prompt = cooking_assistant.create_dish_prompt(dish_name)
+        
+        key = recipe_key(dish_name, ingredients, cooking_assistant.PROMPT_VERSION)
+        cached = recipe_cache.get(key)
+        
+        def finish(response):
+            if cached is None and response:
+                recipe_cache.put(key, response)
+            return {
+                'success': True,
+                'dish_name': dish_name,
+                'available_ingredients': ingredients,
+                'recipe': response,
+                'cached': cached is not None
+            }
+        
+        if cached is not None:
+            return stream_text_response(cached, iter(()), finish)
+        
+        first, chunks = open_text_stream(prompt)
+        if first is None:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to get recipe details'
+            }), 500
+        return stream_text_response(first, chunks, finish)
+        
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
         return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/cooking-chat/stream', methods=['POST'])
+def cooking_chat_stream():
+    """Streaming variant of /api/cooking-chat (Server-Sent Events)"""
+    try:
+        if not cooking_assistant:
+            return jsonify({
+                'success': False,
+                'error': 'Cooking assistant not available'
+            }), 503
+            
+        data = request.get_json()
+        if not data or 'message' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Message required'
+            }), 400
+            
+        user_message = data['message']
+        first, chunks = open_text_stream(create_cooking_chat_prompt(user_message))
+        if first is None:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to get cooking assistance'
+            }), 500
+        
+        return stream_text_response(first, chunks, lambda response: {
             'success': True,
             'user_message': user_message,
             'assistant_response': response
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -521,13 +1441,11 @@ def analyze_and_suggest():
             
         file = request.files['image']
         image_bytes = file.read()
-        image = Image.open(BytesIO(image_bytes))
-        
-        # Convert to OpenCV format
-        frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        prepared = prepare_upload(image_bytes, vision_detector.preprocessor)
+        quality = vision_detector.assess_frame_quality(prepared.preview)
         
         # Detect food items
-        detections = vision_detector.detect_and_analyze_food(frame)
+        detections = vision_detector.detect_and_analyze_upload(prepared)
         
         # Extract fresh/safe ingredients
         fresh_ingredients = []
@@ -540,7 +1458,9 @@ def analyze_and_suggest():
                 'success': True,
                 'message': 'No suitable ingredients found for cooking',
                 'detections': detections,
-                'suggested_dishes': []
+                'suggested_dishes': [],
+                'image_stats': prepared.to_dict(),
+                'quality_check': quality
             })
             
         # Get recipe suggestions
@@ -557,9 +1477,13 @@ def analyze_and_suggest():
             'detections': detections,
             'fresh_ingredients': fresh_ingredients,
             'suggested_dishes': suggested_dishes,
-            'recipe_response': recipe_response
+            'recipe_response': recipe_response,
+            'image_stats': prepared.to_dict(),
+            'quality_check': quality
         })
         
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -572,9 +1496,7 @@ def analyze_and_suggest():
 def clear_results():
     """Clear stored detection results"""
     try:
-        global latest_results
-        count = len(latest_results)
-        latest_results = []
+        count = latest_results.clear()
         
         return jsonify({
             'success': True,
@@ -587,31 +1509,37 @@ def clear_results():
             'error': str(e)
         }), 500
 
+def database_stats_version():
+    """Detections written by this process plus a time bucket, or None without a database"""
+    if not vision_detector or vision_detector.writer is None:
+        return None
+    bucket = int(time.time() // DATABASE_STATS_ETAG_SECONDS)
+    return f"{vision_detector.writer.stats['written']}-{bucket}"
+
 @app.route('/api/database-stats', methods=['GET'])
+@conditional_get(database_stats_version)
 def get_database_stats():
     """Get database statistics"""
     try:
-        if not vision_detector or not vision_detector.collection:
+        store = vision_detector.store if vision_detector else None
+        if store is None:
             return jsonify({
                 'success': False,
                 'error': 'Database not available'
             }), 503
             
-        # Get collection stats
-        doc_count = vision_detector.collection.count_documents({})
-        
-        # Get recent detections
-        recent_docs = list(vision_detector.collection.find({}).sort('timestamp', -1).limit(5))
+        # Document count (MongoDB: collection metadata, no scan)
+        doc_count = store.count()
         
-        # Convert ObjectId to string for JSON serialization
-        for doc in recent_docs:
-            doc['_id'] = str(doc['_id'])
+        # Recent detections, newest first (served by the timestamp index on either backend)
+        recent_docs = store.recent(5)
             
         return jsonify({
             'success': True,
             'total_detections': doc_count,
-            'database_name': vision_detector.db.name,
-            'collection_name': vision_detector.collection.name,
+            'storage_backend': store.backend,
+            'database_name': store.database_name,
+            'collection_name': store.collection_name,
             'recent_detections': recent_docs
         })
         
@@ -647,16 +1575,27 @@ def print_endpoints():
     print("           FRESHLOOP API ENDPOINTS")
     print("="*60)
     print("\n🖥️  COMPUTER VISION:")
-    print("  GET /api/gemini-results          - Get detection results")
+    print("  GET /api/gemini-results          - Get detection results (?since=<seq>&limit=N)")
+    print("  POST /api/gemini-results         - Add a detection result (CLI)")
+    print("  POST /api/gemini-results/bulk    - Add several detection results")
+    print("  GET /api/gemini-results/stream   - Detection result event stream")
     print("  POST /api/test-detection         - Add test detection")
     print("  POST /api/analyze-image          - Analyze uploaded image")
-    print("  POST /api/start-detection        - Start camera detection")
+    print("  POST /api/analyze-images         - Analyze a batch of images")
+    print("  POST /api/analyze-image/jobs     - Queue image analysis (async)")
+    print("  GET /api/analysis-jobs/<id>      - Analysis job status/result")
+    print("  GET /api/analysis-jobs/<id>/events - Analysis job event stream")
+    print("  POST /api/start-detection        - Start camera/video detection")
     print("  POST /api/stop-detection         - Stop camera detection")
+    print("  GET /api/detection-status        - Detection session status")
     
     print("\n🍳 COOKING ASSISTANT:")
     print("  POST /api/suggest-recipes        - Get recipe suggestions")
     print("  POST /api/get-recipe            - Get detailed recipe")
     print("  POST /api/cooking-chat          - General cooking assistance")
+    print("  POST /api/suggest-recipes/stream - Recipe suggestions (event stream)")
+    print("  POST /api/get-recipe/stream     - Detailed recipe (event stream)")
+    print("  POST /api/cooking-chat/stream   - Cooking assistance (event stream)")
     
     print("\n🤝 COMMUNITY HELP:")
     print("  POST /api/generate-help-message  - Generate AI help message")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+MongoDB Client Registry
+One pooled MongoClient per process, shared by every service that talks to
+MongoDB. The client is created lazily and re-created in a child process
+after a fork (e.g. gunicorn workers forked from a preloaded master).
+"""
+
+import os
+import atexit
+import threading
+
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class MongoPoolConfig:
+    """Configuration for the shared MongoDB client"""
+
+    URI = os.getenv('MONGODB_URI')
+    MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '20'))
+    MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', '0'))
+    MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '60000'))
+    CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '5000'))
+    SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '20000'))
+
+# ==================== REGISTRY ====================
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+_stats = {
+    'clients_created': 0,
+    'fork_resets': 0
+}
+
+def is_configured():
+    """True if a MongoDB connection string is available"""
+    return bool(MongoPoolConfig.URI)
+
+def get_client():
+    """
+    Return this process's shared MongoClient, creating it on first use.
+
+    The client is created with connect=False, so no network round trip
+    happens until the first operation. Returns None when MONGODB_URI is
+    not set.
+    """
+    global _client, _client_pid
+    if not MongoPoolConfig.URI:
+        return None
+
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid:
+        return client
+
+    with _lock:
+        if _client is not None and _client_pid != pid:
+            # Inherited from the parent; its sockets belong to the parent
+            _client = None
+            _stats['fork_resets'] += 1
+        if _client is None:
+            _client = MongoClient(
+                MongoPoolConfig.URI,
+                maxPoolSize=MongoPoolConfig.MAX_POOL_SIZE,
+                minPoolSize=MongoPoolConfig.MIN_POOL_SIZE,
+                maxIdleTimeMS=MongoPoolConfig.MAX_IDLE_TIME_MS,
+                connectTimeoutMS=MongoPoolConfig.CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MongoPoolConfig.SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MongoPoolConfig.SOCKET_TIMEOUT_MS,
+                connect=False
+            )
+            _client_pid = pid
+            _stats['clients_created'] += 1
+        return _client
+
+def get_database(db_name):
+    """Return a database handle from the shared client, or None if MongoDB is not configured"""
+    client = get_client()
+    return client[db_name] if client is not None else None
+
+def get_collection(db_name, collection_name):
+    """Return a collection handle from the shared client, or None if MongoDB is not configured"""
+    db = get_database(db_name)
+    return db[collection_name] if db is not None else None
+
+def ping():
+    """
+    Check that MongoDB is reachable.
+
+    Returns:
+        True on success, False if not configured or unreachable
+    """
+    client = get_client()
+    if client is None:
+        return False
+    try:
+        client.admin.command('ping')
+        return True
+    except Exception as e:
+        print(f"❌ MongoDB ping failed: {e}")
+        return False
+
+def close_client():
+    """Close this process's shared client; the next get_client() creates a new one"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+def get_stats():
+    """Return registry counters and pool settings"""
+    with _lock:
+        return {
+            **_stats,
+            'configured': is_configured(),
+            'active': _client is not None and _client_pid == os.getpid(),
+            'pid': os.getpid(),
+            'max_pool_size': MongoPoolConfig.MAX_POOL_SIZE,
+            'min_pool_size': MongoPoolConfig.MIN_POOL_SIZE,
+            'connect_timeout_ms': MongoPoolConfig.CONNECT_TIMEOUT_MS,
+            'server_selection_timeout_ms': MongoPoolConfig.SERVER_SELECTION_TIMEOUT_MS,
+            'socket_timeout_ms': MongoPoolConfig.SOCKET_TIMEOUT_MS
+        }
+
+def _reset_after_fork():
+    """Drop the inherited client and lock in a freshly forked child"""
+    global _client, _client_pid, _lock
+    _lock = threading.Lock()
+    if _client is not None:
+        _client = None
+        _client_pid = None
+        _stats['fork_resets'] += 1
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+atexit.register(close_client)
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'MongoPoolConfig',
+    'is_configured',
+    'get_client',
+    'get_database',
+    'get_collection',
+    'ping',
+    'close_client',
+    'get_stats'
+]
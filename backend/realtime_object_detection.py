@@ -7,17 +7,68 @@ This script performs food detection and analysis using only Gemini Vision API.
 import cv2
 import numpy as np
 import sys
-import os
 import time
 import base64
-from dotenv import load_dotenv
-import google.genai as genai
-from PIL import Image
-import io
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from google.genai import types
 import re
-import requests
-from pymongo import MongoClient
 from datetime import datetime, timezone
+from image_cache import DetectionCache, DetectionCacheConfig, sha256_digest, dhash
+from image_pipeline import ImagePreprocessor
+from detection_writer import DetectionWriter
+from storage import get_detection_store
+import mongo_registry
+from web_delivery import ResultDelivery
+from gemini_gateway import get_gateway
+from circuit_breaker import CircuitOpenError
+from frame_gates import (
+    create_scene_gate, FrameQualityGate, QualityGateConfig, FrameRejectedError
+)
+
+# MongoDB location of saved detections
+DETECTIONS_DB = 'food_detection_db'
+DETECTIONS_COLLECTION = 'food_detections'
+
+# Comprehensive prompt for detection and analysis
+DETECTION_PROMPT = """You are a food quality inspector with computer vision capabilities. 
+            
+Analyze this image and detect ALL food items, beverages, and food-related objects visible.
+            
+For EACH item you detect, provide:
+            1. Item Name: [specific name]
+            2. Position: [describe where in image - left/center/right, top/middle/bottom]
+            3. Quality: [Fresh/Average/Poor]
+            4. Quantity: [Small/Medium/Large portion]
+            5. Condition: [Ripe/Raw/Cooked/Spoiled/Moldy/etc.]
+            6. Safe to Eat: [Yes/No with reason]
+            7. Community Share: [Yes/No - suitable for sharing/donating to community based on the food quality and condition]
+            
+Format each detection as:
+            ITEM: [name]
+            POSITION: [location description]
+            QUALITY: [quality]
+            QUANTITY: [quantity]
+            CONDITION: [condition]
+            SAFE: [yes/no with reason]
+            COMMUNITY: [yes/no with reason]
+            ---
+            
+If no food items are visible, respond with: "No food items detected."
+            
+Be thorough and detect everything edible or food-related in the image."""
+
+# Header prepended to DETECTION_PROMPT when several images share one request
+PACKED_DETECTION_HEADER = """You will receive {count} images, each introduced by a label "IMAGE n:".
+Apply the instructions below to EACH image independently.
+Begin the analysis of each image with a line "=== IMAGE n ===" using its label number, then list that image's detections in the format described.
+If an image has no food, write "No food items detected." under its heading.
+
+"""
+
+PACKED_SECTION_PATTERN = re.compile(r'===\s*IMAGE\s+(\d+)\s*===')
 
 def get_food_color(food_name):
     """Return color coding for different food types."""
@@ -48,62 +99,67 @@ class GeminiVisionDetector:
     """Handles Gemini Vision API integration for food detection and analysis."""
     
     def __init__(self):
-        """Initialize Gemini client and MongoDB connection."""
-        self.client = None
-        self.mongo_client = None
-        self.db = None
-        self.collection = None
+        """Initialize Gemini access and detection storage."""
+        self.gateway = None  # Shared Gemini client and rate limits
+        self.database_enabled = False
+        self.store = None   # Detection storage backend (MongoDB or SQLite)
+        self.writer = None  # Write-behind buffer for detection documents
+        self.delivery = ResultDelivery()  # Batched, non-blocking web API delivery
+        self.cache = DetectionCache() if DetectionCacheConfig.ENABLED else None
+        self.preprocessor = ImagePreprocessor()
+        self.quality_gate = FrameQualityGate() if QualityGateConfig.ENABLED else None
+        self.last_encode_stats = None
         self.setup_gemini()
         self.setup_mongodb()
     
     def setup_gemini(self):
-        """Set up Gemini API connection."""
-        load_dotenv()
-        
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key or api_key == 'your_gemini_api_key_here':
-            print("Warning: GEMINI_API_KEY not found. Detection disabled.")
-            return
-        
+        """Set up Gemini API access through the shared gateway."""
         try:
-            self.client = genai.Client(api_key=api_key)
+            self.gateway = get_gateway()
+            if self.gateway is None:
+                print("Warning: GEMINI_API_KEY not found. Detection disabled.")
+                return
             print("Gemini Vision API configured successfully!")
         except Exception as e:
             print(f"Error configuring Gemini API: {e}")
             print("Detection disabled.")
     
     def setup_mongodb(self):
-        """Set up MongoDB connection."""
+        """
+        Set up detection storage: MongoDB when MONGODB_URI is set, otherwise
+        the embedded SQLite database (see storage.py).
+        
+        No round trip happens here; the backend connects on first use.
+        """
         try:
-            # MongoDB connection parameters from environment
-            connection_string = os.getenv('MONGODB_URI')
-            if not connection_string:
-                print("Warning: MONGODB_URI not found in environment variables. Database disabled.")
+            self.store = get_detection_store(DETECTIONS_DB, DETECTIONS_COLLECTION)
+            if self.store is None:
+                print("Warning: Storage backend disabled. Database saving disabled.")
                 return
+            self.database_enabled = True
             
-            # Connect to MongoDB
-            self.mongo_client = MongoClient(connection_string)
-            self.db = self.mongo_client['food_detection_db']  # Use specific database name
-            self.collection = self.db['food_detections']
-            
-            # Test connection and print database info
-            self.mongo_client.admin.command('ping')
-            print("MongoDB connected successfully!")
+            # Batched background writes; spills locally while the database is unreachable
+            self.writer = DetectionWriter(lambda: self.store)
+            self.writer.start()
             
-            # Print database and collection info
-            print(f"Using database: {self.db.name}")
-            print(f"Using collection: {self.collection.name}")
-            
-            # Check existing documents count
-            doc_count = self.collection.count_documents({})
-            print(f"Current documents in collection: {doc_count}")
+            print(f"Detection storage configured ({self.store.backend}): "
+                  f"{self.store.database_name}.{self.store.collection_name}")
             
         except Exception as e:
-            print(f"Error connecting to MongoDB: {e}")
+            print(f"Error setting up detection storage: {e}")
             print("Database saving disabled.")
+            self.database_enabled = False
+            self.store = None
+            self.writer = None
     
     def send_to_web_api(self, detection_data):
-        """Send detection results to Flask web API."""
+        """
+        Queue detection results for the Flask web API.
+        
+        Results are batched and POSTed by a background sender (or handed
+        over in memory when the API runs in this process); this call does
+        not wait on the network.
+        """
         try:
             # Prepare data for web API
             api_data = {
@@ -116,27 +172,23 @@ class GeminiVisionDetector:
                 'confidence': detection_data['confidence']
             }
             
-            # Send to web API
-            response = requests.post('http://localhost:5000/api/gemini-results', 
-                                   json=api_data, timeout=5)
-            
-            if response.status_code == 200:
-                print("✅ Results sent to web interface!")
+            if self.delivery.enqueue(api_data):
                 return True
-            else:
-                print(f"⚠️ Web API error: {response.status_code}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ Failed to send to web API: {e}")
+            print("⚠️ Web delivery queue is full - result not sent")
             return False
+            
         except Exception as e:
             print(f"⚠️ Unexpected error sending to web: {e}")
             return False
     
     def save_to_mongodb(self, detection_data, capture_info):
-        """Save detection data to MongoDB."""
-        if self.mongo_client is None or self.collection is None:
+        """
+        Queue detection data for MongoDB.
+        
+        The document is handed to the write-behind writer, which inserts it
+        with the next batch; this call never waits on the database.
+        """
+        if self.writer is None:
             return False
         
         try:
@@ -166,23 +218,7 @@ class GeminiVisionDetector:
                 }
             }
             
-            # Insert document
-            result = self.collection.insert_one(document)
-            print(f"✓ Saved to MongoDB with ID: {result.inserted_id}")
-            
-            # Verify insertion by checking document count
-            new_count = self.collection.count_documents({})
-            print(f"Total documents now: {new_count}")
-            
-            # Verify the document was actually inserted
-            inserted_doc = self.collection.find_one({'_id': result.inserted_id})
-            if inserted_doc:
-                print(f"✓ Verified: Document exists in database")
-                print(f"Food item: {inserted_doc['detection']['name']}")
-            else:
-                print("✗ Warning: Document not found after insertion")
-            
-            return True
+            return self.writer.enqueue(document)
             
         except Exception as e:
             print(f"Error saving to MongoDB: {e}")
@@ -191,86 +227,212 @@ class GeminiVisionDetector:
     def encode_image(self, image_array):
         """Convert image array to base64 string."""
         try:
-            # Convert BGR to RGB
-            image_rgb = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
-            
-            # Convert to PIL Image
-            pil_image = Image.fromarray(image_rgb)
-            
-            # Convert to bytes
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format='JPEG')
-            image_bytes = buffer.getvalue()
-            
-            # Encode to base64
-            base64_string = base64.b64encode(image_bytes).decode('utf-8')
-            return base64_string
+            prepared = self.preprocessor.encode_frame(image_array)
+            return base64.b64encode(prepared.data).decode('utf-8')
         except Exception as e:
             print(f"Error encoding image: {e}")
             return None
     
-    def detect_and_analyze_food(self, frame):
-        """Detect and analyze food items in the entire frame using Gemini Vision."""
-        if not self.client:
+    def detect_and_analyze_food(self, frame, image_bytes=None, scene_gate=None):
+        """
+        Detect and analyze food items in the entire frame using Gemini Vision.
+        
+        If image_bytes (the original upload) is given it is used for the exact
+        cache key; otherwise the frame's pixel buffer is hashed. A capture
+        loop passes its own scene_gate (see create_scene_gate) so an unchanged
+        scene reuses that loop's previous analysis; it is never shared between
+        loops or clients.
+        
+        Raises:
+            FrameRejectedError: If the frame fails the quality gate
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = sha256_digest(image_bytes if image_bytes is not None else frame)
+        return self._detect_with_cache(
+            cache_key,
+            frame,
+            frame.shape,
+            lambda: self._encode_frame(frame),
+            scene_gate=scene_gate
+        )
+    
+    def _encode_frame(self, frame):
+        """Run a camera frame through the preprocessing stage and keep its stats."""
+        prepared = self.preprocessor.encode_frame(frame)
+        self.last_encode_stats = prepared.to_dict()
+        return prepared.data, prepared.mime_type
+    
+    def detect_and_analyze_upload(self, prepared):
+        """
+        Detect and analyze food items in a PreparedImage from the upload pipeline.
+        
+        Uploads are never rejected by the quality gate (a user cannot cheaply
+        retake a product photo); see assess_frame_quality() for the advisory
+        metrics.
+        """
+        cache_key = sha256_digest(prepared.source_bytes) if self.cache is not None else None
+        return self._detect_with_cache(
+            cache_key,
+            prepared.preview,
+            prepared.shape,
+            lambda: (prepared.data, prepared.mime_type),
+            check_quality=False
+        )
+    
+    def check_frame_quality(self, frame):
+        """Raise FrameRejectedError if the frame fails the blur/exposure gate."""
+        if self.quality_gate is not None:
+            self.quality_gate.check(frame)
+    
+    def assess_frame_quality(self, frame):
+        """Blur/exposure verdict and metrics for a frame, or None if the gate is disabled."""
+        if self.quality_gate is None:
+            return None
+        return self.quality_gate.assess(frame)
+    
+    def _detect_with_cache(self, cache_key, hash_frame, frame_shape, encode, check_quality=True,
+                           scene_gate=None):
+        """Run a detection through the scene gate (if given) and the result cache; encode() is only called on a miss."""
+        if self.gateway is None:
             return []
         
+        # Raises FrameRejectedError for blurry or badly exposed frames
+        if check_quality:
+            self.check_frame_quality(hash_frame)
+        
+        gate_state = None
+        if scene_gate is not None:
+            reused, gate_state = scene_gate.check(hash_frame, frame_shape)
+            if reused is not None:
+                print("⚡ Scene unchanged - reusing previous analysis")
+                return reused
+        
+        phash = None
+        if self.cache is not None:
+            phash = dhash(hash_frame)
+            cached_text = self.cache.get(cache_key, phash)
+            if cached_text is not None:
+                print("⚡ Detection cache hit - skipping Gemini call")
+                detections = self.parse_detection_response(cached_text, frame_shape)
+                if gate_state is not None:
+                    scene_gate.remember(gate_state, frame_shape, detections)
+                return detections
+        
         try:
-            base64_image = self.encode_image(frame)
-            if not base64_image:
-                return []
+            image_data, mime_type = encode()
+            response_text = self.request_detection(image_data, mime_type)
             
-            # Create comprehensive prompt for detection and analysis
-            prompt = """You are a food quality inspector with computer vision capabilities. 
-            
-Analyze this image and detect ALL food items, beverages, and food-related objects visible.
+            if self.cache is not None and response_text:
+                self.cache.put(cache_key, phash, response_text)
             
-For EACH item you detect, provide:
-            1. Item Name: [specific name]
-            2. Position: [describe where in image - left/center/right, top/middle/bottom]
-            3. Quality: [Fresh/Average/Poor]
-            4. Quantity: [Small/Medium/Large portion]
-            5. Condition: [Ripe/Raw/Cooked/Spoiled/Moldy/etc.]
-            6. Safe to Eat: [Yes/No with reason]
-            7. Community Share: [Yes/No - suitable for sharing/donating to community based on the food quality and condition]
-            
-Format each detection as:
-            ITEM: [name]
-            POSITION: [location description]
-            QUALITY: [quality]
-            QUANTITY: [quantity]
-            CONDITION: [condition]
-            SAFE: [yes/no with reason]
-            COMMUNITY: [yes/no with reason]
-            ---
-            
-If no food items are visible, respond with: "No food items detected."
-            
-Be thorough and detect everything edible or food-related in the image."""
-            
-            # Send to Gemini Vision
-            response = self.client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=[
-                    {
-                        "parts": [
-                            {"text": prompt},
-                            {
-                                "inline_data": {
-                                    "mime_type": "image/jpeg",
-                                    "data": base64_image
-                                }
-                            }
-                        ]
-                    }
-                ]
-            )
-            
-            return self.parse_detection_response(response.text, frame.shape)
+            detections = self.parse_detection_response(response_text, frame_shape)
+            if gate_state is not None:
+                scene_gate.remember(gate_state, frame_shape, detections)
+            return detections
             
+        except CircuitOpenError:
+            # Gemini is down; let the caller fail fast (503) or back off
+            raise
         except Exception as e:
             print(f"Error detecting food with Gemini: {e}")
             return []
     
+    def request_detection(self, image_data, mime_type='image/jpeg'):
+        """Send encoded image bytes to Gemini Vision and return the raw response text."""
+        response = self.gateway.generate_content(
+            'vision',
+            model='gemini-2.5-flash',
+            contents=[
+                types.Content(
+                    role='user',
+                    parts=[
+                        types.Part.from_text(text=DETECTION_PROMPT),
+                        types.Part.from_bytes(data=image_data, mime_type=mime_type)
+                    ]
+                )
+            ]
+        )
+        return response.text
+    
+    def detect_and_analyze_uploads_packed(self, prepared_images):
+        """
+        Detect and analyze several PreparedImages with a single Gemini request.
+        
+        Cached images are answered from the cache; the rest are sent together
+        and the response is split back into one section per image. An image
+        whose section is missing from the response is re-analyzed on its own,
+        so an empty list always means "no food found", never "dropped".
+        
+        The quality gate is not applied here (uploads are only assessed,
+        see assess_frame_quality()).
+        
+        Returns:
+            A list of detection lists, one per input image, in input order
+        """
+        results = [[] for _ in prepared_images]
+        if self.gateway is None:
+            return results
+        
+        pending = []
+        for index, prepared in enumerate(prepared_images):
+            cache_key = None
+            phash = None
+            if self.cache is not None:
+                cache_key = sha256_digest(prepared.source_bytes)
+                phash = dhash(prepared.preview)
+                cached_text = self.cache.get(cache_key, phash)
+                if cached_text is not None:
+                    results[index] = self.parse_detection_response(cached_text, prepared.shape)
+                    continue
+            pending.append((index, prepared, cache_key, phash))
+        
+        if not pending:
+            print("⚡ Detection cache hit for every packed image - skipping Gemini call")
+            return results
+        
+        try:
+            parts = [types.Part.from_text(
+                text=PACKED_DETECTION_HEADER.format(count=len(pending)) + DETECTION_PROMPT
+            )]
+            for label, (_, prepared, _, _) in enumerate(pending, 1):
+                parts.append(types.Part.from_text(text=f"IMAGE {label}:"))
+                parts.append(types.Part.from_bytes(data=prepared.data, mime_type=prepared.mime_type))
+            
+            response = self.gateway.generate_content(
+                'vision',
+                model='gemini-2.5-flash',
+                contents=[types.Content(role='user', parts=parts)]
+            )
+            sections = self.split_packed_response(response.text or '')
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Error detecting food with Gemini (packed request): {e}")
+            sections = {}
+        
+        for label, (index, prepared, cache_key, phash) in enumerate(pending, 1):
+            section = sections.get(label)
+            if section is None:
+                print(f"⚠️ Packed response had no section for image {label} - analyzing it on its own")
+                results[index] = self.detect_and_analyze_upload(prepared)
+                continue
+            if self.cache is not None:
+                self.cache.put(cache_key, phash, section)
+            results[index] = self.parse_detection_response(section, prepared.shape)
+        
+        return results
+    
+    def split_packed_response(self, response_text):
+        """Split a packed Gemini response into {image label: section text}."""
+        sections = {}
+        matches = list(PACKED_SECTION_PATTERN.finditer(response_text))
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(response_text)
+            # Trailing newline keeps the per-field regexes in parse_detection_response working
+            sections[int(match.group(1))] = response_text[match.end():end].strip() + '\n'
+        return sections
+    
     def parse_detection_response(self, response_text, frame_shape):
         """Parse Gemini's detection response and create bounding box data."""
         detections = []
@@ -371,6 +533,124 @@ Be thorough and detect everything edible or food-related in the image."""
         print(f"Community Share: {detection_data['community']}")
         print("="*50)
 
+class FrameGrabber(threading.Thread):
+    """Capture thread that keeps only the most recent camera frame."""
+    
+    def __init__(self, cap):
+        super().__init__(name='frame-grabber', daemon=True)
+        self.cap = cap
+        self.frame = None
+        self.frame_count = 0
+        self.failed = False
+        self.stopped = threading.Event()
+        self.new_frame = threading.Condition()
+    
+    def run(self):
+        while not self.stopped.is_set():
+            ret, frame = self.cap.read()
+            with self.new_frame:
+                if not ret:
+                    self.failed = True
+                    self.new_frame.notify_all()
+                    return
+                # Replace the slot; older unread frames are simply dropped
+                self.frame = frame
+                self.frame_count += 1
+                self.new_frame.notify_all()
+    
+    def wait_for_frame(self, last_count, timeout=1.0):
+        """Return (frame, frame_count) once a frame newer than last_count exists."""
+        with self.new_frame:
+            self.new_frame.wait_for(
+                lambda: self.frame_count != last_count or self.failed,
+                timeout=timeout
+            )
+            return self.frame, self.frame_count
+    
+    def latest_copy(self):
+        """Return a private copy of the most recent frame."""
+        with self.new_frame:
+            return self.frame.copy() if self.frame is not None else None
+    
+    def stop(self):
+        self.stopped.set()
+
+class AnalysisWorker(threading.Thread):
+    """Worker thread that runs Gemini analyses off the render thread."""
+    
+    def __init__(self, detector, max_pending=2, frame_source=None, max_retries=2):
+        super().__init__(name='analysis-worker', daemon=True)
+        self.detector = detector
+        self.frame_source = frame_source  # Returns a fresh frame when one is rejected
+        self.max_retries = max_retries
+        self.scene_gate = create_scene_gate()  # This capture loop's reference frame
+        self.requests = queue.Queue(maxsize=max_pending)
+        self.results = queue.Queue()
+        self.in_flight = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, capture_number, frame_number, frame):
+        """Queue a frame for analysis; returns False if the worker is saturated."""
+        try:
+            self.requests.put_nowait((capture_number, frame_number, frame))
+        except queue.Full:
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+    
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            capture_number, frame_number, frame = request
+            start = time.perf_counter()
+            self.detector.last_encode_stats = None
+            detections = []
+            rejected = None
+            for attempt in range(self.max_retries + 1):
+                try:
+                    detections = self.detector.detect_and_analyze_food(frame, scene_gate=self.scene_gate)
+                    rejected = None
+                    break
+                except FrameRejectedError as e:
+                    # Retry locally with a newer camera frame
+                    rejected = e
+                    if self.frame_source is None or attempt == self.max_retries:
+                        break
+                    time.sleep(0.1)
+                    fresh = self.frame_source()
+                    if fresh is None:
+                        break
+                    frame = fresh
+                except CircuitOpenError as e:
+                    print(f"⚠️ {e}")
+                    break
+            self.results.put({
+                'capture_number': capture_number,
+                'frame_number': frame_number,
+                'detections': detections,
+                'rejected': rejected,
+                'encode_stats': self.detector.last_encode_stats,
+                'elapsed': time.perf_counter() - start
+            })
+            with self._lock:
+                self.in_flight -= 1
+    
+    def stop(self):
+        # Drop queued captures so the sentinel is seen promptly
+        while True:
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                break
+        self.requests.put(None)
+
+def draw_label(frame, text, origin, scale=0.6, color=(255, 255, 255)):
+    """Draw a single line of status text on the frame."""
+    cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
 def main():
     """Main function to run Gemini-based food detection and analysis."""
     
@@ -397,82 +677,122 @@ def main():
     
     print("Camera initialized successfully!")
     print("Press SPACEBAR to capture and analyze food")
+    print("Press 'y' / 'n' to save or skip the detection shown for review")
     print("Press 'q' to quit")
     print("Looking for food items...")
     print("-" * 50)
     
+    # Capture thread -> latest-frame slot, analysis on a worker thread,
+    # saves on a single background thread; this thread only renders.
+    grabber = FrameGrabber(cap)
+    worker = AnalysisWorker(detector, frame_source=grabber.latest_copy)
+    saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix='detection-saver')
+    grabber.start()
+    worker.start()
+    
     frame_count = 0
     food_detected_count = 0
     capture_count = 0
     last_detections = []
     detection_display_time = 5.0  # Show boxes for 5 seconds
     last_detection_time = 0
+    review_queue = deque()  # (detection, capture_info) awaiting a save decision
+    
+    def save_detection(detection, capture_info):
+        detector.save_to_mongodb(detection, capture_info)
+        detector.send_to_web_api(detection)
     
     try:
         while True:
-            # Capture frame from camera
-            ret, frame = cap.read()
-            if not ret:
+            # Wait for the next camera frame from the capture thread
+            previous_count = frame_count
+            frame, frame_count = grabber.wait_for_frame(frame_count)
+            if grabber.failed:
                 print("Error: Could not read frame from camera")
                 break
-            
-            frame_count += 1
+            if frame is None or frame_count == previous_count:
+                # Camera stalled; keep the window responsive without redrawing
+                cv2.waitKey(1)
+                continue
             
             # Check for key press
             key = cv2.waitKey(1) & 0xFF
             
-            # Only perform detection when spacebar is pressed
+            # Queue an analysis when spacebar is pressed
             if key == ord(' '):  # Spacebar pressed
-                capture_count += 1
-                print(f"\n--- CAPTURE {capture_count} ---")
-                print("Analyzing frame with Gemini Vision...")
+                # Copy before drawing overlays on this frame
+                if worker.submit(capture_count + 1, frame_count, frame.copy()):
+                    capture_count += 1
+                    print(f"\n--- CAPTURE {capture_count} ---")
+                    print("Analyzing frame with Gemini Vision (preview keeps running)...")
+                else:
+                    print("⚠️ Analysis queue is full - capture skipped")
+            
+            # Collect finished analyses without blocking
+            while True:
+                try:
+                    finished = worker.results.get_nowait()
+                except queue.Empty:
+                    break
                 
-                # Detect and analyze food using Gemini Vision
-                detections = detector.detect_and_analyze_food(frame)
+                capture_number = finished['capture_number']
+                detections = finished['detections']
+                encode_stats = finished['encode_stats']
+                print(f"\n--- RESULTS FOR CAPTURE {capture_number} ({finished['elapsed']:.1f}s) ---")
+                if finished['rejected'] is not None:
+                    rejected = finished['rejected']
+                    print(f"⚠️ Capture {capture_number} rejected locally ({rejected.reason}): {rejected.metrics}")
+                    print("Improve focus/lighting and press SPACEBAR again")
+                    print("-" * 30)
+                    continue
+                if encode_stats:
+                    print(f"Sent {encode_stats['sent_width']}x{encode_stats['sent_height']} "
+                          f"{encode_stats['mime_type']} at quality {encode_stats['quality']}: "
+                          f"{encode_stats['sent_bytes']} bytes "
+                          f"(raw frame {encode_stats['original_bytes']} bytes, "
+                          f"encode {encode_stats['encode_ms']:.1f} ms)")
                 
-                # Process detection results
                 food_detections = []
-                if detections:
-                    for detection in detections:
-                        food_detections.append((
-                            detection['bbox'], 
-                            detection['confidence'], 
-                            detection['name']
-                        ))
-                        
-                        # Print detection to console
-                        print(f"Found {detection['name']} (confidence: {detection['confidence']:.2f})")
-                        
-                        # Print detailed analysis
-                        detector.print_analysis(detection)
-                        
-                        # Ask user if they want to save to database
-                        save_choice = input("\nSave this detection to database? (y/n): ").strip().lower()
-                        
-                        if save_choice in ['y', 'yes', '1']:
-                            # Save to MongoDB
-                            capture_info = {
-                                'capture_count': capture_count,
-                                'frame_count': frame_count
-                            }
-                            detector.save_to_mongodb(detection, capture_info)
-                            
-                            # Also send to web API
-                            detector.send_to_web_api(detection)
-                        else:
-                            print("✓ Detection not saved to database")
-                        
-                        food_detected_count += len(detections)
+                for detection in detections:
+                    food_detections.append((
+                        detection['bbox'], 
+                        detection['confidence'], 
+                        detection['name']
+                    ))
+                    
+                    # Print detection to console
+                    print(f"Found {detection['name']} (confidence: {detection['confidence']:.2f})")
+                    
+                    # Print detailed analysis
+                    detector.print_analysis(detection)
+                    
+                    # Queue for a save decision instead of blocking on input()
+                    review_queue.append((detection, {
+                        'capture_count': capture_number,
+                        'frame_count': finished['frame_number']
+                    }))
+                
+                food_detected_count += len(detections)
                 
                 if food_detections:
-                    print(f"Capture {capture_count}: Found {len(food_detections)} food items")
+                    print(f"Capture {capture_number}: Found {len(food_detections)} food items")
+                    print("Press 'y' to save or 'n' to skip each detection shown on screen")
                     # Store detections for display
                     last_detections = food_detections.copy()
                     last_detection_time = time.time()
                 else:
-                    print(f"Capture {capture_count}: No food items detected")
+                    print(f"Capture {capture_number}: No food items detected")
                 print("-" * 30)
             
+            # Handle the save decision for the oldest pending detection
+            if review_queue and key in (ord('y'), ord('n')):
+                detection, capture_info = review_queue.popleft()
+                if key == ord('y'):
+                    saver.submit(save_detection, detection, capture_info)
+                    print(f"✓ Saving {detection['name']} in the background")
+                else:
+                    print(f"✓ {detection['name']} not saved to database")
+            
             # Draw persistent bounding boxes from last detection
             current_time = time.time()
             if last_detections and (current_time - last_detection_time) < detection_display_time:
@@ -515,39 +835,21 @@ def main():
                 last_detections = []
             
             # Add status information to frame
-            cv2.putText(
-                frame,
-                f"Frame: {frame_count} | Captures: {capture_count} | Total Detections: {food_detected_count}",
-                (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (255, 255, 255),
-                2
-            )
-            
-            cv2.putText(
-                frame,
-                "Press SPACEBAR to capture | Press 'q' to quit",
-                (10, 60),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (255, 255, 255),
-                2
-            )
+            draw_label(frame, f"Frame: {frame_count} | Captures: {capture_count} | Total Detections: {food_detected_count}", (10, 30))
+            draw_label(frame, "Press SPACEBAR to capture | Press 'q' to quit", (10, 60))
             
             # Show time remaining for current detections
             if last_detections:
                 time_remaining = detection_display_time - (current_time - last_detection_time)
                 if time_remaining > 0:
-                    cv2.putText(
-                        frame,
-                        f"Showing detections: {time_remaining:.1f}s remaining",
-                        (10, 90),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 255, 255),
-                        2
-                    )
+                    draw_label(frame, f"Showing detections: {time_remaining:.1f}s remaining", (10, 90), 0.5, (0, 255, 255))
+            
+            # Show analyses still running and the detection awaiting review
+            if worker.in_flight:
+                draw_label(frame, f"Analyzing... ({worker.in_flight} in flight)", (10, 120), 0.5, (0, 255, 255))
+            if review_queue:
+                pending_name = review_queue[0][0]['name']
+                draw_label(frame, f"Save {pending_name.upper()}? y/n ({len(review_queue)} pending)", (10, 150), 0.5, (0, 255, 0))
             
             # Display the frame
             cv2.imshow('Gemini Vision Food Detection - Press SPACEBAR to Analyze', frame)
@@ -563,13 +865,27 @@ def main():
         print(f"An error occurred: {e}")
     finally:
         # Clean up resources
+        print("Stopping capture and analysis threads...")
+        grabber.stop()
+        worker.stop()
+        grabber.join(timeout=2.0)
+        saver.shutdown(wait=True)
+        
+        if review_queue:
+            print(f"{len(review_queue)} detections were left unreviewed and not saved")
+        
         print("Releasing camera and closing windows...")
         cap.release()
         cv2.destroyAllWindows()
         
-        # Close MongoDB connection
-        if detector.mongo_client is not None:
-            detector.mongo_client.close()
+        # Deliver queued results to the web interface
+        detector.delivery.close()
+        
+        # Write any buffered detections, then close MongoDB connection
+        if detector.writer is not None:
+            detector.writer.close()
+        if detector.database_enabled and detector.store.backend == 'mongodb':
+            mongo_registry.close_client()
             print("MongoDB connection closed.")
         
         print("Cleanup completed successfully!")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Persistent Recipe Cache
+Caches parsed recipe suggestions and recipes in a SQLite file, keyed on a
+canonical form of the request ("eggs, rice" and "Rice, Eggs" share an
+entry) plus the prompt template version. Entries expire after a TTL, and
+the least recently used ones are evicted once the cache exceeds its entry
+or size limit. The file survives restarts and is shared by every worker.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+
+from storage import SQLiteDatabase
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class RecipeCacheConfig:
+    """Configuration for the recipe response cache"""
+
+    ENABLED = os.getenv('RECIPE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PATH = os.getenv('RECIPE_CACHE_PATH', 'freshloop_cache.db')
+    TTL_SECONDS = float(os.getenv('RECIPE_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+    MAX_ENTRIES = int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', '5000'))
+    MAX_BYTES = int(os.getenv('RECIPE_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+RECIPE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipe_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recipe_cache_accessed ON recipe_cache (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_recipe_cache_expires ON recipe_cache (expires_at);
+"""
+
+# ==================== CANONICAL KEYS ====================
+
+def canonical_text(text):
+    """Lower-cased with whitespace collapsed"""
+    return ' '.join(str(text).split()).casefold()
+
+def canonical_ingredients(ingredients):
+    """
+    Sorted, lower-cased, de-duplicated ingredient list.
+
+    Accepts a list or a comma-separated string; empty items are dropped.
+    """
+    if isinstance(ingredients, str):
+        ingredients = ingredients.split(',')
+    return sorted({canonical_text(item) for item in ingredients or []} - {''})
+
+def cache_key(kind, version, **parts):
+    """Stable key for a request kind, prompt version and canonical parts"""
+    payload = json.dumps({'kind': kind, 'version': version, **parts}, sort_keys=True)
+    return kind + ':' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def suggestions_key(ingredients, version):
+    """Key for /api/suggest-recipes"""
+    return cache_key('suggest-recipes', version, ingredients=canonical_ingredients(ingredients))
+
+def recipe_key(dish_name, ingredients, version):
+    """Key for /api/get-recipe (ingredients select a different prompt)"""
+    return cache_key('get-recipe', version, dish=canonical_text(dish_name),
+                     ingredients=canonical_ingredients(ingredients))
+
+# ==================== CACHE ====================
+
+class RecipeCache:
+    """
+    SQLite-backed TTL + LRU cache of JSON-serializable values.
+
+    A database error is logged and treated as a miss (or a skipped write),
+    so the cache never fails a request.
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None, max_bytes=None, enabled=None):
+        self.database = SQLiteDatabase(path or RecipeCacheConfig.PATH, schema=RECIPE_CACHE_SCHEMA)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else RecipeCacheConfig.TTL_SECONDS
+        self.max_entries = max_entries if max_entries is not None else RecipeCacheConfig.MAX_ENTRIES
+        self.max_bytes = max_bytes if max_bytes is not None else RecipeCacheConfig.MAX_BYTES
+        self.enabled = enabled if enabled is not None else RecipeCacheConfig.ENABLED
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evicted': 0,
+            'expired': 0,
+            'errors': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _error(self, action, error):
+        self._count('errors')
+        print(f"⚠️ Recipe cache {action} failed: {error}")
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            conn = self.database.connection()
+            row = conn.execute(
+                'SELECT value, expires_at FROM recipe_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            if row[1] <= now:
+                with self.database.transaction() as conn:
+                    conn.execute('DELETE FROM recipe_cache WHERE key = ? AND expires_at <= ?', (key, now))
+                self._count('expired')
+                self._count('misses')
+                return None
+            with self.database.transaction() as conn:
+                conn.execute('UPDATE recipe_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            value = json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self._error('read', e)
+            return None
+        self._count('hits')
+        return value
+
+    def put(self, key, value):
+        """Store a value, then evict expired and least recently used entries over the limits"""
+        if not self.enabled:
+            return
+        data = json.dumps(value)
+        now = time.time()
+        try:
+            with self.database.transaction() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO recipe_cache (key, value, size, expires_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, data, len(data.encode('utf-8')), now + self.ttl_seconds, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            self._error('write', e)
+            return
+        self._count('writes')
+
+    def _evict(self, conn, now):
+        expired = conn.execute('DELETE FROM recipe_cache WHERE expires_at <= ?', (now,)).rowcount
+        if expired:
+            self._count('expired', expired)
+
+        entries, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM recipe_cache').fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = conn.execute('SELECT key, size FROM recipe_cache ORDER BY accessed_at').fetchall()
+        for key, size in rows:
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM recipe_cache WHERE key = ?', (key,))
+            entries -= 1
+            total -= size
+            evicted += 1
+        self._count('evicted', evicted)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            'enabled': self.enabled,
+            'ttl_seconds': self.ttl_seconds,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes
+        })
+        if self.enabled:
+            try:
+                entries, total = self.database.connection().execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM recipe_cache'
+                ).fetchone()
+                stats.update({'entries': entries, 'bytes': total})
+            except sqlite3.Error as e:
+                self._error('stats', e)
+        return stats
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'RecipeCacheConfig',
+    'canonical_text',
+    'canonical_ingredients',
+    'suggestions_key',
+    'recipe_key',
+    'RecipeCache'
+]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Detection Results Store
+Bounded, thread-safe ring buffer for the most recent detection results.
+Every stored result gets a monotonically increasing sequence id so clients
+can poll for just the results they have not seen yet.
+"""
+
+import os
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class ResultsStoreConfig:
+    """Configuration for the detection results buffer"""
+
+    # Results kept in memory; older ones are discarded
+    MAX_RESULTS = int(os.getenv('RESULTS_BUFFER_SIZE', '500'))
+    # Page size when a client passes since= without limit=
+    DEFAULT_PAGE_SIZE = int(os.getenv('RESULTS_PAGE_SIZE', '100'))
+    MAX_PAGE_SIZE = 1000
+
+# ==================== STORE ====================
+
+class ResultRingBuffer:
+    """
+    Fixed-capacity buffer of result dictionaries.
+
+    Sequence ids are contiguous inside the buffer, so a page after a given
+    cursor is located by index arithmetic from the newest end; a poll costs
+    time proportional to the results it returns, not to the buffer size.
+    """
+
+    epoch = None  # Per-process versions (see http_caching)
+
+    def __init__(self, max_results=None):
+        """Initialize an empty buffer"""
+        self.max_results = max_results or ResultsStoreConfig.MAX_RESULTS
+        self._items = deque(maxlen=self.max_results)
+        self._versions = deque(maxlen=self.max_results)  # Store version when each item was added
+        self._last_seq = 0
+        self._version = 0           # Bumped on every append and clear
+        self._evicted_version = 0   # Version of the newest evicted item
+        self._cleared_version = 0   # Version of the last clear
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified on every append
+        self.stats = {
+            'appended': 0,
+            'evicted': 0
+        }
+
+    def append(self, result):
+        """Store a copy of result with the next sequence id; returns the stored copy"""
+        return self.extend([result])[0]
+
+    def extend(self, results):
+        """Store copies of several results in order; returns the stored copies"""
+        with self._lock:
+            stored = []
+            for result in results:
+                self._last_seq += 1
+                self._version += 1
+                if len(self._items) == self.max_results:
+                    self.stats['evicted'] += 1
+                    self._evicted_version = self._versions[0]
+                item = {**result, 'seq': self._last_seq}
+                self._items.append(item)
+                self._versions.append(self._version)
+                stored.append(item)
+            self.stats['appended'] += len(stored)
+            if stored:
+                self._changed.notify_all()
+            return stored
+
+    def since(self, seq=0, limit=None):
+        """
+        Return results with a sequence id greater than seq, oldest first.
+
+        A cursor ahead of the newest result was issued before a restart (or
+        a wiped store), so it is treated as a reset and the page starts from
+        the oldest stored result instead.
+
+        Returns:
+            Tuple of (results, next cursor, number of results after seq that
+            were already evicted or cleared, whether the cursor was reset)
+        """
+        with self._lock:
+            reset = seq > self._last_seq
+            if reset:
+                seq = 0
+            new_count = self._last_seq - seq
+            if new_count <= 0:
+                return [], seq, 0, reset
+            if not self._items:
+                return [], self._last_seq, new_count, reset
+
+            available = min(new_count, len(self._items))
+            missed = new_count - available
+            count = available if limit is None else min(limit, available)
+            start = len(self._items) - available
+            page = [self._items[start + offset] for offset in range(count)]
+
+        next_cursor = page[-1]['seq'] if page else seq
+        return page, next_cursor, missed, reset
+
+    def wait_for_new(self, seq, timeout):
+        """
+        Block until a result newer than seq is stored or timeout elapses.
+
+        Returns:
+            True if there is something newer than seq
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self._last_seq > seq, timeout=timeout)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    @property
+    def version(self):
+        """Change counter; increases on every append and clear"""
+        return self._version
+
+    def changes_since(self, version):
+        """
+        Return results added after the given store version, oldest first.
+
+        Returns:
+            List of results, or None if a clear or eviction since then means
+            the change set cannot be reproduced
+        """
+        with self._lock:
+            if version > self._version or version < max(self._cleared_version, self._evicted_version):
+                return None
+            index = len(self._items)
+            while index > 0 and self._versions[index - 1] > version:
+                index -= 1
+            return [self._items[i] for i in range(index, len(self._items))]
+
+    def clear(self):
+        """Drop all results; sequence ids keep increasing"""
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+            self._versions.clear()
+            self._version += 1
+            self._cleared_version = self._version
+            return count
+
+    def get_stats(self):
+        """Return buffer counters"""
+        with self._lock:
+            return {
+                **self.stats,
+                'size': len(self._items),
+                'max_results': self.max_results,
+                'last_seq': self._last_seq,
+                'version': self._version
+            }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'ResultsStoreConfig',
+    'ResultRingBuffer'
+]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Gemini Retry Policy
+Retries failed Gemini calls with exponential backoff, full jitter and a
+per-call deadline. When a model is overloaded or out of quota, the next
+model in a fallback chain is tried. Errors that a retry cannot fix (bad
+requests, auth, local throttling) fail at once.
+"""
+
+import os
+import re
+import time
+import random
+import threading
+
+import httpx
+from google.genai import errors
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class RetryPolicyConfig:
+    """Configuration for retrying Gemini calls"""
+
+    MAX_ATTEMPTS = int(os.getenv('GEMINI_RETRY_MAX_ATTEMPTS', '4'))
+    BASE_DELAY_SECONDS = float(os.getenv('GEMINI_RETRY_BASE_DELAY_SECONDS', '1'))
+    MAX_DELAY_SECONDS = float(os.getenv('GEMINI_RETRY_MAX_DELAY_SECONDS', '16'))
+    # Total time for a call including every retry
+    DEADLINE_SECONDS = float(os.getenv('GEMINI_RETRY_DEADLINE_SECONDS', '60'))
+    # Tried in order after the requested model when it is overloaded or out of quota
+    FALLBACK_MODELS = [model.strip() for model in
+                       os.getenv('GEMINI_FALLBACK_MODELS', 'gemini-2.5-flash-lite').split(',')
+                       if model.strip()]
+
+# Error classes
+OVERLOADED = 'overloaded'   # 429 / 503: back off, and switch model if one is left
+TRANSIENT = 'transient'     # 5xx, timeouts, dropped connections: back off and retry
+FATAL = 'fatal'             # Anything else: do not retry
+
+OVERLOADED_STATUS = {429, 503}
+TRANSIENT_STATUS = {408, 500, 502, 504}
+
+def classify_error(error):
+    """Return OVERLOADED, TRANSIENT or FATAL for an exception from a Gemini call"""
+    if isinstance(error, errors.APIError):
+        if error.code in OVERLOADED_STATUS:
+            return OVERLOADED
+        if error.code in TRANSIENT_STATUS:
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, ConnectionError, TimeoutError)):
+        return TRANSIENT
+    return FATAL
+
+_RETRY_DELAY_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)s$')
+
+def retry_delay_hint(error):
+    """Seconds the API asked us to wait (google.rpc.RetryInfo), or None"""
+    details = getattr(error, 'details', None)
+    if not isinstance(details, dict):
+        return None
+    for detail in (details.get('error') or {}).get('details') or []:
+        if isinstance(detail, dict) and 'retryDelay' in detail:
+            match = _RETRY_DELAY_PATTERN.match(str(detail['retryDelay']))
+            if match:
+                return float(match.group(1))
+    return None
+
+# ==================== POLICY ====================
+
+class RetryPolicy:
+    """
+    Runs a call with retries.
+
+    Full jitter: the n-th retry waits a random time between 0 and
+    min(MAX_DELAY, BASE_DELAY * 2**n), or the server's retry hint if it is
+    longer. Moving to a fallback model does not wait, since its quota is
+    separate. No attempt starts, and no wait runs, past the deadline.
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, deadline=None,
+                 fallback_models=None):
+        self.max_attempts = max_attempts or RetryPolicyConfig.MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else RetryPolicyConfig.BASE_DELAY_SECONDS
+        self.max_delay = max_delay if max_delay is not None else RetryPolicyConfig.MAX_DELAY_SECONDS
+        self.deadline = deadline or RetryPolicyConfig.DEADLINE_SECONDS
+        self.fallback_models = list(fallback_models if fallback_models is not None
+                                    else RetryPolicyConfig.FALLBACK_MODELS)
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'retries': 0,
+            'fallbacks': 0,
+            'gave_up': 0,
+            'fatal': 0
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def model_chain(self, model):
+        """The requested model followed by the fallbacks"""
+        return [model] + [fallback for fallback in self.fallback_models if fallback != model]
+
+    def backoff(self, retry):
+        """Jittered delay before the given retry (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def run(self, attempt, model, label='Gemini call'):
+        """
+        Call attempt(model, remaining_seconds) until it succeeds or the policy gives up.
+
+        Args:
+            attempt: Callable making one call; remaining_seconds is the time
+                left before the deadline, for use as a request timeout
+            model: Requested model; fallbacks follow it
+            label: Name used in log messages
+
+        Raises:
+            The last error once attempts, models or time run out, or the
+            first FATAL error
+        """
+        self._count('calls')
+        chain = self.model_chain(model)
+        index = 0
+        retries = 0
+        deadline = time.monotonic() + self.deadline
+
+        for attempt_number in range(1, self.max_attempts + 1):
+            current = chain[index]
+            try:
+                return attempt(current, deadline - time.monotonic())
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == FATAL:
+                    self._count('fatal')
+                    raise
+                if attempt_number == self.max_attempts:
+                    self._count('gave_up')
+                    raise
+
+                if kind == OVERLOADED and index < len(chain) - 1:
+                    index += 1
+                    delay = 0.0
+                    self._count('fallbacks')
+                    print(f"⚠️ {label}: {current} overloaded ({e}); falling back to {chain[index]}")
+                else:
+                    delay = max(self.backoff(retries), retry_delay_hint(e) or 0.0)
+                    retries += 1
+                    print(f"⚠️ {label}: {kind} error on {current} ({e}); retrying in {delay:.1f}s")
+
+                if time.monotonic() + delay >= deadline:
+                    self._count('gave_up')
+                    raise
+                self._count('retries')
+                time.sleep(delay)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'max_attempts': self.max_attempts,
+                'deadline_seconds': self.deadline,
+                'fallback_models': self.fallback_models
+            }
+
+# Shared by every Gemini call site (through the gateway)
+DEFAULT_POLICY = RetryPolicy()
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'RetryPolicyConfig',
+    'OVERLOADED',
+    'TRANSIENT',
+    'FATAL',
+    'classify_error',
+    'retry_delay_hint',
+    'RetryPolicy',
+    'DEFAULT_POLICY'
+]
@@ -0,0 +1,731 @@
+#!/usr/bin/env python3
+"""
+Shared Worker State
+State that every gunicorn worker must see: the latest detection results,
+append-only logs (help messages, posted results), which worker owns the
+detection session, the status of analysis jobs and the Gemini rate limit
+budget. With SHARED_STATE_BACKEND=memory (the default) each
+process keeps its own copy; with sqlite all workers on the host read and
+write one WAL-mode SQLite file, so no sticky sessions are needed.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from dotenv import load_dotenv
+
+from results_store import ResultRingBuffer, ResultsStoreConfig
+from storage import SQLiteDatabase
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class SharedStateConfig:
+    """Configuration for state shared between workers"""
+
+    # memory (per process) or sqlite (shared by every worker on the host)
+    BACKEND = os.getenv('SHARED_STATE_BACKEND', 'memory').lower()
+    PATH = os.getenv('SHARED_STATE_PATH', 'freshloop_state.db')
+    # How often a waiting stream checks for results added by other workers
+    POLL_SECONDS = float(os.getenv('SHARED_STATE_POLL_SECONDS', '0.25'))
+    # A session owner that has not published for this long is considered gone
+    OWNER_TIMEOUT_SECONDS = float(os.getenv('SHARED_STATE_OWNER_TIMEOUT_SECONDS', '10'))
+
+SHARED_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_meta (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+);
+
+CREATE TABLE IF NOT EXISTS shared_results (
+    name TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (name, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_shared_results_version ON shared_results (name, version);
+
+CREATE TABLE IF NOT EXISTS shared_logs (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (name, version)
+);
+
+CREATE TABLE IF NOT EXISTS shared_sessions (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    heartbeat REAL NOT NULL DEFAULT 0,
+    stop_requested INTEGER NOT NULL DEFAULT 0,
+    status TEXT
+);
+
+CREATE TABLE IF NOT EXISTS shared_jobs (
+    name TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (name, job_id)
+);
+CREATE INDEX IF NOT EXISTS idx_shared_jobs_updated ON shared_jobs (name, updated_at);
+"""
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# Identifies this worker as a session owner; refreshed after a fork
+WORKER_ID = _worker_id()
+
+def _refresh_worker_id():
+    global WORKER_ID
+    WORKER_ID = _worker_id()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_refresh_worker_id)
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+def shared_epoch(database, name):
+    """
+    Version namespace for a shared structure, created with its first use.
+
+    Every worker reads the same value, so their ETags agree; a new state
+    file gets a new one, so tokens from before a reset never match.
+    """
+    with database.transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO shared_meta (name, key, value) VALUES (?, 'epoch', ?)",
+            (name, uuid.uuid4().hex[:8])
+        )
+        return conn.execute(
+            "SELECT value FROM shared_meta WHERE name = ? AND key = 'epoch'", (name,)
+        ).fetchone()[0]
+
+# ==================== RESULTS BUFFER ====================
+
+class SharedResultBuffer:
+    """
+    ResultRingBuffer with the same interface, stored in SQLite.
+
+    Sequence ids and versions come from one counter row per buffer, updated
+    inside a write transaction, so ids stay contiguous across workers and
+    cursors or ETags issued by one worker are valid on every other.
+    """
+
+    _COUNTERS = ('last_seq', 'version', 'evicted_version', 'cleared_version', 'appended', 'evicted')
+
+    def __init__(self, name, database, max_results=None):
+        """Initialize the buffer; rows are created on first write"""
+        self.name = name
+        self.database = database
+        self.max_results = max_results or ResultsStoreConfig.MAX_RESULTS
+        self._changed = threading.Condition()  # Wakes local waiters without a poll
+        self._epoch = None
+
+    def _counters(self, conn):
+        rows = conn.execute(
+            'SELECT key, value FROM shared_meta WHERE name = ?', (self.name,)
+        ).fetchall()
+        values = dict(rows)
+        return {key: int(values.get(key, 0)) for key in self._COUNTERS}
+
+    def _save_counters(self, conn, counters):
+        conn.executemany(
+            'INSERT OR REPLACE INTO shared_meta (name, key, value) VALUES (?, ?, ?)',
+            [(self.name, key, str(value)) for key, value in counters.items()]
+        )
+
+    @property
+    def epoch(self):
+        """Version namespace shared by every worker using this buffer (see http_caching)"""
+        if self._epoch is None:
+            self._epoch = shared_epoch(self.database, self.name)
+        return self._epoch
+
+    def append(self, result):
+        """Store a copy of result with the next sequence id; returns the stored copy"""
+        return self.extend([result])[0]
+
+    def extend(self, results):
+        """Store copies of several results in order; returns the stored copies"""
+        stored = []
+        with self.database.transaction() as conn:
+            counters = self._counters(conn)
+            rows = []
+            for result in results:
+                counters['last_seq'] += 1
+                counters['version'] += 1
+                item = {**result, 'seq': counters['last_seq']}
+                rows.append((self.name, counters['last_seq'], counters['version'], _dumps(item)))
+                stored.append(item)
+            conn.executemany(
+                'INSERT INTO shared_results (name, seq, version, data) VALUES (?, ?, ?, ?)', rows
+            )
+
+            cutoff = counters['last_seq'] - self.max_results
+            evicted, evicted_version = conn.execute(
+                'SELECT COUNT(*), MAX(version) FROM shared_results WHERE name = ? AND seq <= ?',
+                (self.name, cutoff)
+            ).fetchone()
+            if evicted:
+                conn.execute('DELETE FROM shared_results WHERE name = ? AND seq <= ?', (self.name, cutoff))
+                counters['evicted'] += evicted
+                counters['evicted_version'] = evicted_version
+
+            counters['appended'] += len(stored)
+            self._save_counters(conn, counters)
+
+        if stored:
+            with self._changed:
+                self._changed.notify_all()
+        return stored
+
+    def since(self, seq=0, limit=None):
+        """
+        Return results with a sequence id greater than seq, oldest first.
+
+        A cursor ahead of the newest result is treated as a reset, as in
+        ResultRingBuffer.
+
+        Returns:
+            Tuple of (results, next cursor, number of results after seq that
+            were already evicted or cleared, whether the cursor was reset)
+        """
+        with self.database.transaction(write=False) as conn:
+            last_seq = self._counters(conn)['last_seq']
+            reset = seq > last_seq
+            if reset:
+                seq = 0
+            new_count = last_seq - seq
+            if new_count <= 0:
+                return [], seq, 0, reset
+            first_seq = conn.execute(
+                'SELECT MIN(seq) FROM shared_results WHERE name = ?', (self.name,)
+            ).fetchone()[0]
+            if first_seq is None:
+                return [], last_seq, new_count, reset
+
+            # Stored sequence ids are contiguous, as in ResultRingBuffer
+            available = last_seq - max(seq, first_seq - 1)
+            missed = new_count - available
+            rows = conn.execute(
+                'SELECT data FROM shared_results WHERE name = ? AND seq > ? ORDER BY seq LIMIT ?',
+                (self.name, seq, -1 if limit is None else limit)
+            ).fetchall()
+
+        page = [json.loads(data) for (data,) in rows]
+        next_cursor = page[-1]['seq'] if page else seq
+        return page, next_cursor, missed, reset
+
+    def wait_for_new(self, seq, timeout):
+        """
+        Block until a result newer than seq is stored or timeout elapses.
+
+        Appends in this process wake waiters at once; appends by other
+        workers are seen within POLL_SECONDS.
+
+        Returns:
+            True if there is something newer than seq
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.last_seq > seq:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            with self._changed:
+                self._changed.wait(min(SharedStateConfig.POLL_SECONDS, remaining))
+
+    def __len__(self):
+        conn = self.database.connection()
+        return conn.execute('SELECT COUNT(*) FROM shared_results WHERE name = ?', (self.name,)).fetchone()[0]
+
+    def _counter(self, key):
+        row = self.database.connection().execute(
+            'SELECT value FROM shared_meta WHERE name = ? AND key = ?', (self.name, key)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    @property
+    def last_seq(self):
+        return self._counter('last_seq')
+
+    @property
+    def version(self):
+        """Change counter; increases on every append and clear"""
+        return self._counter('version')
+
+    def changes_since(self, version):
+        """
+        Return results added after the given store version, oldest first.
+
+        Returns:
+            List of results, or None if a clear or eviction since then means
+            the change set cannot be reproduced
+        """
+        with self.database.transaction(write=False) as conn:
+            counters = self._counters(conn)
+            if version > counters['version'] or version < max(counters['cleared_version'], counters['evicted_version']):
+                return None
+            rows = conn.execute(
+                'SELECT data FROM shared_results WHERE name = ? AND version > ? ORDER BY seq',
+                (self.name, version)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def clear(self):
+        """Drop all results; sequence ids keep increasing"""
+        with self.database.transaction() as conn:
+            counters = self._counters(conn)
+            count = conn.execute('DELETE FROM shared_results WHERE name = ?', (self.name,)).rowcount
+            counters['version'] += 1
+            counters['cleared_version'] = counters['version']
+            self._save_counters(conn, counters)
+            return count
+
+    def get_stats(self):
+        """Return buffer counters"""
+        with self.database.transaction(write=False) as conn:
+            counters = self._counters(conn)
+            size = conn.execute('SELECT COUNT(*) FROM shared_results WHERE name = ?', (self.name,)).fetchone()[0]
+        return {
+            'appended': counters['appended'],
+            'evicted': counters['evicted'],
+            'size': size,
+            'max_results': self.max_results,
+            'last_seq': counters['last_seq'],
+            'version': counters['version'],
+            'backend': 'sqlite'
+        }
+
+# ==================== APPEND-ONLY LOGS ====================
+
+class MemoryLog:
+    """
+    Append-only list of records in this process.
+
+    A record's version is its 1-based position, so the log's version is
+    its length.
+    """
+
+    epoch = None  # Per-process versions (see http_caching)
+
+    def __init__(self, name):
+        self.name = name
+        self._records = []
+        self._lock = threading.Lock()
+
+    def append(self, record, id_format=None):
+        """
+        Add a record; returns its version.
+
+        With id_format, record['id'] is set to id_format.format(version=...)
+        as it is added, so ids built from the version never collide.
+        """
+        with self._lock:
+            if id_format is not None:
+                record['id'] = id_format.format(version=len(self._records) + 1)
+            self._records.append(record)
+            return len(self._records)
+
+    def items(self):
+        with self._lock:
+            return list(self._records)
+
+    def since(self, version):
+        """Records added after version, or None if version is unknown"""
+        with self._lock:
+            if version > len(self._records):
+                return None
+            return self._records[version:]
+
+    @property
+    def version(self):
+        return len(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+class SharedLog:
+    """MemoryLog with the same interface, stored in SQLite for all workers"""
+
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+        self._epoch = None
+
+    @property
+    def epoch(self):
+        """Version namespace shared by every worker using this log (see http_caching)"""
+        if self._epoch is None:
+            self._epoch = shared_epoch(self.database, f"log:{self.name}")
+        return self._epoch
+
+    def append(self, record, id_format=None):
+        """Add a record; returns its version (id_format as in MemoryLog.append)"""
+        with self.database.transaction() as conn:
+            version = conn.execute(
+                'SELECT COALESCE(MAX(version), 0) + 1 FROM shared_logs WHERE name = ?', (self.name,)
+            ).fetchone()[0]
+            if id_format is not None:
+                record['id'] = id_format.format(version=version)
+            conn.execute(
+                'INSERT INTO shared_logs (name, version, data) VALUES (?, ?, ?)',
+                (self.name, version, _dumps(record))
+            )
+        return version
+
+    def items(self):
+        return self.since(0)
+
+    def since(self, version):
+        """Records added after version, or None if version is unknown"""
+        with self.database.transaction(write=False) as conn:
+            current = conn.execute(
+                'SELECT COALESCE(MAX(version), 0) FROM shared_logs WHERE name = ?', (self.name,)
+            ).fetchone()[0]
+            if version > current:
+                return None
+            rows = conn.execute(
+                'SELECT data FROM shared_logs WHERE name = ? AND version > ? ORDER BY version',
+                (self.name, version)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    @property
+    def version(self):
+        return self.database.connection().execute(
+            'SELECT COALESCE(MAX(version), 0) FROM shared_logs WHERE name = ?', (self.name,)
+        ).fetchone()[0]
+
+    def __len__(self):
+        return self.version
+
+# ==================== SESSION OWNERSHIP ====================
+
+class LocalSessionRegistry:
+    """Tracks which worker owns a singleton session; in memory for one process"""
+
+    def __init__(self, name):
+        self.name = name
+        self._owner = None
+        self._status = None
+        self._stop_requested = False
+        self._lock = threading.Lock()
+
+    def claim(self, owner):
+        """Become the owner; returns False if another owner holds the session"""
+        with self._lock:
+            if self._owner not in (None, owner):
+                return False
+            self._owner, self._status, self._stop_requested = owner, None, False
+            return True
+
+    def publish(self, owner, status):
+        """Record the owner's latest status (also serves as its heartbeat)"""
+        with self._lock:
+            if self._owner == owner:
+                self._status = status
+
+    def release(self, owner, status=None):
+        with self._lock:
+            if self._owner == owner:
+                self._owner = None
+                if status is not None:
+                    self._status = status
+
+    def request_stop(self):
+        """Ask the owner to stop; returns False if nobody owns the session"""
+        with self._lock:
+            if self._owner is None:
+                return False
+            self._stop_requested = True
+            return True
+
+    def stop_requested(self, owner):
+        with self._lock:
+            return self._owner == owner and self._stop_requested
+
+    def current(self):
+        """{'owner', 'status'} for a live owner, or None"""
+        with self._lock:
+            if self._owner is None:
+                return None
+            return {'owner': self._owner, 'status': self._status}
+
+    def last_status(self):
+        with self._lock:
+            return self._status
+
+class SharedSessionRegistry:
+    """LocalSessionRegistry with the same interface, stored in SQLite for all workers"""
+
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+
+    def _row(self, conn):
+        return conn.execute(
+            'SELECT owner, heartbeat, stop_requested, status FROM shared_sessions WHERE name = ?',
+            (self.name,)
+        ).fetchone()
+
+    @staticmethod
+    def _live(row):
+        return (row is not None and row[0] is not None
+                and time.time() - row[1] < SharedStateConfig.OWNER_TIMEOUT_SECONDS)
+
+    def claim(self, owner):
+        """Become the owner; returns False if another live owner holds the session"""
+        with self.database.transaction() as conn:
+            row = self._row(conn)
+            if self._live(row) and row[0] != owner:
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO shared_sessions (name, owner, heartbeat, stop_requested, status) '
+                'VALUES (?, ?, ?, 0, NULL)',
+                (self.name, owner, time.time())
+            )
+            return True
+
+    def publish(self, owner, status):
+        """Record the owner's latest status (also serves as its heartbeat)"""
+        with self.database.transaction() as conn:
+            conn.execute(
+                'UPDATE shared_sessions SET heartbeat = ?, status = ? WHERE name = ? AND owner = ?',
+                (time.time(), _dumps(status), self.name, owner)
+            )
+
+    def release(self, owner, status=None):
+        with self.database.transaction() as conn:
+            conn.execute(
+                'UPDATE shared_sessions SET owner = NULL, stop_requested = 0, '
+                'status = COALESCE(?, status) WHERE name = ? AND owner = ?',
+                (_dumps(status) if status is not None else None, self.name, owner)
+            )
+
+    def request_stop(self):
+        """Ask the owner to stop; returns False if nobody owns the session"""
+        with self.database.transaction() as conn:
+            if not self._live(self._row(conn)):
+                return False
+            conn.execute('UPDATE shared_sessions SET stop_requested = 1 WHERE name = ?', (self.name,))
+            return True
+
+    def stop_requested(self, owner):
+        row = self._row(self.database.connection())
+        return row is not None and row[0] == owner and bool(row[2])
+
+    def current(self):
+        """{'owner', 'status'} for a live owner, or None"""
+        row = self._row(self.database.connection())
+        if not self._live(row):
+            return None
+        return {'owner': row[0], 'status': json.loads(row[3]) if row[3] else None}
+
+    def last_status(self):
+        row = self._row(self.database.connection())
+        return json.loads(row[3]) if row is not None and row[3] else None
+
+# ==================== JOB STATUS ====================
+
+class SharedJobRegistry:
+    """
+    Latest status of each job, stored in SQLite so any worker can serve it.
+
+    The worker running a job publishes a snapshot on every status change;
+    other workers read it (and poll it for event streams). There is no
+    in-memory variant - without a shared backend each worker only knows
+    its own jobs.
+    """
+
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+
+    def publish(self, job_id, version, record):
+        """Store a job snapshot unless a newer version is already stored"""
+        with self.database.transaction() as conn:
+            conn.execute(
+                'INSERT INTO shared_jobs (name, job_id, version, updated_at, data) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (name, job_id) DO UPDATE SET version = excluded.version, '
+                'updated_at = excluded.updated_at, data = excluded.data '
+                'WHERE excluded.version > shared_jobs.version',
+                (self.name, job_id, version, time.time(), _dumps(record))
+            )
+
+    def get(self, job_id):
+        """(version, record) for a job, or None if unknown or purged"""
+        row = self.database.connection().execute(
+            'SELECT version, data FROM shared_jobs WHERE name = ? AND job_id = ?', (self.name, job_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def wait_for_change(self, job_id, version, timeout):
+        """
+        Poll until the job's version moves past version or timeout elapses.
+
+        Returns:
+            The latest (version, record), or None if the job is gone
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if snapshot is None or snapshot[0] != version or remaining <= 0:
+                return snapshot
+            time.sleep(min(SharedStateConfig.POLL_SECONDS, remaining))
+
+    def purge(self, before):
+        """Drop jobs last updated before the given time.time() value"""
+        with self.database.transaction() as conn:
+            conn.execute('DELETE FROM shared_jobs WHERE name = ? AND updated_at < ?', (self.name, before))
+
+# ==================== RATE LIMIT BUDGET ====================
+
+class SharedTokenBucket:
+    """
+    gemini_gateway.TokenBucket with the same interface, stored in SQLite.
+
+    The level and its last refill time are rows in shared_meta, read and
+    updated inside one write transaction, so every worker on the host draws
+    from a single per-minute budget.
+    """
+
+    def __init__(self, name, database, per_minute):
+        self.name = name
+        self.database = database
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+
+    @property
+    def enabled(self):
+        return self.per_minute > 0
+
+    def _level(self, conn):
+        """Current level after refilling, and the time it was computed for"""
+        values = dict(conn.execute(
+            "SELECT key, value FROM shared_meta WHERE name = ? AND key IN ('level', 'updated')",
+            (self.name,)
+        ).fetchall())
+        now = time.time()
+        if 'level' not in values:
+            return self.capacity, now
+        elapsed = max(0.0, now - float(values['updated']))
+        return min(self.capacity, float(values['level']) + elapsed * self.rate), now
+
+    def _save(self, conn, level, now):
+        conn.executemany(
+            'INSERT OR REPLACE INTO shared_meta (name, key, value) VALUES (?, ?, ?)',
+            [(self.name, 'level', repr(level)), (self.name, 'updated', repr(now))]
+        )
+
+    def acquire(self, amount, timeout):
+        """
+        Take amount from the bucket, waiting up to timeout seconds.
+
+        Returns:
+            Seconds waited, or None if the budget did not refill in time
+        """
+        if not self.enabled:
+            return 0.0
+        # A single request larger than a minute's budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self.database.transaction() as conn:
+                level, now = self._level(conn)
+                if level >= amount:
+                    self._save(conn, level - amount, now)
+                    return time.monotonic() - start
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, (amount - level) / self.rate))
+
+    def adjust(self, amount):
+        """Add (refund) or remove (debit) budget after the fact"""
+        if not self.enabled or not amount:
+            return
+        with self.database.transaction() as conn:
+            level, now = self._level(conn)
+            self._save(conn, min(self.capacity, level + amount), now)
+
+    def get_stats(self):
+        level, _ = self._level(self.database.connection())
+        return {'per_minute': self.per_minute, 'available': round(level, 1), 'shared': True}
+
+# ==================== FACTORIES ====================
+
+_database = None
+_database_lock = threading.Lock()
+
+def get_state_database():
+    """The process-wide SQLite database at SHARED_STATE_PATH"""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = SQLiteDatabase(SharedStateConfig.PATH, schema=SHARED_STATE_SCHEMA)
+        return _database
+
+def is_shared():
+    return SharedStateConfig.BACKEND == 'sqlite'
+
+def create_results_buffer(name, max_results=None):
+    """A results buffer visible to every worker (sqlite) or to this process (memory)"""
+    if is_shared():
+        return SharedResultBuffer(name, get_state_database(), max_results)
+    return ResultRingBuffer(max_results)
+
+def create_log(name):
+    """An append-only log visible to every worker (sqlite) or to this process (memory)"""
+    if is_shared():
+        return SharedLog(name, get_state_database())
+    return MemoryLog(name)
+
+def create_session_registry(name):
+    """Session ownership visible to every worker (sqlite) or to this process (memory)"""
+    if is_shared():
+        return SharedSessionRegistry(name, get_state_database())
+    return LocalSessionRegistry(name)
+
+def create_job_registry(name):
+    """Job status visible to every worker (sqlite), or None when each worker keeps its own"""
+    if is_shared():
+        return SharedJobRegistry(name, get_state_database())
+    return None
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'SharedStateConfig',
+    'WORKER_ID',
+    'SharedResultBuffer',
+    'MemoryLog',
+    'SharedLog',
+    'LocalSessionRegistry',
+    'SharedSessionRegistry',
+    'SharedJobRegistry',
+    'SharedTokenBucket',
+    'get_state_database',
+    'is_shared',
+    'create_results_buffer',
+    'create_log',
+    'create_session_registry',
+    'create_job_registry'
+]
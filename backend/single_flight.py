@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Single-Flight Request Coalescing
+When identical requests arrive while one is already running, the later
+ones wait for the first instead of making their own upstream call, and
+every waiter gets the same result (or the same error). Used for the recipe
+endpoints, where demo spikes are mostly the same ingredients or dish.
+"""
+
+import os
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class SingleFlightConfig:
+    """Configuration for request coalescing"""
+
+    ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # A waiter gives up on the shared call after this long and makes its own
+    WAIT_SECONDS = float(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', '90'))
+
+def prompt_key(namespace, prompt):
+    """
+    Coalescing key for a prompt: whitespace collapsed and case folded, so
+    prompts that differ only in spacing or capitalization share a call.
+    """
+    normalized = ' '.join(prompt.split()).casefold()
+    return namespace + ':' + hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+# ==================== SINGLE FLIGHT ====================
+
+class _Call:
+    """One in-flight call and the result its waiters will share"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time within this process.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive before it finishes block until it does and receive its return
+    value, or have its exception raised again. The key is forgotten as soon
+    as the call finishes, so this coalesces concurrent requests only - it is
+    not a cache.
+    """
+
+    def __init__(self, name, wait_seconds=None, enabled=None):
+        self.name = name
+        self.wait_seconds = wait_seconds if wait_seconds is not None else SingleFlightConfig.WAIT_SECONDS
+        self.enabled = enabled if enabled is not None else SingleFlightConfig.ENABLED
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'upstream_calls': 0,
+            'coalesced': 0,
+            'errors': 0,
+            'wait_timeouts': 0,
+            'max_waiters': 0
+        }
+
+    def do(self, key, fn):
+        """
+        Return fn(), sharing the call with concurrent callers using the same key.
+
+        Raises:
+            Whatever fn raises, in the leader and in every waiter
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key) if self.enabled else None
+            leader = call is None
+            if leader:
+                call = _Call()
+                if self.enabled:
+                    self._calls[key] = call
+                self.stats['upstream_calls'] += 1
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+                self.stats['max_waiters'] = max(self.stats['max_waiters'], call.waiters)
+
+        if not leader:
+            return self._wait(call, fn)
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def _wait(self, call, fn):
+        if not call.done.wait(self.wait_seconds):
+            with self._lock:
+                self.stats['wait_timeouts'] += 1
+                self.stats['upstream_calls'] += 1
+            print(f"⚠️ {self.name}: shared call still running after {self.wait_seconds:.0f}s - calling directly")
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                'enabled': self.enabled,
+                'in_flight': len(self._calls)
+            }
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'SingleFlightConfig',
+    'prompt_key',
+    'SingleFlight'
+]
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Storage Backends
+Pluggable persistence for detections and community posts. MongoDB is used
+when MONGODB_URI is set; otherwise an embedded SQLite database in WAL mode
+keeps data across restarts and shares it between gunicorn workers.
+
+Both backends expose the same small interface:
+    DetectionStore: insert_many(documents), count(), recent(limit)
+    PostStore: insert_many(posts), find_posts(post_type=None, status=None)
+"""
+
+import os
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from bson import json_util
+from pymongo import DESCENDING
+from dotenv import load_dotenv
+
+import mongo_registry
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class StorageConfig:
+    """Configuration for the storage backend"""
+
+    # auto (MongoDB if MONGODB_URI is set, else SQLite), mongodb, sqlite or none
+    BACKEND = os.getenv('STORAGE_BACKEND', 'auto').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'freshloop.db')
+    # How long a writer waits for another worker's write lock
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+def selected_backend():
+    """Name of the backend in use: 'mongodb', 'sqlite' or 'none'"""
+    backend = StorageConfig.BACKEND
+    if backend == 'auto':
+        return 'mongodb' if mongo_registry.is_configured() else 'sqlite'
+    return backend
+
+# ==================== MONGODB ====================
+
+class MongoDetectionStore:
+    """Detection documents in a MongoDB collection from the shared client"""
+
+    backend = 'mongodb'
+
+    def __init__(self, db_name, collection_name):
+        self.database_name = db_name
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return mongo_registry.get_collection(self.database_name, self.collection_name)
+
+    def insert_many(self, documents, ordered=False):
+        self.collection.insert_many(documents, ordered=ordered)
+
+    def count(self):
+        """Document count from collection metadata (no scan)"""
+        return self.collection.estimated_document_count()
+
+    def recent(self, limit=5):
+        """Newest detections first (served by the timestamp_desc index)"""
+        documents = list(self.collection.find({}).sort('timestamp', DESCENDING).limit(limit))
+        for document in documents:
+            document['_id'] = str(document['_id'])
+        return documents
+
+class MongoPostStore:
+    """Community posts in a MongoDB collection from the shared client"""
+
+    backend = 'mongodb'
+
+    def __init__(self, db_name, collection_name):
+        self.database_name = db_name
+        self.collection_name = collection_name
+
+    @property
+    def collection(self):
+        return mongo_registry.get_collection(self.database_name, self.collection_name)
+
+    def insert_many(self, posts):
+        self.collection.insert_many(posts, ordered=False)
+
+    def find_posts(self, post_type=None, status=None):
+        """Posts matching the optional type/status filter (served by the type_status index)"""
+        query = {}
+        if post_type is not None:
+            query['type'] = post_type
+        if status is not None:
+            query['status'] = status
+        posts = list(self.collection.find(query))
+        for post in posts:
+            post['_id'] = str(post['_id'])
+        return posts
+
+# ==================== SQLITE ====================
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS food_detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_food_detections_timestamp ON food_detections (timestamp DESC);
+
+CREATE TABLE IF NOT EXISTS community_posts (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    status TEXT,
+    lat REAL,
+    lng REAL,
+    document TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_community_posts_type_status ON community_posts (type, status);
+-- No query filters on location; drop the index older files were created with
+DROP INDEX IF EXISTS idx_community_posts_location;
+"""
+
+# Hot queries and the index each must use (checked with EXPLAIN QUERY PLAN)
+SQLITE_HOT_QUERIES = {
+    'recent_detections': "SELECT id, document FROM food_detections ORDER BY timestamp DESC LIMIT 5",
+    'posts_by_type': "SELECT id, document FROM community_posts WHERE type = 'request' AND status = 'active'"
+}
+
+class SQLiteDatabase:
+    """
+    One SQLite file in WAL mode, with a connection per thread.
+
+    WAL lets any number of readers (threads or gunicorn workers) run
+    alongside a single writer; writers wait up to SQLITE_BUSY_TIMEOUT_MS
+    for the lock. Connections are never shared across a fork.
+    """
+
+    def __init__(self, path=None, schema=SQLITE_SCHEMA):
+        self.path = path or StorageConfig.SQLITE_PATH
+        self.schema = schema
+        self._local = threading.local()
+        self._schema_pid = None
+        self._lock = threading.Lock()
+
+    def connection(self):
+        """Return this thread's connection, creating the schema on first use in a process"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(self.path, timeout=StorageConfig.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={StorageConfig.SQLITE_BUSY_TIMEOUT_MS}')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        with self._lock:
+            if self._schema_pid != os.getpid():
+                conn.executescript(self.schema)
+                self._schema_pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self, write=True):
+        """
+        Run a block in one transaction on this thread's connection.
+
+        Args:
+            write: Take the write lock up front (BEGIN IMMEDIATE) so a
+                read-modify-write cannot interleave with another worker's;
+                with False, the block is a consistent read snapshot
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def explain(self, sql):
+        """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+        return [row[-1] for row in self.connection().execute(f'EXPLAIN QUERY PLAN {sql}')]
+
+    def check_query_plans(self):
+        """
+        Explain the hot queries.
+
+        Returns:
+            Dict mapping query name to {'plan': [...], 'collscan': bool}
+        """
+        report = {}
+        for name, sql in SQLITE_HOT_QUERIES.items():
+            plan = self.explain(sql)
+            # A full scan shows up as 'SCAN <table>' without a covering index
+            collscan = any(line.startswith('SCAN') and 'INDEX' not in line for line in plan)
+            report[name] = {'plan': plan, 'collscan': collscan}
+        return report
+
+def _to_json(document):
+    return json_util.dumps(document)
+
+def _from_json(row_id, text):
+    document = json_util.loads(text)
+    document['_id'] = str(row_id)
+    return document
+
+def _timestamp_key(value):
+    """Sortable text for a detection timestamp"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value or '')
+
+class SQLiteDetectionStore:
+    """Detection documents in the embedded SQLite database"""
+
+    backend = 'sqlite'
+    collection_name = 'food_detections'
+
+    def __init__(self, database):
+        self.database = database
+
+    @property
+    def database_name(self):
+        return os.path.basename(self.database.path)
+
+    def insert_many(self, documents, ordered=False):
+        conn = self.database.connection()
+        with conn:
+            conn.executemany(
+                'INSERT INTO food_detections (timestamp, document) VALUES (?, ?)',
+                [(_timestamp_key(document.get('timestamp')), _to_json(document)) for document in documents]
+            )
+
+    def count(self):
+        return self.database.connection().execute('SELECT COUNT(*) FROM food_detections').fetchone()[0]
+
+    def recent(self, limit=5):
+        """Newest detections first (served by idx_food_detections_timestamp)"""
+        rows = self.database.connection().execute(
+            'SELECT id, document FROM food_detections ORDER BY timestamp DESC LIMIT ?', (limit,)
+        ).fetchall()
+        return [_from_json(row_id, text) for row_id, text in rows]
+
+class SQLitePostStore:
+    """Community posts in the embedded SQLite database"""
+
+    backend = 'sqlite'
+    collection_name = 'community_posts'
+
+    def __init__(self, database):
+        self.database = database
+
+    @property
+    def database_name(self):
+        return os.path.basename(self.database.path)
+
+    def insert_many(self, posts):
+        rows = []
+        for post in posts:
+            post_id = str(post.get('_id') or uuid.uuid4().hex)
+            location = post.get('location') or {}
+            document = {key: value for key, value in post.items() if key != '_id'}
+            rows.append((post_id, post.get('type'), post.get('status'),
+                         location.get('lat'), location.get('lng'), _to_json(document)))
+        conn = self.database.connection()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO community_posts (id, type, status, lat, lng, document) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def find_posts(self, post_type=None, status=None):
+        """Posts matching the optional type/status filter (served by idx_community_posts_type_status)"""
+        clauses, params = [], []
+        if post_type is not None:
+            clauses.append('type = ?')
+            params.append(post_type)
+        if status is not None:
+            clauses.append('status = ?')
+            params.append(status)
+        sql = 'SELECT id, document FROM community_posts'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        rows = self.database.connection().execute(sql, params).fetchall()
+        return [_from_json(row_id, text) for row_id, text in rows]
+
+# ==================== FACTORIES ====================
+
+_sqlite_database = None
+_sqlite_lock = threading.Lock()
+
+def get_sqlite_database():
+    """The process-wide SQLiteDatabase for SQLITE_PATH"""
+    global _sqlite_database
+    with _sqlite_lock:
+        if _sqlite_database is None:
+            _sqlite_database = SQLiteDatabase()
+        return _sqlite_database
+
+def get_detection_store(db_name, collection_name):
+    """Detection store for the selected backend, or None if storage is disabled"""
+    backend = selected_backend()
+    if backend == 'mongodb':
+        return MongoDetectionStore(db_name, collection_name)
+    if backend == 'sqlite':
+        return SQLiteDetectionStore(get_sqlite_database())
+    return None
+
+def get_post_store(db_name, collection_name):
+    """Community post store for the selected backend, or None if storage is disabled"""
+    backend = selected_backend()
+    if backend == 'mongodb':
+        return MongoPostStore(db_name, collection_name)
+    if backend == 'sqlite':
+        return SQLitePostStore(get_sqlite_database())
+    return None
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'StorageConfig',
+    'selected_backend',
+    'MongoDetectionStore',
+    'MongoPostStore',
+    'SQLiteDatabase',
+    'SQLiteDetectionStore',
+    'SQLitePostStore',
+    'get_sqlite_database',
+    'get_detection_store',
+    'get_post_store'
+]
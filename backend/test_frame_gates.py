@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the frame quality gate on camera frames and uploads.
+
+Run from the backend directory:
+    python -m unittest test_frame_gates
+"""
+
+import io
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from detection_fixtures import encode_jpeg, offline_detector
+
+import main_api
+from frame_gates import FrameQualityGate, FrameRejectedError
+
+def high_key_image():
+    """A clean product shot: bright white plate on a light counter with food in the middle"""
+    rng = np.random.default_rng(0)
+    image = np.clip(rng.normal(236, 3, (480, 640)), 0, 255).astype(np.uint8)
+    cv2.circle(image, (320, 240), 200, 246, -1)
+    food = rng.integers(70, 200, (12, 16), dtype=np.uint8)
+    image[180:300, 240:400] = cv2.resize(food, (160, 120), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+def overexposed_image():
+    """A frame blown out to white"""
+    return np.full((480, 640, 3), 255, dtype=np.uint8)
+
+class FrameQualityGateTest(unittest.TestCase):
+
+    def test_clean_high_key_image_passes(self):
+        reason, metrics = FrameQualityGate().evaluate(high_key_image())
+        self.assertIsNone(reason, metrics)
+
+    def test_blown_out_frame_is_rejected(self):
+        with self.assertRaises(FrameRejectedError):
+            FrameQualityGate().check(overexposed_image())
+
+class UploadQualityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = offline_detector()
+        patcher = mock.patch.object(main_api, 'vision_detector', self.detector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = main_api.app.test_client()
+
+    def post_image(self, frame):
+        return self.client.post('/api/analyze-image', data={
+            'image': (io.BytesIO(encode_jpeg(frame)), 'photo.jpg')
+        }, content_type='multipart/form-data')
+
+    def test_high_key_upload_is_analyzed(self):
+        response = self.post_image(high_key_image())
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200, body)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['count'], 1)
+        self.assertEqual(self.detector.request_detection.calls, 1)
+        self.assertTrue(body['quality_check']['passed'])
+        result = body['results'][0]
+        self.assertEqual(result['name'], 'Apple')
+        self.assertEqual(result['quality'], 'Fresh')
+        self.assertEqual(result['safe'], 'Yes - no bruising')
+        self.assertEqual(result['community'], 'Yes - good to share')
+
+    def test_poor_upload_is_analyzed_with_advisory_verdict(self):
+        response = self.post_image(overexposed_image())
+        body = response.get_json()
+        self.assertEqual(response.status_code, 200, body)
+        self.assertEqual(self.detector.request_detection.calls, 1)
+        self.assertFalse(body['quality_check']['passed'])
+        self.assertIsNotNone(body['quality_check']['reason'])
+
+    def test_camera_frames_are_still_rejected(self):
+        with self.assertRaises(FrameRejectedError):
+            self.detector.detect_and_analyze_food(overexposed_image())
+        self.assertEqual(self.detector.request_detection.calls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
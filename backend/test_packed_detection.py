@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for packed (multi-image) detection requests.
+
+Run from the backend directory:
+    python -m unittest test_packed_detection
+"""
+
+import types
+import unittest
+
+import cv2
+import numpy as np
+
+from detection_fixtures import detection_text, encode_jpeg, offline_detector
+
+from image_pipeline import prepare_upload
+
+APPLE = detection_text('Apple')
+BANANA = detection_text('Banana')
+
+def photo(seed):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(40, 220, (30, 40, 3), dtype=np.uint8)
+    return encode_jpeg(cv2.resize(small, (320, 240), interpolation=cv2.INTER_NEAREST))
+
+class FakeGateway:
+    """Answers every packed request with a fixed response text"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, caller, contents, model=None, config=None, retry_policy=None):
+        self.calls += 1
+        return types.SimpleNamespace(text=self.text)
+
+class PackedDetectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = offline_detector(BANANA)
+        self.images = [prepare_upload(photo(seed), self.detector.preprocessor) for seed in (1, 2)]
+
+    def names(self, detections):
+        return [detection['name'] for detection in detections]
+
+    def test_every_section_present(self):
+        self.detector.gateway = FakeGateway(f"=== IMAGE 1 ===\n{APPLE}\n=== IMAGE 2 ===\n{BANANA}")
+        results = self.detector.detect_and_analyze_uploads_packed(self.images)
+        self.assertEqual([self.names(result) for result in results], [['Apple'], ['Banana']])
+        self.assertEqual(self.detector.request_detection.calls, 0)
+
+    def test_missing_section_falls_back_to_single_request(self):
+        self.detector.gateway = FakeGateway(f"=== IMAGE 1 ===\n{APPLE}")
+        results = self.detector.detect_and_analyze_uploads_packed(self.images)
+        self.assertEqual(self.names(results[0]), ['Apple'])
+        self.assertEqual(self.names(results[1]), ['Banana'])
+        self.assertEqual(self.detector.request_detection.calls, 1)
+
+    def test_no_food_section_is_not_retried(self):
+        self.detector.gateway = FakeGateway(
+            f"=== IMAGE 1 ===\n{APPLE}\n=== IMAGE 2 ===\nNo food items detected.\n"
+        )
+        results = self.detector.detect_and_analyze_uploads_packed(self.images)
+        self.assertEqual(results[1], [])
+        self.assertEqual(self.detector.request_detection.calls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
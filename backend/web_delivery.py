@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Web Result Delivery
+Outbound queue that ships detection results from the CLI detector to the
+web API in batches over a pooled HTTP session, retrying with backoff, or
+hands them over in memory when the API runs in the same process.
+"""
+
+import os
+import time
+import queue
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ==================== CONFIGURATION ====================
+
+class WebDeliveryConfig:
+    """Configuration for delivering detection results to the web API"""
+
+    API_URL = os.getenv('WEB_API_URL', 'http://localhost:5000').rstrip('/')
+    BULK_PATH = '/api/gemini-results/bulk'
+    # Send as soon as this many results are queued...
+    BATCH_SIZE = int(os.getenv('WEB_DELIVERY_BATCH_SIZE', '20'))
+    # ...or once the first queued result has waited this long
+    FLUSH_SECONDS = float(os.getenv('WEB_DELIVERY_FLUSH_SECONDS', '0.5'))
+    MAX_QUEUE = int(os.getenv('WEB_DELIVERY_MAX_QUEUE', '1000'))
+    MAX_RETRIES = int(os.getenv('WEB_DELIVERY_MAX_RETRIES', '4'))
+    BACKOFF_SECONDS = float(os.getenv('WEB_DELIVERY_BACKOFF_SECONDS', '0.5'))
+    MAX_BACKOFF_SECONDS = 8.0
+    TIMEOUT_SECONDS = float(os.getenv('WEB_DELIVERY_TIMEOUT_SECONDS', '5'))
+
+# Status codes worth retrying; anything else is a permanent rejection
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# ==================== IN-PROCESS HANDOFF ====================
+
+_local_sink = None
+
+def set_local_sink(sink):
+    """
+    Register a callable that ingests a list of result dicts directly.
+
+    The web API calls this at import; detectors in the same process then
+    skip HTTP entirely.
+    """
+    global _local_sink
+    _local_sink = sink
+
+def get_local_sink():
+    return _local_sink
+
+# ==================== DELIVERY QUEUE ====================
+
+class ResultDelivery:
+    """
+    Background sender for detection results.
+
+    enqueue() never blocks on the network. A daemon thread collects up to
+    BATCH_SIZE results (waiting at most FLUSH_SECONDS after the first) and
+    POSTs them to the bulk ingest route on a keep-alive session. Failed
+    batches are retried with exponential backoff and jitter, then dropped.
+    """
+
+    def __init__(self, api_url=None, batch_size=None, flush_seconds=None, max_queue=None):
+        """Initialize the queue and HTTP session; the sender thread starts on first use"""
+        self.url = (api_url or WebDeliveryConfig.API_URL).rstrip('/') + WebDeliveryConfig.BULK_PATH
+        self.batch_size = batch_size or WebDeliveryConfig.BATCH_SIZE
+        self.flush_seconds = flush_seconds if flush_seconds is not None else WebDeliveryConfig.FLUSH_SECONDS
+        self.queue = queue.Queue(maxsize=max_queue or WebDeliveryConfig.MAX_QUEUE)
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = {
+            'queued': 0,
+            'delivered': 0,
+            'handed_over': 0,
+            'batches': 0,
+            'retries': 0,
+            'dropped': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def enqueue(self, result):
+        """
+        Queue a result for delivery.
+
+        Returns:
+            True if queued (or handed over in process), False if the queue is full
+        """
+        sink = get_local_sink()
+        if sink is not None:
+            sink([result])
+            self._count('handed_over')
+            return True
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='web-delivery', daemon=True)
+                self._thread.start()
+        try:
+            self.queue.put_nowait(result)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _next_batch(self):
+        """Block for the first result, then gather more until the batch fills or the flush time passes"""
+        batch = [self.queue.get()]
+        if batch[0] is None:
+            return None
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop marker: send what we have, then exit
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._send(batch)
+            if self._stopped.is_set():
+                return
+
+    def _send(self, batch):
+        """POST a batch, retrying transient failures with backoff"""
+        for attempt in range(WebDeliveryConfig.MAX_RETRIES + 1):
+            try:
+                response = self.session.post(
+                    self.url,
+                    json={'results': batch},
+                    timeout=WebDeliveryConfig.TIMEOUT_SECONDS
+                )
+                if response.status_code == 200:
+                    self._count('delivered', len(batch))
+                    self._count('batches')
+                    print(f"✅ Sent {len(batch)} results to web interface")
+                    return True
+                if response.status_code not in RETRYABLE_STATUS:
+                    print(f"⚠️ Web API rejected {len(batch)} results: {response.status_code}")
+                    break
+                error = f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+
+            if attempt == WebDeliveryConfig.MAX_RETRIES or self._stopped.is_set():
+                print(f"⚠️ Failed to send {len(batch)} results to web API: {error}")
+                break
+            self._count('retries')
+            backoff = min(WebDeliveryConfig.MAX_BACKOFF_SECONDS, WebDeliveryConfig.BACKOFF_SECONDS * 2 ** attempt)
+            time.sleep(backoff * random.uniform(0.5, 1.0))
+
+        self._count('dropped', len(batch))
+        return False
+
+    def close(self, timeout=10.0):
+        """Send whatever is queued, then stop the sender thread and close the session"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout=timeout)
+        self.session.close()
+
+    def get_stats(self):
+        """Return delivery counters"""
+        with self._lock:
+            return {**self.stats, 'pending': self.queue.qsize(), 'url': self.url}
+
+# ==================== EXPORT ====================
+
+__all__ = [
+    'WebDeliveryConfig',
+    'ResultDelivery',
+    'set_local_sink',
+    'get_local_sink'
+]
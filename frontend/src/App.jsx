@@ -458,6 +458,7 @@ function DetectionPage({ addPost, setPosts }) {
             }
             return prevResults; // Return same reference to prevent re-render
           });
+          return data;
         } else {
           console.warn('API returned unsuccessful response:', data.error);
         }
@@ -486,7 +487,10 @@ function DetectionPage({ addPost, setPosts }) {
       if (response.ok) {
         const data = await response.json();
         if (data.success) {
-          setGeminiResults(prev => [...prev, data.result]);
+          // The push stream may have delivered it already
+          setGeminiResults(prev =>
+            prev.some(existing => existing.seq === data.result.seq) ? prev : [...prev, data.result]
+          );
         }
       }
     } catch (error) {
@@ -494,9 +498,28 @@ function DetectionPage({ addPost, setPosts }) {
     }
   };
 
-  // Fetch results on component mount
+  // Fetch results on component mount, then follow the push stream for new ones
   useEffect(() => {
-    fetchGeminiResults();
+    let source = null;
+    let cancelled = false;
+
+    fetchGeminiResults().then(data => {
+      if (cancelled || typeof EventSource === 'undefined') return;
+      const since = data ? data.latest_seq : 0;
+      // EventSource reconnects on its own and resumes via Last-Event-ID
+      source = new EventSource(`${getApiUrl()}/api/gemini-results/stream?since=${since}`);
+      source.addEventListener('detection', event => {
+        const result = JSON.parse(event.data);
+        setGeminiResults(prev =>
+          prev.some(existing => existing.seq === result.seq) ? prev : [...prev, result]
+        );
+      });
+    });
+
+    return () => {
+      cancelled = true;
+      if (source) source.close();
+    };
   }, []);
 
   useEffect(() => {